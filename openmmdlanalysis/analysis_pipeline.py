@@ -0,0 +1,382 @@
+import os
+import json
+import pickle
+from collections import Counter
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from openmmdlanalysis.analysis_session import AnalysisSession
+from openmmdlanalysis.ligand_processing import convert_ligand_to_smiles
+from openmmdlanalysis.interaction_gathering import process_trajectory
+from openmmdlanalysis.binding_mode_processing import gather_interactions, filtering_values, unique_data_generation, df_iteration_numbering, update_values
+from openmmdlanalysis.markov_state_figure_generation import min_transition_calculation, transition_counts, binding_site_markov_network, markov_network_graph, markov_network_layout, export_markov_network
+from openmmdlanalysis.markov_state_model import markov_state_model, edge_probabilities, write_markov_state_model_tables
+from openmmdlanalysis.rdkit_figure_generation import arranged_figure_generation, generate_binding_mode_figures, group_binding_modes
+from openmmdlanalysis.barcode_generation import barcode_matrix, barcode_dict, waterids_matrix, save_barcode_runs, residence_time_statistics, plot_residence_time_curves, plot_barcode_heatmap, plot_waterbridge_piechart
+from openmmdlanalysis.visualization_functions import interacting_water_ids, water_bridging_frames, save_interacting_waters_trajectory, cloud_json_generation
+from openmmdlanalysis.figure_rendering import figure_job, render_figures
+from openmmdlanalysis.cloud_processing import write_density_maps, save_clouds_npz
+from openmmdlanalysis.pml_writer import generate_pharmacophores
+
+
+# Artifacts that can be written by run_analysis
+ARTIFACTS = ("tables", "markov", "binding_modes", "barcodes", "waters", "clouds", "pharmacophores")
+
+# Interaction types of the barcode figures and their column patterns
+BARCODE_TYPES = {"hydrophobic": "hydrophobic", "acceptor": "Acceptor_hbond", "donor": "Donor_hbond", "pistacking": "pistacking", "halogen": "halogen",
+                 "pication": "pication", "waterbridge": "waterbridge", "saltbridge_ni": "NI_saltbridge", "saltbridge_pi": "PI_saltbridge"}
+
+
+@dataclass
+class AnalysisResult:
+    """
+    The results of an analysis run, kept in memory.
+
+    Attributes
+    ----------
+    interactions : pd.DataFrame
+        All interactions of the trajectory with one numbered column per interaction (df_all).
+    fingerprints : pd.DataFrame
+        The interaction fingerprint and the binding mode of each frame.
+    binding_modes : list of str
+        The binding mode of each frame in the order of the simulation.
+    top_binding_modes : pd.DataFrame
+        The depicted binding modes with their first frame and percentage of occurrence.
+    barcodes : dict
+        Interaction as key and its barcode (1 for the frames in which the interaction is formed) as value.
+    transitions : dict
+        The state occurrences and transition counts of the binding modes (see markov_state_figure_generation.transition_counts).
+    interacting_waters : list
+        The ids of the waters that form water bridges.
+    markov_state_model : dict
+        The Markov state model of the binding modes (see markov_state_model.markov_state_model), None without lag times.
+    binding_mode_figures : dict
+        Binding mode as key and its depiction as png bytes as value, only rendered with the binding_modes artifact.
+    session : AnalysisSession
+        The session with the Universe and the prepared ligand.
+    """
+    interactions: pd.DataFrame
+    fingerprints: pd.DataFrame
+    binding_modes: list
+    top_binding_modes: pd.DataFrame
+    barcodes: dict
+    transitions: dict
+    interacting_waters: list
+    markov_state_model: dict = None
+    binding_mode_figures: dict = field(default_factory=dict)
+    session: AnalysisSession = None
+
+
+def run_analysis(topology, trajectory, ligand_sdf, ligand_name="UNK", binding_treshold=40, dataframe=None, min_transition=1, num_processes=4,
+                 residence_plots=False, msm_lags=None, msm_bootstrap=100, binding_mode_cutoff=None, water_stride=1, water_format='dcd',
+                 water_bridging_frames_only=False, markov_format='png', output_dir=None, artifacts=(), session=None, interactions=None, pool=None,
+                 cache_dir=None, verbose=False):
+    """
+    Analyses the protein-ligand interactions of a trajectory and returns the results in memory.
+
+    Parameters
+    ----------
+    topology : str
+        Path to the topology file after the MD simulation.
+    trajectory : str
+        Path to the trajectory file.
+    ligand_sdf : str
+        Path to the SDF file of the ligand.
+    ligand_name : str (optional)
+        The residue name of the ligand.
+    binding_treshold : int (optional)
+        Minimal occurrence of an interaction in % to be part of the binding modes.
+    dataframe : str (optional)
+        CSV file with already gathered interactions, by default the interactions are calculated.
+    min_transition : float (optional)
+        Minimal transition % of the Markov chain plots.
+    num_processes : int (optional)
+        The number of CPUs used for the trajectory processing, the bootstrapping, the pharmacophores and the figures.
+    residence_plots : bool (optional)
+        Render the survival and autocorrelation plots of the residence times with the barcodes artifact.
+    msm_lags : list of int (optional)
+        Lag times in frames of the Markov state model, by default no model is estimated.
+    msm_bootstrap : int (optional)
+        The number of bootstrap replicas of the Markov state model.
+    binding_mode_cutoff : float (optional)
+        Minimal occurrence in % of the depicted binding modes, by default the top 10 binding modes are depicted.
+    water_stride : int (optional)
+        Stride of the frames written to the interacting waters trajectory.
+    water_format : str (optional)
+        Format of the interacting waters trajectory, dcd or xtc.
+    water_bridging_frames_only : bool (optional)
+        Only write the frames with water bridges to the interacting waters trajectory.
+    markov_format : str (optional)
+        Output format of the Markov chain network, png, graphml or json.
+    output_dir : str (optional)
+        Folder the artifacts are written to, by default the current working directory. The working directory itself is not changed.
+    artifacts : iterable of str (optional)
+        The artifacts that are written (see ARTIFACTS), by default nothing is written.
+    session : AnalysisSession (optional)
+        An already loaded session of the topology, trajectory and ligand.
+    interactions : pd.DataFrame (optional)
+        Already gathered interactions of the trajectory (see interaction_gathering.process_trajectories).
+    pool : multiprocessing.pool.Pool (optional)
+        A running worker pool used for the frames, the bootstrapping and the figures instead of new pools, its workers should use the
+        Agg backend (see figure_rendering.init_figure_worker).
+    cache_dir : str (optional)
+        Folder of the prepared ligand cache (see ligand_processing.prepare_ligand), by default the ligand is prepared without cache.
+    verbose : bool (optional)
+        Print the progress of the analysis.
+
+    Returns
+    -------
+    AnalysisResult :
+        The interaction tables, fingerprints, binding modes, barcodes and transition counts.
+    """
+    artifacts = set(artifacts)
+    unknown_artifacts = artifacts - set(ARTIFACTS)
+    if unknown_artifacts:
+        raise ValueError(f"Unknown artifacts: {sorted(unknown_artifacts)}")
+
+    # All artifacts are written with absolute paths, so the figure jobs of running worker processes write to the same folder
+    output_dir = os.path.abspath(os.getcwd() if output_dir is None else output_dir)
+    markov_dir = os.path.join(output_dir, "Binding_Modes_Markov_States")
+    barcode_dir = os.path.join(output_dir, "Barcodes")
+    if artifacts:
+        os.makedirs(output_dir, exist_ok=True)
+
+    # Load the topology and trajectory once, the water and ligand residues are renamed in memory
+    if session is None:
+        session = AnalysisSession(topology, trajectory, ligand_sdf, ligand_name, cache_dir=cache_dir)
+    ligand = session.ligand_name
+    pdb_md = session.universe
+    total_frames = session.total_frames
+    if verbose:
+        print("\033[1mFiles are preprocessed\033[0m")
+
+    # Prepare the ligand once (bond orders, 2D coordinates and rings with the complex atom indices) from the ligand written in memory
+    lig_index = session.lig_index
+    prepared_ligand = session.ligand
+    ligand_rings = session.ligand_rings
+    if verbose:
+        print("\033[1mLigand ring data gathered\033[0m")
+    if "tables" in artifacts:
+        convert_ligand_to_smiles(ligand_sdf, output_smi=os.path.join(output_dir, "lig.smi"))
+
+    if interactions is None:
+        interaction_list = process_trajectory(pdb_md, dataframe=dataframe, num_processes=num_processes,
+                                              output_csv=os.path.join(output_dir, "interactions_gathered.csv") if "tables" in artifacts else None, pool=pool,
+                                              verbose=verbose)
+    else:
+        interaction_list = interactions.copy()
+        if "tables" in artifacts:
+            interaction_list.to_csv(os.path.join(output_dir, "interactions_gathered.csv"))
+    interaction_list["Prot_partner"] = interaction_list["RESNR"].astype(str) + interaction_list["RESTYPE"] + interaction_list["RESCHAIN"]
+    interaction_list = interaction_list.reset_index(drop=True)
+
+    unique_columns_rings_grouped = gather_interactions(interaction_list, ligand_rings, verbose=verbose)
+    interactions_all = interaction_list.copy()
+
+    # Add Frames + Treshold by user
+    filtered_values = filtering_values(threshold=binding_treshold/100, frames=total_frames, df=interaction_list, unique_columns_rings_grouped=unique_columns_rings_grouped)
+    filtering_all = filtering_values(threshold=0.00001, frames=total_frames, df=interactions_all, unique_columns_rings_grouped=unique_columns_rings_grouped)
+
+    # Replace NaN values with 0 in the entire DataFrame, missing coordinates stay NaN
+    coordinate_columns = ["LIGCOO_X", "LIGCOO_Y", "LIGCOO_Z", "PROTCOO_X", "PROTCOO_Y", "PROTCOO_Z"]
+    interaction_list.fillna({column: 0 for column in interaction_list.columns if column not in coordinate_columns}, inplace=True)
+    interactions_all.fillna({column: 0 for column in interactions_all.columns if column not in coordinate_columns}, inplace=True)
+
+    unique_data = unique_data_generation(filtered_values)
+    unique_data_all = unique_data_generation(filtering_all)
+
+    # Iteration through the dataframe and numbering the interactions with 1 and 0, depending if the interaction exists or not
+    df_iteration_numbering(interaction_list, unique_data)
+    df_iteration_numbering(interactions_all, unique_data_all)
+    if verbose:
+        print("\033[1mInteraction values assigned\033[0m")
+    if "tables" in artifacts:
+        interactions_all.to_csv(os.path.join(output_dir, "df_all.csv"))
+    df_all = interactions_all
+
+    # Group by 'FRAME' and set all values to 1 if there is at least one 1 in each column
+    grouped_frames_treshold = interaction_list.groupby('FRAME', as_index=False)[list(unique_data.values())].max()
+    grouped_frames_treshold = grouped_frames_treshold.set_index('FRAME', drop=False)
+    update_values(interaction_list, grouped_frames_treshold, unique_data)
+
+    # Change the FRAME column value type to int
+    grouped_frames_treshold['FRAME'] = grouped_frames_treshold['FRAME'].astype(int)
+
+    # Extract all columns except 'FRAME' and the index column
+    selected_columns = grouped_frames_treshold.columns[1:-1]
+
+    # Create a list of lists with the values from selected columns for each row
+    treshold_result_list = [row[selected_columns].values.tolist() for _, row in grouped_frames_treshold.iterrows()]
+
+    # Calculate the occurrences of each list in the result_list
+    treshold_occurrences = Counter(tuple(lst) for lst in treshold_result_list)
+
+    # Create a new column 'fingerprint' in the DataFrame
+    grouped_frames_treshold['fingerprint'] = None
+
+    # Set the 'fingerprint' column values based on the corresponding index in result_list
+    for index, fingerprint_value in enumerate(treshold_result_list,1):
+        grouped_frames_treshold.at[index, 'fingerprint'] = fingerprint_value
+
+    # Assuming your original DataFrame is named 'df'
+    # First, we'll create a new column 'Binding_fingerprint_hbond'
+    grouped_frames_treshold['Binding_fingerprint_treshold'] = ''
+
+    # Dictionary to keep track of encountered fingerprints and their corresponding labels
+    treshold_fingerprint_dict = {}
+
+    # Counter to generate the labels (Hbond_Binding_1, Hbond_Binding_2, etc.)
+    label_counter = 1
+
+    # Iterate through the rows and process the 'fingerprint' column
+    for index, row in grouped_frames_treshold.iterrows():
+        fingerprint = tuple(row['fingerprint'])
+
+        # Check if the fingerprint has been encountered before
+        if fingerprint in treshold_fingerprint_dict:
+            grouped_frames_treshold.at[index, 'Binding_fingerprint_treshold'] = treshold_fingerprint_dict[fingerprint]
+        else:
+            # Assign a new label if the fingerprint is new
+            label = f'Binding_Mode_{label_counter}'
+            treshold_fingerprint_dict[fingerprint] = label
+            grouped_frames_treshold.at[index, 'Binding_fingerprint_treshold'] = label
+            label_counter += 1
+
+    # Group the DataFrame by the 'Binding_fingerprint_hbond' column and create the dictionary of the fingerprints
+    fingerprint_dict = grouped_frames_treshold['Binding_fingerprint_treshold'].to_dict()
+    combined_dict = {'all': []}
+    for key, value in fingerprint_dict.items():
+        combined_dict['all'].append(value)
+
+    # Estimate the Markov state model and generate the Markov state figures of the binding modes
+    min_transitions = min_transition_calculation(min_transition)
+    msm = None
+    msm_edge_probabilities = None
+    if msm_lags:
+        msm = markov_state_model(combined_dict['all'], msm_lags, n_bootstrap=msm_bootstrap, num_processes=num_processes, pool=pool)
+        if "markov" in artifacts:
+            write_markov_state_model_tables(msm, markov_dir)
+        if msm['lags']:
+            msm_edge_probabilities = edge_probabilities(msm, msm['lags'][0])
+        if verbose:
+            print("\033[1mMarkov State Model estimated\033[0m")
+    figure_jobs = []
+    if "markov" in artifacts:
+        markov_graph = markov_network_graph(combined_dict, msm_edge_probabilities)
+        if markov_format == 'png':
+            # The layout is calculated once and shared by the plots of all thresholds
+            markov_layout = markov_network_layout(markov_graph)
+            for min_transition_percent in min_transitions:
+                figure_jobs.append(figure_job(f"markov_chain_plot_{min_transition_percent}", binding_site_markov_network, total_frames, [min_transition_percent], combined_dict, edge_probabilities=msm_edge_probabilities, pos=markov_layout, output_dir=markov_dir))
+        else:
+            export_markov_network(markov_graph, os.path.join(markov_dir, f"markov_chain.{markov_format}"))
+            if verbose:
+                print(f"\033[1mMarkov State Network exported to markov_chain.{markov_format}\033[0m")
+
+    # Select the binding modes for the depictions, the top 10 nodes with the most occurrences or all nodes above the occurrence cutoff
+    transitions = transition_counts(combined_dict['all'])
+    node_occurrences = dict(zip(transitions['states'].tolist(), transitions['occurrences'].tolist()))
+    nodes_by_occurrence = sorted(node_occurrences, key=node_occurrences.get, reverse=True)
+    if binding_mode_cutoff is None:
+        depicted_nodes = nodes_by_occurrence[:10]
+    else:
+        depicted_nodes = [node for node in nodes_by_occurrence if 100 * node_occurrences[node] / total_frames >= binding_mode_cutoff]
+
+    # Collect the interactions present in the frames of each binding mode
+    mode_interactions = grouped_frames_treshold.groupby('Binding_fingerprint_treshold')[list(unique_data.values())].max()
+    columns_with_value_1 = {node: set(mode_interactions.columns[mode_interactions.loc[node].to_numpy() == 1]) for node in depicted_nodes}
+
+    # Generate a figure for each of the binding modes with the interacting atoms highlighted, binding modes with identical highlights share one depiction
+    depicted_binding_modes = [(binding_mode, values, 100 * node_occurrences[binding_mode] / total_frames) for binding_mode, values in columns_with_value_1.items()]
+    binding_mode_groups = group_binding_modes(depicted_binding_modes, lig_index) if "binding_modes" in artifacts else []
+    for group_index, binding_mode_group in enumerate(binding_mode_groups):
+        figure_jobs.append(figure_job(f"binding_modes_{group_index}", generate_binding_mode_figures, binding_mode_group, prepared_ligand))
+
+    # get the top 10 bindingmodes with the most occurrences or all bindingmodes above the occurrence cutoff
+    binding_mode_counts = pd.Series(combined_dict['all']).value_counts()
+    total_binding_modes = len(combined_dict['all'])
+    if binding_mode_cutoff is None:
+        top_binding_mode_counts = binding_mode_counts.head(10)
+    else:
+        top_binding_mode_counts = binding_mode_counts[binding_mode_counts / total_binding_modes * 100 >= binding_mode_cutoff]
+    first_frames = grouped_frames_treshold.drop_duplicates('Binding_fingerprint_treshold').set_index('Binding_fingerprint_treshold')['FRAME']
+    top_binding_modes = pd.DataFrame({'Binding Mode': top_binding_mode_counts.index.tolist(),
+                                      'First Frame': first_frames[top_binding_mode_counts.index].tolist(),
+                                      'Percentage Occurrence': (top_binding_mode_counts / total_binding_modes * 100).tolist()})
+    bindingmode_frames = dict(zip(top_binding_modes['Binding Mode'], top_binding_modes['First Frame']))
+
+    # Generate the barcodes of all interactions at once and split them by interaction type
+    barcode_interactions = df_all.filter(regex='|'.join(BARCODE_TYPES.values())).columns
+    barcodes, barcode_columns = barcode_matrix(df_all, barcode_interactions)
+    type_interactions = {barcode_type: df_all.filter(regex=pattern).columns for barcode_type, pattern in BARCODE_TYPES.items()}
+    waterbridge_interactions = type_interactions["waterbridge"]
+
+    # Generate the water ids of the waterbridges once for the piecharts and the interacting waters
+    waterids, waterid_columns = waterids_matrix(df_all, waterbridge_interactions)
+    interacting_water_id_list = interacting_water_ids(df_all, waterbridge_interactions, waterids)
+
+    if "barcodes" in artifacts:
+        # Store the barcodes run-length encoded and calculate the residence times of the interactions
+        os.makedirs(barcode_dir, exist_ok=True)
+        save_barcode_runs(barcodes, barcode_columns, os.path.join(barcode_dir, "barcodes_rle.npz"))
+        residence_statistics, survival, autocorrelation = residence_time_statistics(barcodes, barcode_columns)
+        residence_statistics.to_csv(os.path.join(barcode_dir, "residence_time_statistics.csv"))
+        survival.to_csv(os.path.join(barcode_dir, "residence_time_survival.csv"))
+        autocorrelation.to_csv(os.path.join(barcode_dir, "residence_time_autocorrelation.csv"))
+        if residence_plots:
+            for barcode_type, interactions in type_interactions.items():
+                figure_jobs.append(figure_job(f"{barcode_type}_residence_times", plot_residence_time_curves, survival[interactions], autocorrelation[interactions], f"{barcode_type}_residence_times.png", output_dir=barcode_dir))
+        for barcode_type, interactions in type_interactions.items():
+            figure_jobs.append(figure_job(f"{barcode_type}_barcodes", plot_barcode_heatmap, barcode_dict(barcodes, barcode_columns, interactions), f"{barcode_type}_barcodes.png", output_dir=barcode_dir))
+        waterbridge_barcodes = barcode_dict(barcodes, barcode_columns, waterbridge_interactions)
+        waterid_barcodes = barcode_dict(waterids, waterid_columns)
+        for waterbridge_interaction in waterbridge_interactions:
+            figure_jobs.append(figure_job(f"{waterbridge_interaction}_piechart", plot_waterbridge_piechart, None, {waterbridge_interaction: waterbridge_barcodes[waterbridge_interaction]},
+                                          [waterbridge_interaction], {waterbridge_interaction: waterid_barcodes[waterbridge_interaction]}, output_dir=barcode_dir))
+
+    if "waters" in artifacts:
+        # dump interacting waters for visualization
+        with open(os.path.join(output_dir, 'interacting_waters.pkl'), 'wb') as f:
+            pickle.dump(interacting_water_id_list, f)
+        water_frames = water_bridging_frames(df_all, interacting_water_id_list) if water_bridging_frames_only else None
+        save_interacting_waters_trajectory(topology, trajectory, interacting_water_id_list, outputpath=os.path.join(output_dir, ""), stride=water_stride, frames=water_frames, trajectory_format=water_format, universe=pdb_md)
+
+    if "clouds" in artifacts:
+        # save clouds for visualization with NGL and volumetric density maps of the interaction clouds for isosurface visualization
+        clouds = cloud_json_generation(df_all)
+        with open(os.path.join(output_dir, 'clouds.json'), 'w') as f:
+            json.dump(clouds, f)
+        save_clouds_npz(clouds, os.path.join(output_dir, 'clouds.npz'))
+        write_density_maps(clouds, os.path.join(output_dir, "Interaction_Maps"), n_frames=total_frames)
+
+    if "pharmacophores" in artifacts:
+        # Generate the pharmacophores of the binding modes from their first occurrence, the point cloud pml for visualization
+        # and the combo pharmacophore of the md with each interaction as a single pharmacophore feature in parallel
+        generate_pharmacophores(df_all, grouped_frames_treshold, list(unique_data.values()), bindingmode_frames, ligand, f"{ligand}_complex", num_processes=num_processes, output_dir=output_dir)
+        if verbose:
+            print("\033[1mPharmacophores generated\033[0m")
+
+    # Render all collected figures in parallel
+    figure_results = render_figures(figure_jobs, num_processes=num_processes, pool=pool, verbose=verbose)
+
+    # Create Figure with all Binding modes
+    binding_mode_figures = {}
+    for group_index in range(len(binding_mode_groups)):
+        binding_mode_figures.update(figure_results.get(f"binding_modes_{group_index}") or {})
+    merged_images = [binding_mode_figures[binding_mode] for binding_mode in columns_with_value_1 if binding_mode in binding_mode_figures]
+    if merged_images:
+        arranged_figure_generation(merged_images, "all_binding_modes_arranged.png", output_dir=markov_dir)
+
+    return AnalysisResult(
+        interactions=df_all,
+        fingerprints=grouped_frames_treshold,
+        binding_modes=combined_dict['all'],
+        top_binding_modes=top_binding_modes,
+        barcodes=barcode_dict(barcodes, barcode_columns),
+        transitions=transitions,
+        interacting_waters=interacting_water_id_list,
+        markov_state_model=msm,
+        binding_mode_figures=binding_mode_figures,
+        session=session,
+    )
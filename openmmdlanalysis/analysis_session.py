@@ -0,0 +1,91 @@
+import warnings
+from functools import cached_property
+from io import StringIO
+
+import MDAnalysis as mda
+import numpy as np
+
+from openmmdlanalysis.preprocessing import rename_residues
+from openmmdlanalysis.ligand_processing import prepare_ligand
+
+
+class AnalysisSession:
+    """
+    Owns the structures of one analysis run, so the topology and trajectory are parsed once and every stage shares
+    the Universe, the cached selections and the prepared ligand.
+
+    Parameters
+    ----------
+    topology : str
+        Path to the topology file after the MD simulation.
+    trajectory : str
+        Path to the trajectory file.
+    ligand_sdf : str
+        Path to the SDF file of the ligand used as bond order template.
+    ligand_name : str (optional)
+        The residue name of the ligand, * is renamed to UNK like in the topology.
+    cache_dir : str (optional)
+        Folder of the prepared ligand cache, None disables the cache.
+
+    Attributes
+    ----------
+    universe : mda.Universe
+        The Universe of the topology and trajectory with the water and ligand residues renamed in memory (see preprocessing.rename_residues).
+    """
+
+    def __init__(self, topology, trajectory, ligand_sdf, ligand_name="UNK", cache_dir=".ligand_cache"):
+        self.topology = topology
+        self.trajectory = trajectory
+        self.ligand_sdf = ligand_sdf
+        self.ligand_name = "UNK" if ligand_name == "*" else ligand_name
+        self.cache_dir = cache_dir
+        self.universe = mda.Universe(topology, trajectory)
+        rename_residues(self.universe)
+
+    @property
+    def total_frames(self):
+        """The number of analysed frames, the first frame of the trajectory is skipped."""
+        return len(self.universe.trajectory) - 1
+
+    @cached_property
+    def ligand_atoms(self):
+        """The atoms of the ligand."""
+        return self.universe.select_atoms(f"resname {self.ligand_name}")
+
+    @cached_property
+    def complex_atoms(self):
+        """The protein, the ligand and the waters within 10 A of the ligand in the first frame."""
+        self.universe.trajectory[0]
+        return self.universe.select_atoms(f"protein or resname {self.ligand_name} or (resname HOH and around 10 resname {self.ligand_name})")
+
+    @cached_property
+    def lig_index(self):
+        """The atom id of the first ligand atom in the protein-ligand complex."""
+        # The complex is written with sequential atom serials, so the offset is the position of the first ligand atom in the complex
+        return int(np.searchsorted(self.complex_atoms.indices, self.ligand_atoms.indices[0])) + 1
+
+    @cached_property
+    def ligand_pdb_block(self):
+        """The ligand of the first frame as PDB block, written in memory."""
+        self.universe.trajectory[0]
+        stream = mda.lib.util.NamedStream(StringIO(), "lig.pdb")
+        with mda.Writer(stream, self.ligand_atoms.n_atoms, multiframe=False) as writer:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                writer.write(self.ligand_atoms)
+        return stream.read()
+
+    @cached_property
+    def ligand(self):
+        """The prepared ligand generated by ligand_processing.prepare_ligand."""
+        return prepare_ligand(self.ligand_sdf, None, self.lig_index, self.cache_dir, pdb_block=self.ligand_pdb_block)
+
+    @property
+    def ligand_mol(self):
+        """The RDKit molecule of the ligand with bond orders and 2D coordinates."""
+        return self.ligand['mol']
+
+    @property
+    def ligand_rings(self):
+        """The ligand rings with the atom indices of the protein-ligand complex."""
+        return self.ligand['rings']
@@ -1,8 +1,45 @@
 import os
 import numpy as np
+import pandas as pd
 import matplotlib.pyplot as plt
 
 
+def barcode_matrix(df, interactions):
+    """Generates the barcodes of multiple interactions at once.
+
+    Args:
+        df (pandas dataframe): Dataframe containing all interactions from plip analysis (typicaly df_all)
+        interactions (list): names of the interactions to generate barcodes for
+
+    Returns:
+        tuple: binary uint8 array of shape (frames, interactions) with 1 representing the interaction is present in the corresponding frame and the pandas Index of the interactions (columns of the array)
+    """
+    columns = pd.Index(interactions)
+    frame_codes, frames = pd.factorize(df['FRAME'])
+    barcodes = np.zeros((len(frames), len(columns)), dtype=np.uint8)
+
+    # scatter every row that contains an interaction onto the frame it belongs to
+    rows, cols = np.nonzero(df[columns].to_numpy() == 1)
+    barcodes[frame_codes[rows], cols] = 1
+
+    return barcodes, columns
+
+
+def barcode_dict(barcodes, columns, interactions=None):
+    """Generates a dict of barcodes from the array generated by barcode_matrix.
+
+    Args:
+        barcodes (numpy array): barcode array of shape (frames, interactions) generated by barcode_matrix
+        columns (pandas Index): interactions corresponding to the columns of the barcode array
+        interactions (list, optional): interactions to include. Defaults to all columns.
+
+    Returns:
+        dict: interaction names as keys and the barcode of each interaction (view of the array) as values
+    """
+    interactions = columns if interactions is None else interactions
+    return {interaction: barcodes[:, columns.get_loc(interaction)] for interaction in interactions}
+
+
 def barcodegeneration(df, interaction):
     """Generates barcodes for a given interaction  .
 
@@ -13,21 +50,194 @@ def barcodegeneration(df, interaction):
     Returns:
         numpy array: returns an binary array of wit 1 representing the interaction is present in the corresponding frame
     """
-    barcode = []
-    
-    unique_frames = df['FRAME'].unique()
-    
-    for frame in unique_frames:
-        frame_data = df[df['FRAME'] == frame]
-        
-        if 1 in frame_data[interaction].values:
-            barcode.append(1)
-            
-            
-        else:
-            barcode.append(0)
-    
-    return np.array(barcode)
+    barcodes, columns = barcode_matrix(df, [interaction])
+
+    return barcodes[:, 0]
+
+
+def barcode_runs(barcodes):
+    """Run-length encodes the barcodes of multiple interactions.
+
+    Args:
+        barcodes (numpy array): binary barcode array of shape (frames, interactions) generated by barcode_matrix
+
+    Returns:
+        tuple: numpy arrays with the interaction (column) index, the first frame index and the length of each run of consecutive frames the interaction is present in, sorted by interaction and frame
+    """
+    n_frames, n_interactions = barcodes.shape
+    padded = np.zeros((n_interactions, n_frames + 2), dtype=np.int8)
+    padded[:, 1:-1] = barcodes.T
+    changes = np.diff(padded, axis=1)
+
+    run_interactions, run_starts = np.nonzero(changes == 1)
+    _, run_ends = np.nonzero(changes == -1)
+
+    return run_interactions, run_starts, run_ends - run_starts
+
+
+def barcodes_from_runs(run_interactions, run_starts, run_lengths, n_frames, n_interactions):
+    """Decodes run-length encoded barcodes generated by barcode_runs back to the binary barcode array.
+
+    Args:
+        run_interactions (numpy array): interaction (column) index of each run
+        run_starts (numpy array): first frame index of each run
+        run_lengths (numpy array): number of frames of each run
+        n_frames (int): number of frames of the barcodes
+        n_interactions (int): number of interactions of the barcodes
+
+    Returns:
+        numpy array: binary uint8 array of shape (frames, interactions)
+    """
+    changes = np.zeros((n_frames + 1, n_interactions), dtype=np.int32)
+    np.add.at(changes, (run_starts, run_interactions), 1)
+    np.add.at(changes, (run_starts + run_lengths, run_interactions), -1)
+
+    return np.cumsum(changes[:-1], axis=0).astype(np.uint8)
+
+
+def save_barcode_runs(barcodes, columns, save_path):
+    """Saves the barcodes run-length encoded to a compressed .npz file.
+
+    Args:
+        barcodes (numpy array): binary barcode array of shape (frames, interactions) generated by barcode_matrix
+        columns (pandas Index): interactions corresponding to the columns of the barcode array
+        save_path (str): path of the .npz file
+    """
+    run_interactions, run_starts, run_lengths = barcode_runs(barcodes)
+    np.savez_compressed(save_path, interactions=np.asarray(columns, dtype=str), n_frames=barcodes.shape[0],
+                        run_interactions=run_interactions.astype(np.int32), run_starts=run_starts.astype(np.int64), run_lengths=run_lengths.astype(np.int64))
+
+
+def load_barcode_runs(file_path):
+    """Loads run-length encoded barcodes saved by save_barcode_runs.
+
+    Args:
+        file_path (str): path of the .npz file
+
+    Returns:
+        tuple: binary uint8 barcode array of shape (frames, interactions) and the pandas Index of the interactions (columns of the array)
+    """
+    with np.load(file_path) as data:
+        columns = pd.Index(data['interactions'])
+        barcodes = barcodes_from_runs(data['run_interactions'], data['run_starts'], data['run_lengths'], int(data['n_frames']), len(columns))
+
+    return barcodes, columns
+
+
+def residence_time_statistics(barcodes, columns, max_lag=100):
+    """Calculates the residence time statistics of multiple interactions from their barcodes.
+
+    Args:
+        barcodes (numpy array): binary barcode array of shape (frames, interactions) generated by barcode_matrix
+        columns (pandas Index): interactions corresponding to the columns of the barcode array
+        max_lag (int, optional): largest lag time in frames for the survival and autocorrelation curves. Defaults to 100.
+
+    Returns:
+        tuple: dataframe with the occurrence, the number of formation events and the mean, median and max residence time (in frames) of each interaction,
+        dataframe with the survival curves (fraction of the formation events lasting at least the lag time) and
+        dataframe with the autocorrelation curves (probability that the interaction is present after the lag time, if it was present before) of each interaction
+    """
+    n_frames, n_interactions = barcodes.shape
+    max_lag = max(1, min(max_lag, n_frames - 1))
+    run_interactions, run_starts, run_lengths = barcode_runs(barcodes)
+
+    events = np.bincount(run_interactions, minlength=n_interactions)
+    has_events = events > 0
+    mean_residence = np.divide(np.bincount(run_interactions, weights=run_lengths, minlength=n_interactions), events,
+                               out=np.zeros(n_interactions), where=has_events)
+    max_residence = np.zeros(n_interactions, dtype=np.int64)
+    np.maximum.at(max_residence, run_interactions, run_lengths)
+
+    # sort the runs of each interaction by length to pick the median from the middle of each group
+    sorted_lengths = run_lengths[np.lexsort((run_lengths, run_interactions))]
+    group_starts = (np.cumsum(events) - events)[has_events]
+    lower = group_starts + (events[has_events] - 1) // 2
+    upper = group_starts + events[has_events] // 2
+    median_residence = np.zeros(n_interactions)
+    median_residence[has_events] = (sorted_lengths[lower] + sorted_lengths[upper]) / 2
+
+    statistics = pd.DataFrame({
+        'Occurrence %': barcodes.mean(axis=0) * 100,
+        'Formation Events': events,
+        'Mean Residence Time': mean_residence,
+        'Median Residence Time': median_residence,
+        'Max Residence Time': max_residence,
+    }, index=columns)
+
+    # survival: fraction of formation events with a length of at least the lag time
+    lags = np.arange(1, max_lag + 1)
+    length_counts = np.zeros((n_interactions, max_lag + 2), dtype=np.int64)
+    np.add.at(length_counts, (run_interactions, np.minimum(run_lengths, max_lag + 1)), 1)
+    at_least = np.cumsum(length_counts[:, ::-1], axis=1)[:, ::-1]
+    survival = np.divide(at_least[:, 1:max_lag + 1], events[:, None], out=np.zeros((n_interactions, max_lag)), where=has_events[:, None])
+
+    # autocorrelation: sum(h(t) * h(t + lag)) / sum(h(t)), calculated with FFTs in blocks of interactions to bound the memory
+    autocorrelation = np.zeros((max_lag + 1, n_interactions))
+    fft_length = 1 << int(np.ceil(np.log2(max(2 * n_frames, 2))))
+    block_size = max(1, 2 ** 24 // fft_length)
+    for block_start in range(0, n_interactions, block_size):
+        block = barcodes[:, block_start:block_start + block_size].astype(np.float64)
+        spectrum = np.fft.rfft(block, n=fft_length, axis=0)
+        correlation = np.fft.irfft(spectrum * np.conj(spectrum), n=fft_length, axis=0)[:max_lag + 1]
+        autocorrelation[:, block_start:block_start + block_size] = np.divide(correlation, correlation[0], out=np.zeros_like(correlation), where=correlation[0] > 0.5)
+
+    survival = pd.DataFrame(survival.T, index=pd.Index(lags, name='Lag'), columns=columns)
+    autocorrelation = pd.DataFrame(np.round(autocorrelation, 6), index=pd.Index(np.arange(max_lag + 1), name='Lag'), columns=columns)
+
+    return statistics, survival, autocorrelation
+
+
+def plot_residence_time_curves(survival, autocorrelation, save_path, output_dir="./Barcodes"):
+    """Generates picture of the survival and autocorrelation curves of the interactions of a specific type.
+
+    Args:
+        survival (pandas dataframe): survival curves generated by residence_time_statistics
+        autocorrelation (pandas dataframe): autocorrelation curves generated by residence_time_statistics
+        save_path (str): name of the file to save the picture to
+        output_dir (str, optional): folder the picture is saved to. Defaults to "./Barcodes".
+    """
+    if survival.empty:
+        print("No residence times to plot.")
+        return
+
+    fig, (ax_survival, ax_autocorrelation) = plt.subplots(1, 2, figsize=(12, 5))
+    ax_survival.plot(survival.index, survival.to_numpy(), linewidth=1.0)
+    ax_survival.set_xlabel('Lag (frames)')
+    ax_survival.set_ylabel('Survival')
+    ax_survival.set_title('Formation events lasting at least the lag time', fontsize=10)
+    ax_autocorrelation.plot(autocorrelation.index, autocorrelation.to_numpy(), linewidth=1.0)
+    ax_autocorrelation.set_xlabel('Lag (frames)')
+    ax_autocorrelation.set_ylabel('Autocorrelation')
+    ax_autocorrelation.set_title('Interaction autocorrelation', fontsize=10)
+    if survival.shape[1] <= 20:
+        ax_autocorrelation.legend(survival.columns, loc='upper left', bbox_to_anchor=(1.02, 1), fontsize=6)
+
+    os.makedirs(output_dir, exist_ok=True)
+    fig.tight_layout()
+    fig.savefig(os.path.join(output_dir, save_path), dpi=300, bbox_inches='tight')
+    plt.close(fig)
+
+
+def waterids_matrix(df, interactions):
+    """Generates the barcodes containing the coresponding water ids of multiple waterbridge interactions at once.
+
+    Args:
+        df (pandas dataframe): dataframe containing all interactions from plip analysis (typicaly df_all)
+        interactions (list): names of the waterbridge interactions to generate barcodes for
+
+    Returns:
+        tuple: int64 array of shape (frames, interactions) with the water id forming the interaction in the corresponding frame (0 if no interaction present) and the pandas Index of the interactions (columns of the array)
+    """
+    columns = pd.Index(interactions)
+    frame_codes, frames = pd.factorize(df['FRAME'])
+    waterids = np.zeros((len(frames), len(columns)), dtype=np.int64)
+
+    rows, cols = np.nonzero(df[columns].to_numpy() == 1)
+    # if several rows of a frame form the interaction, the water of the first row is used
+    cells, first_rows = np.unique(frame_codes[rows] * len(columns) + cols, return_index=True)
+    waterids.flat[cells] = df['WATER_IDX'].to_numpy()[rows[first_rows]].astype(np.int64)
+
+    return waterids, columns
 
 
 def waterids_barcode_generator(df, interaction):
@@ -40,20 +250,9 @@ def waterids_barcode_generator(df, interaction):
     Returns:
         list: returns a list of waterids for the frames where the interaction is present 0 if no interaction present
     """
-    water_id_list = []
-    waterid_barcode = []
-    for index, row in df.iterrows():
-        if row[interaction] == 1:
-            water_id_list.append(int(row['WATER_IDX']))
-    
-    barcode = barcodegeneration(df, interaction)
-    
-    for value in barcode:
-        if value == 1:
-            waterid_barcode.append(water_id_list.pop(0))
-        else:
-            waterid_barcode.append(0)
-    return waterid_barcode
+    waterids, columns = waterids_matrix(df, [interaction])
+
+    return waterids[:, 0].tolist()
 
 
 def plot_barcodes(barcodes, save_path):
@@ -92,31 +291,88 @@ def plot_barcodes(barcodes, save_path):
     plt.savefig(f"./Barcodes/{save_path}", dpi=300, bbox_inches='tight')
 
 
-def plot_waterbridge_piechart(df_all, waterbridge_barcodes, waterbridge_interactions):
+def downsample_barcodes(barcodes, width):
+    """Max-pools the frames of barcodes down to a maximum number of columns, so an interaction present in any frame of a column stays visible.
+
+    Args:
+        barcodes (numpy array): binary barcode array of shape (frames, interactions) or a single barcode
+        width (int): maximum number of frames (columns) after downsampling
+
+    Returns:
+        numpy array: downsampled barcodes with at most width frames
+    """
+    n_frames = barcodes.shape[0]
+    if n_frames <= width:
+        return barcodes
+    bin_starts = np.linspace(0, n_frames, width + 1).astype(np.int64)[:-1]
+    return np.maximum.reduceat(barcodes, bin_starts, axis=0)
+
+
+def plot_barcode_heatmap(barcodes, save_path, width=1700, interactions_per_page=100, dpi=200, output_dir="./Barcodes"):
+    """Generates picture of barcodes for interactions of a specific type as a single heatmap.
+    The frames are max-pooled to the pixel width of the heatmap and large sets of interactions are split into multiple pages.
+
+    Args:
+        barcodes (dict): interaction names as keys and barcodes as values (see barcode_dict)
+        save_path (str): name of the file to save the picture to, pages are saved with the suffix _page{number}
+        width (int, optional): width of the heatmap in pixels. Defaults to 1700.
+        interactions_per_page (int, optional): maximum number of interactions in one picture. Defaults to 100.
+        dpi (int, optional): resolution of the picture. Defaults to 200.
+        output_dir (str, optional): folder the pictures are saved to. Defaults to "./Barcodes".
+    """
+    if not barcodes:
+        print("No barcodes to plot.")
+        return
+
+    interactions = list(barcodes.keys())
+    n_frames = len(next(iter(barcodes.values())))
+    occurrences = [barcode.sum() / len(barcode) * 100 for barcode in barcodes.values()]
+    heatmap = np.stack([downsample_barcodes(barcode, width) for barcode in barcodes.values()])
+
+    os.makedirs(output_dir, exist_ok=True)
+    n_pages = (len(interactions) + interactions_per_page - 1) // interactions_per_page
+    save_name, save_extension = os.path.splitext(save_path)
+    for page in range(n_pages):
+        page_slice = slice(page * interactions_per_page, (page + 1) * interactions_per_page)
+        page_heatmap = heatmap[page_slice]
+        labels = [f"{interaction} ({occurrence:.2f}%)" for interaction, occurrence in zip(interactions[page_slice], occurrences[page_slice])]
+
+        fig, ax = plt.subplots(figsize=(width / dpi + 3, 0.2 * len(labels) + 1))
+        ax.imshow(page_heatmap, cmap='binary', aspect='auto', interpolation='nearest', vmin=0, vmax=1, extent=(0, n_frames, len(labels), 0))
+        ax.set_yticks(np.arange(len(labels)) + 0.5)
+        ax.set_yticklabels(labels, fontsize=6)
+        ax.set_xlabel('Frame', fontsize=8)
+        ax.tick_params(axis='x', labelsize=6)
+
+        page_path = save_path if n_pages == 1 else f"{save_name}_page{page + 1}{save_extension}"
+        fig.savefig(os.path.join(output_dir, page_path), dpi=dpi, bbox_inches='tight')
+        plt.close(fig)
+
+
+def plot_waterbridge_piechart(df_all, waterbridge_barcodes, waterbridge_interactions, waterid_barcodes=None, output_dir="Barcodes"):
     """Generates piecharts for each waterbridge interaction with the water ids of the interacting waters.
 
     Args:
         df_all (pandas dataframe): dataframe contaning all interactions (typicaly df_all)
         waterbridge_barcodes (list): list of np arrays containing the barcodes for each interaction
         waterbridge_interactions (list): list of strings containing the names of the waterbridge interactions
+        waterid_barcodes (dict, optional): water id barcodes of the waterbridge interactions (see waterids_matrix). Defaults to None, then they are generated from df_all.
+        output_dir (str, optional): folder of the Waterbridge_Piecharts folder. Defaults to "Barcodes".
     """
     if not waterbridge_barcodes:
         print("No Piecharts to plot.")
         return
 
-    os.makedirs('Barcodes/Waterbridge_Piecharts', exist_ok=True)
+    if waterid_barcodes is None:
+        waterid_barcodes = barcode_dict(*waterids_matrix(df_all, waterbridge_interactions))
+
+    piechart_dir = os.path.join(output_dir, 'Waterbridge_Piecharts')
+    os.makedirs(piechart_dir, exist_ok=True)
     plt.figure(figsize=(6, 6))
     for waterbridge_interaction in waterbridge_interactions:
         plt.clf()
-        waterid_barcode = waterids_barcode_generator(df_all, waterbridge_interaction)
-        waters_count = {}
-
-        for waterid in waterid_barcode:
-            if waterid != 0:
-                if waterid in waters_count:
-                    waters_count[waterid] += 1
-                else:
-                    waters_count[waterid] = 1
+        waterid_barcode = waterid_barcodes[waterbridge_interaction]
+        waters_count = pd.Series(waterid_barcode[waterid_barcode != 0]).value_counts(sort=False).to_dict()
 
         labels = [f'ID {id}' for id in waters_count.keys()]
         values = waters_count.values()
@@ -141,7 +397,7 @@ def plot_waterbridge_piechart(df_all, waterbridge_barcodes, waterbridge_interact
         legend_labels = [f'ID {id}' for id in waters_count.keys()]
         legend = plt.legend(legend_labels, loc="upper right", bbox_to_anchor=(1.2, 1))
         plt.setp(legend.get_texts(), fontsize='small')  # Adjust font size for legend
-        plt.text(0.5, 0, f"Total frames with waterbridge: {round(((sum(1 for val in waterid_barcode if val != 0) / len(waterid_barcode)) * 100), 2)}%", size=12, ha="center", 	transform=plt.gcf().transFigure)
+        plt.text(0.5, 0, f"Total frames with waterbridge: {round(((np.count_nonzero(waterid_barcode) / len(waterid_barcode)) * 100), 2)}%", size=12, ha="center", 	transform=plt.gcf().transFigure)
         # Adjust the position of the subplots within the figure
         plt.subplots_adjust(top=0.99, bottom=0.01)  # You can change the value as needed
-        plt.savefig(f'Barcodes/Waterbridge_Piecharts/{waterbridge_interaction}.png', bbox_inches='tight', dpi=300)
+        plt.savefig(os.path.join(piechart_dir, f'{waterbridge_interaction}.png'), bbox_inches='tight', dpi=300)
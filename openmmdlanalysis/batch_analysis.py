@@ -0,0 +1,167 @@
+"""
+batch_analysis.py
+Analyse the trajectories of several protein-ligand systems and replicas with one shared worker pool
+"""
+import argparse
+import warnings
+warnings.filterwarnings("ignore")
+import os
+from multiprocessing import Pool
+
+import matplotlib
+import pandas as pd
+
+from openmmdlanalysis.analysis_pipeline import ARTIFACTS, run_analysis
+from openmmdlanalysis.figure_rendering import init_figure_worker
+from openmmdlanalysis.interaction_gathering import process_trajectories
+
+
+# Columns of the manifest that are required and the optional columns with their defaults
+MANIFEST_COLUMNS = ("name", "topology", "trajectory", "ligand_sdf")
+MANIFEST_DEFAULTS = {"ligand_name": "UNK", "replica": ""}
+
+
+def read_manifest(manifest):
+    """
+    Reads the manifest of the systems, a CSV file with one system per row. Relative paths are resolved from the folder of the manifest.
+
+    Parameters
+    ----------
+    manifest : str
+        Path to the CSV file with the columns name, topology, trajectory, ligand_sdf and optionally ligand_name and replica.
+
+    Returns
+    -------
+    pd.DataFrame :
+        The systems with absolute paths, indexed by their name.
+    """
+    systems = pd.read_csv(manifest, dtype=str, keep_default_na=False)
+    missing_columns = [column for column in MANIFEST_COLUMNS if column not in systems.columns]
+    if missing_columns:
+        raise ValueError(f"The manifest is missing the columns {missing_columns}")
+    if systems["name"].duplicated().any():
+        raise ValueError(f"The system names of the manifest are not unique: {sorted(set(systems['name'][systems['name'].duplicated()]))}")
+    for column, default in MANIFEST_DEFAULTS.items():
+        if column not in systems.columns:
+            systems[column] = default
+    manifest_dir = os.path.dirname(os.path.abspath(manifest))
+    for column in ("topology", "trajectory", "ligand_sdf"):
+        systems[column] = [os.path.join(manifest_dir, path) for path in systems[column]]
+
+    return systems.set_index("name", drop=False)
+
+
+def system_summary(system, result):
+    """
+    Summarizes the analysis of a system in one row of the batch summary.
+
+    Parameters
+    ----------
+    system : pd.Series
+        The row of the system in the manifest.
+    result : AnalysisResult
+        The analysis result of the system, None if the analysis failed.
+
+    Returns
+    -------
+    dict :
+        The summary of the system.
+    """
+    summary = {"name": system["name"], "ligand_name": system["ligand_name"], "replica": system["replica"]}
+    if result is None:
+        return summary
+    top_binding_mode = result.top_binding_modes.iloc[0]
+    summary.update({"frames": len(result.binding_modes),
+                    "interactions": len(result.barcodes),
+                    "binding_modes": len(set(result.binding_modes)),
+                    "top_binding_mode": top_binding_mode["Binding Mode"],
+                    "top_binding_mode_percentage": top_binding_mode["Percentage Occurrence"]})
+    return summary
+
+
+def run_batch(manifest, output_dir="batch_analysis", num_processes=4, artifacts=ARTIFACTS, chunksize=1, **analysis_options):
+    """
+    Analyses all systems of a manifest. The frames of all systems are processed on one long-lived worker pool and each system is
+    analysed in the main process once its frames are processed, while the pool continues with the queued frames of the other systems.
+    The bootstrapping and the figures of a system run on the same pool and wait for at most two chunks of frames per process
+    (see interaction_gathering.process_trajectories).
+
+    Parameters
+    ----------
+    manifest : str
+        Path to the CSV manifest of the systems (see read_manifest).
+    output_dir : str (optional)
+        Folder of the batch, the artifacts of each system are written to a subfolder with its name.
+    num_processes : int (optional)
+        The number of processes of the shared worker pool.
+    artifacts : iterable of str (optional)
+        The artifacts that are written for each system (see analysis_pipeline.ARTIFACTS).
+    chunksize : int (optional)
+        The number of frames sent to a worker at once.
+    **analysis_options :
+        Further options of analysis_pipeline.run_analysis, e.g. binding_treshold or msm_lags.
+
+    Returns
+    -------
+    pd.DataFrame :
+        The summary of the systems, the error column contains the reason of failed analyses.
+    pd.DataFrame :
+        The occurrence of the interactions in % of the frames, one row per system.
+    """
+    systems = read_manifest(manifest)
+    os.makedirs(output_dir, exist_ok=True)
+    summaries = {}
+    occurrences = {}
+    with Pool(processes=max(1, num_processes), initializer=init_figure_worker) as pool:
+        trajectories = {name: (system["topology"], system["trajectory"]) for name, system in systems.iterrows()}
+        for name, interactions in process_trajectories(trajectories, pool, chunksize=chunksize, max_pending_chunks=2 * max(1, num_processes)):
+            system = systems.loc[name]
+            print(f"\033[1mAnalysing {name}\033[0m")
+            try:
+                result = run_analysis(system["topology"], system["trajectory"], system["ligand_sdf"], system["ligand_name"], num_processes=num_processes,
+                                      output_dir=os.path.join(output_dir, name), artifacts=artifacts, interactions=interactions, pool=pool,
+                                      cache_dir=os.path.join(output_dir, ".ligand_cache"), verbose=True, **analysis_options)
+            except Exception as error:
+                print(f"\033[1mAnalysis of {name} failed: {error}\033[0m")
+                summaries[name] = dict(system_summary(system, None), error=str(error))
+                continue
+            summaries[name] = dict(system_summary(system, result), error="")
+            occurrences[name] = {interaction: 100 * barcode.mean() for interaction, barcode in result.barcodes.items()}
+
+    # The summaries keep the order of the manifest
+    summary = pd.DataFrame([summaries[name] for name in systems.index])
+    interaction_occurrences = pd.DataFrame.from_dict(occurrences, orient="index").reindex(systems.index).fillna(0)
+    interaction_occurrences.index.name = "name"
+    summary.to_csv(os.path.join(output_dir, "batch_summary.csv"), index=False)
+    interaction_occurrences.to_csv(os.path.join(output_dir, "batch_interaction_occurrences.csv"))
+
+    return summary, interaction_occurrences
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='openmmdlanalysis_batch', description='Analyse the trajectories of several protein-ligand systems and replicas with one shared worker pool')
+    parser.add_argument('-i', dest='manifest', help='Manifest of the systems in CSV format with the columns name, topology, trajectory, ligand_sdf and optionally ligand_name and replica', required=True)
+    parser.add_argument('-o', dest='output_dir', help='Output folder, the outputs of each system are written to a subfolder with its name', default='batch_analysis')
+    parser.add_argument('-b', dest='binding', help='Binding Mode Treshold for Binding Mode in %%', default=40)
+    parser.add_argument('-m', dest='min_transition', help='Minimal Transition %% for Markov State Model', default=1)
+    parser.add_argument('-c', dest='cpu_count', help='CPU Count, specify how many CPUs should be used, default is half of the CPU count', default=os.cpu_count()/2)
+    parser.add_argument('-cs', dest='chunksize', help='Number of frames sent to a worker at once', type=int, default=1)
+    parser.add_argument('-a', dest='artifacts', help='Artifacts written for each system, by default all artifacts are written', nargs='+', choices=ARTIFACTS, default=list(ARTIFACTS))
+    parser.add_argument('-rp', dest='residence_plots', help='Generate survival and autocorrelation plots of the interaction residence times', action='store_true')
+    parser.add_argument('-msm', dest='msm_lags', help='Lag times in frames for the Markov State Model estimation, the transition probabilities at the first lag time are shown on the edges of the Markov Chain plots, the -m threshold still applies to the %% of frames of the transitions', nargs='+', type=int, default=None)
+    parser.add_argument('-bs', dest='msm_bootstrap', help='Number of bootstrap replicas for the errors of the Markov State Model', type=int, default=100)
+    parser.add_argument('-bm', dest='binding_mode_cutoff', help='Minimal occurrence in %% of the binding modes that are depicted, by default the top 10 binding modes are depicted', type=float, default=None)
+    parser.add_argument('-mf', dest='markov_format', help='Output format of the Markov Chain network', choices=['png', 'graphml', 'json'], default='png')
+
+    args = parser.parse_args()
+    matplotlib.use("Agg")
+    summary, _ = run_batch(args.manifest, args.output_dir, num_processes=int(args.cpu_count), artifacts=args.artifacts, chunksize=args.chunksize,
+                           binding_treshold=int(args.binding), min_transition=args.min_transition, residence_plots=args.residence_plots,
+                           msm_lags=args.msm_lags, msm_bootstrap=args.msm_bootstrap, binding_mode_cutoff=args.binding_mode_cutoff, markov_format=args.markov_format)
+    failed = summary[summary["error"] != ""]
+    print(f"\033[1mAnalysed {len(summary) - len(failed)} of {len(summary)} systems\033[0m")
+    print("\033[1mBatch Analysis is Finished.\033[0m")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,7 @@ import pandas as pd
 import itertools
 import os
 
-def gather_interactions(df, ligand_rings):
+def gather_interactions(df, ligand_rings, verbose=True):
     """
     Process a DataFrame with the protein-ligand interaction and generate column names for each unique interaction.
 
@@ -14,6 +14,8 @@ def gather_interactions(df, ligand_rings):
         DataFrame that contains the interaction data for the whole trajectory.
     ligand_rings : list
         A list of the ligand ring information to recognize the atom numbers belonging to rings for hydrophobic interactions.
+    verbose : bool (optional)
+        Print when the interaction partners are generated.
 
     Returns
     -------
@@ -120,7 +122,8 @@ def gather_interactions(df, ligand_rings):
             
         # Add the column name and its value to the dictionary
         unique_columns_rings[index] = col_name
-    print("\033[1minteraction partners generated\033[0m")
+    if verbose:
+        print("\033[1minteraction partners generated\033[0m")
 
     return unique_columns_rings_grouped
 
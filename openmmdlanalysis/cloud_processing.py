@@ -0,0 +1,295 @@
+import os
+import base64
+import numpy as np
+
+
+def grid_dimensions(coordinates, spacing=0.5, padding=3.0):
+    """Calculates the origin and shape of a regular grid enclosing all coordinates.
+
+    Args:
+        coordinates (numpy array): coordinates of shape (points, 3)
+        spacing (float, optional): edge length of the grid cells in Angstrom. Defaults to 0.5.
+        padding (float, optional): distance between the outermost points and the border of the grid in Angstrom. Defaults to 3.0.
+
+    Returns:
+        tuple: origin (numpy array of the coordinates of the first grid point) and shape (tuple of the number of grid points per axis)
+    """
+    coordinates = np.asarray(coordinates, dtype=float).reshape(-1, 3)
+    origin = coordinates.min(axis=0) - padding
+    shape = tuple(np.ceil((coordinates.max(axis=0) + padding - origin) / spacing).astype(int) + 1)
+    return origin, shape
+
+
+def gaussian_smooth(grid, sigma):
+    """Smoothes a grid with a separable gaussian kernel.
+
+    Args:
+        grid (numpy array): 3D grid to smooth
+        sigma (float): standard deviation of the gaussian kernel in grid cells
+
+    Returns:
+        numpy array: the smoothed grid with the same shape
+    """
+    radius = max(1, int(np.ceil(3 * sigma)))
+    offsets = np.arange(-radius, radius + 1)
+    kernel = np.exp(-0.5 * (offsets / sigma) ** 2)
+    kernel /= kernel.sum()
+
+    for axis in range(3):
+        pad_width = [(0, 0)] * 3
+        pad_width[axis] = (radius, radius)
+        padded = np.pad(grid, pad_width)
+        length = grid.shape[axis]
+        # sum of the shifted grids weighted by the kernel
+        grid = sum(weight * padded.take(np.arange(shift, shift + length), axis=axis) for shift, weight in enumerate(kernel))
+    return grid
+
+
+def density_grid(coordinates, origin, shape, spacing=0.5, sigma=1.0, n_frames=None):
+    """Generates a volumetric density grid from interaction points with a 3D histogram and optional gaussian kernel density smoothing.
+
+    Args:
+        coordinates (numpy array): coordinates of the interaction points of shape (points, 3)
+        origin (numpy array): coordinates of the first grid point (see grid_dimensions)
+        shape (tuple): number of grid points per axis (see grid_dimensions)
+        spacing (float, optional): edge length of the grid cells in Angstrom. Defaults to 0.5.
+        sigma (float, optional): standard deviation of the gaussian kernel in Angstrom, None or 0 for the plain histogram. Defaults to 1.0.
+        n_frames (int, optional): number of frames to normalize the density to occurrences per frame. Defaults to None.
+
+    Returns:
+        numpy array: float32 grid with the (smoothed) number of points per grid cell
+    """
+    coordinates = np.asarray(coordinates, dtype=float).reshape(-1, 3)
+    # the grid points are the centers of the histogram bins
+    edges = [origin[axis] - spacing / 2 + spacing * np.arange(shape[axis] + 1) for axis in range(3)]
+    grid, _ = np.histogramdd(coordinates, bins=edges)
+    if sigma:
+        grid = gaussian_smooth(grid, sigma / spacing)
+    if n_frames:
+        grid = grid / n_frames
+    return grid.astype(np.float32)
+
+
+def interaction_density_grids(clouds, spacing=0.5, padding=3.0, sigma=1.0, n_frames=None):
+    """Generates density grids for all interaction types on one common grid, so the maps can be overlaid.
+
+    Args:
+        clouds (dict): interaction clouds as generated by cloud_json_generation
+        spacing (float, optional): edge length of the grid cells in Angstrom. Defaults to 0.5.
+        padding (float, optional): distance between the outermost points and the border of the grid in Angstrom. Defaults to 3.0.
+        sigma (float, optional): standard deviation of the gaussian kernel in Angstrom. Defaults to 1.0.
+        n_frames (int, optional): number of frames to normalize the densities. Defaults to None.
+
+    Returns:
+        tuple: dict with the interaction types as keys and the density grids as values, the origin and the spacing of the grids
+    """
+    points = {name: np.asarray(cloud["coordinates"], dtype=float).reshape(-1, 3) for name, cloud in clouds.items()}
+    points = {name: coordinates for name, coordinates in points.items() if len(coordinates)}
+    if not points:
+        return {}, np.zeros(3), spacing
+
+    origin, shape = grid_dimensions(np.concatenate(list(points.values())), spacing, padding)
+    grids = {name: density_grid(coordinates, origin, shape, spacing, sigma, n_frames) for name, coordinates in points.items()}
+    return grids, origin, spacing
+
+
+def write_dx(file_path, grid, origin, spacing, comment="OpenMMDL Analysis interaction density"):
+    """Writes a density grid as OpenDX map.
+
+    Args:
+        file_path (str): path of the .dx file
+        grid (numpy array): 3D density grid
+        origin (numpy array): coordinates of the first grid point
+        spacing (float): edge length of the grid cells in Angstrom
+        comment (str, optional): comment in the header of the file. Defaults to "OpenMMDL Analysis interaction density".
+    """
+    nx, ny, nz = grid.shape
+    values = grid.ravel()  # z is the fastest changing index in OpenDX
+    full_lines = len(values) // 3 * 3
+    with open(file_path, "w") as f:
+        f.write(f"# {comment}\n")
+        f.write(f"object 1 class gridpositions counts {nx} {ny} {nz}\n")
+        f.write(f"origin {origin[0]:.6f} {origin[1]:.6f} {origin[2]:.6f}\n")
+        f.write(f"delta {spacing:.6f} 0 0\ndelta 0 {spacing:.6f} 0\ndelta 0 0 {spacing:.6f}\n")
+        f.write(f"object 2 class gridconnections counts {nx} {ny} {nz}\n")
+        f.write(f"object 3 class array type double rank 0 items {values.size} data follows\n")
+        np.savetxt(f, values[:full_lines].reshape(-1, 3), fmt="%.6g")
+        if full_lines < len(values):
+            np.savetxt(f, values[full_lines:].reshape(1, -1), fmt="%.6g")
+        f.write('attribute "dep" string "positions"\n')
+        f.write('object "density" class field\ncomponent "positions" value 1\ncomponent "connections" value 2\ncomponent "data" value 3\n')
+
+
+def write_density_maps(clouds, output_dir="Interaction_Maps", spacing=0.5, padding=3.0, sigma=1.0, n_frames=None):
+    """Writes an OpenDX density map for each interaction type of the interaction clouds.
+
+    Args:
+        clouds (dict): interaction clouds as generated by cloud_json_generation
+        output_dir (str, optional): directory for the .dx files. Defaults to "Interaction_Maps".
+        spacing (float, optional): edge length of the grid cells in Angstrom. Defaults to 0.5.
+        padding (float, optional): distance between the outermost points and the border of the grid in Angstrom. Defaults to 3.0.
+        sigma (float, optional): standard deviation of the gaussian kernel in Angstrom. Defaults to 1.0.
+        n_frames (int, optional): number of frames to normalize the densities. Defaults to None.
+
+    Returns:
+        dict: interaction types as keys and paths of the .dx files as values
+    """
+    grids, origin, spacing = interaction_density_grids(clouds, spacing, padding, sigma, n_frames)
+    os.makedirs(output_dir, exist_ok=True)
+    density_maps = {}
+    for name, grid in grids.items():
+        density_maps[name] = os.path.join(output_dir, f"{name}.dx")
+        write_dx(density_maps[name], grid, origin, spacing, comment=f"OpenMMDL Analysis {name} interaction density")
+    return density_maps
+
+
+def voxel_downsample(coordinates, voxel_size=0.5):
+    """Merges the points of a cloud within the same voxel of a regular grid to their centroid.
+
+    Args:
+        coordinates (numpy array): coordinates of the points of shape (points, 3)
+        voxel_size (float, optional): edge length of the voxels in Angstrom. Defaults to 0.5.
+
+    Returns:
+        tuple: float32 array with the centroids of the occupied voxels and int64 array with the number of points (weight) of each centroid
+    """
+    coordinates = np.asarray(coordinates, dtype=float).reshape(-1, 3)
+    if not len(coordinates):
+        return np.empty((0, 3), dtype=np.float32), np.empty(0, dtype=np.int64)
+    voxels = np.floor(coordinates / voxel_size).astype(np.int64)
+    _, voxel_codes = np.unique(voxels, axis=0, return_inverse=True)
+    voxel_codes = voxel_codes.ravel()
+    weights = np.bincount(voxel_codes)
+    centroids = np.stack([np.bincount(voxel_codes, weights=coordinates[:, axis]) for axis in range(3)], axis=1) / weights[:, None]
+    return centroids.astype(np.float32), weights
+
+
+def random_downsample(coordinates, max_points, seed=0):
+    """Draws a uniform random sample of at most max_points points of a cloud, keeping their original order.
+
+    Args:
+        coordinates (numpy array): coordinates of the points of shape (points, 3)
+        max_points (int): maximum number of points
+        seed (int, optional): seed of the random number generator. Defaults to 0.
+
+    Returns:
+        numpy array: float32 array with the sampled coordinates
+    """
+    coordinates = np.asarray(coordinates, dtype=np.float32).reshape(-1, 3)
+    if len(coordinates) <= max_points:
+        return coordinates
+    sample = np.sort(np.random.default_rng(seed).choice(len(coordinates), size=max_points, replace=False))
+    return coordinates[sample]
+
+
+def downsample_cloud(coordinates, max_points=50000, method="voxel", voxel_size=0.5, seed=0):
+    """Reduces a cloud to at most max_points points.
+
+    Args:
+        coordinates (numpy array): coordinates of the points of shape (points, 3)
+        max_points (int, optional): maximum number of points. Defaults to 50000.
+        method (str, optional): "voxel" merges the points per voxel before sampling, "random" samples the points uniformly. Defaults to "voxel".
+        voxel_size (float, optional): edge length of the voxels in Angstrom. Defaults to 0.5.
+        seed (int, optional): seed of the random number generator. Defaults to 0.
+
+    Returns:
+        numpy array: float32 array with the downsampled coordinates
+    """
+    coordinates = np.asarray(coordinates, dtype=np.float32).reshape(-1, 3)
+    if len(coordinates) <= max_points:
+        return coordinates
+    if method == "voxel":
+        coordinates, _ = voxel_downsample(coordinates, voxel_size)
+    elif method != "random":
+        raise ValueError(f"Unknown downsampling method: {method}")
+    return random_downsample(coordinates, max_points, seed)
+
+
+def bounded_cloud(coordinates, max_points=500, voxel_size=0.5):
+    """Clusters a cloud to at most max_points weighted points by merging the points per voxel and coarsening the voxels until the bound is met.
+
+    Args:
+        coordinates (numpy array): coordinates of the points of shape (points, 3)
+        max_points (int, optional): maximum number of weighted points. Defaults to 500.
+        voxel_size (float, optional): initial edge length of the voxels in Angstrom, doubled until the cloud has at most max_points points. Defaults to 0.5.
+
+    Returns:
+        tuple: float32 array with the centroids and int64 array with the number of merged points (weight) of each centroid, sorted by decreasing weight
+
+    Raises:
+        ValueError: if max_points is smaller than 1
+    """
+    if max_points < 1:
+        raise ValueError(f"max_points has to be at least 1, got {max_points}")
+    coordinates = np.asarray(coordinates, dtype=float).reshape(-1, 3)
+    # The voxel grid starts at the lowest corner of the cloud, so voxels larger than the cloud merge it to a single point
+    origin = coordinates.min(axis=0) if len(coordinates) else np.zeros(3)
+    centroids, weights = voxel_downsample(coordinates - origin, voxel_size)
+    while len(centroids) > max_points:
+        voxel_size *= 2
+        centroids, weights = voxel_downsample(coordinates - origin, voxel_size)
+    order = np.argsort(-weights, kind="stable")
+    return (centroids[order] + origin).astype(np.float32), weights[order]
+
+
+def save_clouds_npz(clouds, file_path):
+    """Saves interaction clouds as compressed float32 arrays.
+
+    Args:
+        clouds (dict): interaction clouds as generated by cloud_json_generation
+        file_path (str): path of the .npz file
+    """
+    arrays = {}
+    for name, cloud in clouds.items():
+        arrays[f"{name}_coordinates"] = np.asarray(cloud["coordinates"], dtype=np.float32).reshape(-1, 3)
+        arrays[f"{name}_color"] = np.asarray(cloud["color"], dtype=np.float32)
+        arrays[f"{name}_radius"] = np.float32(cloud["radius"])
+    np.savez_compressed(file_path, **arrays)
+
+
+def load_clouds_npz(file_path):
+    """Loads interaction clouds saved with save_clouds_npz.
+
+    Args:
+        file_path (str): path of the .npz file
+
+    Returns:
+        dict: interaction clouds with float32 coordinate arrays
+    """
+    clouds = {}
+    with np.load(file_path) as arrays:
+        for key in arrays.files:
+            if key.endswith("_coordinates"):
+                name = key[:-len("_coordinates")]
+                clouds[name] = {"coordinates": arrays[key], "color": arrays[f"{name}_color"].tolist(), "radius": float(arrays[f"{name}_radius"])}
+    return clouds
+
+
+def sphere_buffer_js(name, coordinates, color, radius):
+    """Generates the javascript adding a cloud as NGL sphere buffer, the positions are sent as base64 encoded Float32Array.
+
+    Args:
+        name (str): name of the NGL shape
+        coordinates (numpy array): coordinates of the spheres of shape (points, 3)
+        color (list): RGB color of the spheres
+        radius (float): radius of the spheres
+
+    Returns:
+        str: javascript for nglview's view._js
+    """
+    positions = base64.b64encode(np.ascontiguousarray(coordinates, dtype="<f4").tobytes()).decode("ascii")
+    return f"""
+        var binary = atob('{positions}');
+        var bytes = new Uint8Array(binary.length);
+        for (var i = 0; i < binary.length; i++) {{ bytes[i] = binary.charCodeAt(i); }}
+        var position = new Float32Array(bytes.buffer);
+        var n = position.length / 3;
+        var color = new Float32Array(position.length);
+        for (var i = 0; i < n; i++) {{ color.set([{color[0]}, {color[1]}, {color[2]}], 3 * i); }}
+        var radius = new Float32Array(n).fill({radius});
+        var shape = new NGL.Shape('{name}');
+        var buffer = new NGL.SphereBuffer({{position: position, color: color, radius: radius}});
+        shape.addBuffer(buffer);
+        var shapeComp = this.stage.addComponentFromObject(shape);
+        shapeComp.addRepresentation("buffer");
+        """
@@ -0,0 +1,101 @@
+import time
+import matplotlib
+import matplotlib.pyplot as plt
+from multiprocessing import Pool
+from contextlib import nullcontext
+
+
+def init_figure_worker():
+    """
+    Selects the non-interactive Agg backend in a worker process of a figure rendering pool, the backend of the importing process is kept.
+    """
+    matplotlib.use("Agg")
+
+
+def figure_job(name, function, *args, **kwargs):
+    """
+    Creates a self-contained figure rendering job.
+
+    Parameters
+    ----------
+    name : str
+        Unique name of the job, used to report the wall time and to look up the result.
+    function : callable
+        Module level function generating the figure (has to be picklable).
+    *args :
+        Positional arguments passed to the function.
+    **kwargs :
+        Keyword arguments passed to the function.
+
+    Returns
+    -------
+    tuple :
+        The job as tuple of name, function, args and kwargs.
+    """
+    return name, function, args, kwargs
+
+
+def run_figure_job(job):
+    """
+    Runs a single figure rendering job and closes all figures it opened.
+
+    Parameters
+    ----------
+    job : tuple
+        Job created by figure_job.
+
+    Returns
+    -------
+    tuple :
+        Name of the job, return value of the function (None if it failed), wall time in seconds and the error message (None if it succeeded).
+    """
+    name, function, args, kwargs = job
+    start_time = time.perf_counter()
+    result = None
+    error = None
+    try:
+        result = function(*args, **kwargs)
+    except Exception as exception:
+        error = f"{type(exception).__name__}: {exception}"
+    finally:
+        plt.close('all')
+
+    return name, result, time.perf_counter() - start_time, error
+
+
+def render_figures(figure_jobs, num_processes=4, pool=None, verbose=True):
+    """
+    Renders figures in parallel with a process pool and reports the wall time of each job if verbose.
+
+    Parameters
+    ----------
+    figure_jobs : list of tuple
+        Jobs created by figure_job.
+    num_processes : int (optional)
+        The number of processes used for the rendering.
+    pool : multiprocessing.pool.Pool (optional)
+        A running worker pool used for the rendering instead of a new pool, its workers should use the Agg backend (see init_figure_worker).
+    verbose : bool (optional)
+        Print the wall time of each job and of the whole rendering.
+
+    Returns
+    -------
+    dict :
+        Name of the job as key and the return value of the job function as value (None for failed jobs).
+    """
+    results = {}
+    if not figure_jobs:
+        return results
+
+    if verbose:
+        print(f"\033[1mRendering {len(figure_jobs)} figures with {num_processes} CPUs\033[0m")
+    start_time = time.perf_counter()
+    with Pool(processes=max(1, min(num_processes, len(figure_jobs))), initializer=init_figure_worker) if pool is None else nullcontext(pool) as worker_pool:
+        for name, result, wall_time, error in worker_pool.imap_unordered(run_figure_job, figure_jobs):
+            if verbose:
+                print(f"{name}: {wall_time:.2f} s" if error is None else f"{name}: failed after {wall_time:.2f} s ({error})")
+            results[name] = result
+    if verbose:
+        print(f"\033[1mFigures rendered in {time.perf_counter() - start_time:.2f} s\033[0m")
+
+    return results
@@ -1,4 +1,7 @@
 import os
+import queue
+import warnings
+import numpy as np
 import pandas as pd
 import MDAnalysis as mda
 from tqdm import tqdm
@@ -6,6 +9,11 @@ from plip.structure.preparation import PDBComplex, LigandFinder, Mol, PLInteract
 from plip.exchange.report import BindingSiteReport
 from multiprocessing import Pool
 from functools import partial
+from itertools import islice
+from contextlib import nullcontext
+from io import StringIO
+
+from openmmdlanalysis.preprocessing import rename_residues
 
 
 def characterize_complex(pdb_file: str, binding_site_id: str) -> PLInteraction:
@@ -33,7 +41,7 @@ def characterize_complex(pdb_file: str, binding_site_id: str) -> PLInteraction:
     return pdb_complex.interaction_sets[binding_site_id]
 
 
-def retrieve_plip_interactions(pdb_file):
+def retrieve_plip_interactions(pdb_file, as_string=False):
     """
     Retrieves the interactions from PLIP.
 
@@ -41,6 +49,8 @@ def retrieve_plip_interactions(pdb_file):
     ----------
     pdb_file :
         The PDB file of the complex.
+    as_string : bool (optional)
+        If True, pdb_file is the content of the PDB file as string instead of its path.
 
     Returns
     -------
@@ -48,7 +58,7 @@ def retrieve_plip_interactions(pdb_file):
         A dictionary of the binding sites and the interactions.
     """
     protlig = PDBComplex()
-    protlig.load_pdb(pdb_file)  # load the pdb file
+    protlig.load_pdb(pdb_file, as_string=as_string)  # load the pdb file
     for ligand in protlig.ligands:
         protlig.characterize_complex(ligand)  # find ligands and analyze interactions
     sites = {}
@@ -119,6 +129,65 @@ def create_df_from_binding_site(selected_site_interactions, interaction_type="hb
     return df
 
 
+def add_coordinate_columns(df, coordinate_columns=("LIGCOO", "PROTCOO")):
+    """
+    Adds numeric float32 x, y and z columns for the PLIP coordinate tuples of the ligand and the protein.
+    The coordinates are taken from the tuples of freshly collected PLIP results or parsed from their string form after reading a csv file.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        DataFrame containing the interaction data with the LIGCOO and PROTCOO columns.
+    coordinate_columns : tuple of str (optional)
+        Names of the coordinate columns that are converted.
+
+    Returns
+    -------
+    pd.DataFrame :
+        The DataFrame with the additional columns (e.g. LIGCOO_X, LIGCOO_Y, LIGCOO_Z), rows without coordinates are NaN.
+    """
+    for column in coordinate_columns:
+        axis_columns = [f"{column}_{axis_name}" for axis_name in ["X", "Y", "Z"]]
+        if all(axis_column in df.columns for axis_column in axis_columns):
+            # The numeric columns already exist, e.g. in a csv file written after the trajectory processing
+            coordinates = df[axis_columns].to_numpy(dtype=np.float32)
+        else:
+            values = df[column].to_numpy(dtype=object)
+            is_tuple = np.array([isinstance(value, (tuple, list)) and len(value) == 3 for value in values], dtype=bool)
+            coordinates = np.full((len(values), 3), np.nan, dtype=np.float32)
+            if is_tuple.any():
+                coordinates[is_tuple] = np.array(values[is_tuple].tolist(), dtype=np.float32)
+            if not is_tuple.all():
+                parsed = pd.Series(values[~is_tuple]).astype(str).str.extract(r'\(([\d.-]+), ([\d.-]+), ([\d.-]+)\)')
+                coordinates[~is_tuple] = parsed.to_numpy(dtype=np.float32)
+        for axis, axis_column in enumerate(axis_columns):
+            df[axis_column] = coordinates[:, axis]
+
+    return df
+
+
+def pdb_string(atoms):
+    """
+    Writes the atoms of the current frame as PDB block in memory.
+
+    Parameters
+    ----------
+    atoms : mda.AtomGroup
+        The atoms that are written.
+
+    Returns
+    -------
+    str :
+        The PDB block of the atoms.
+    """
+    stream = mda.lib.util.NamedStream(StringIO(), "frame.pdb")
+    with mda.Writer(stream, atoms.n_atoms, multiframe=False) as writer:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            writer.write(atoms)
+    return stream.read()
+
+
 def process_frame(frame, pdb_md):
     """
     Process a single frame of MD simulation.
@@ -136,9 +205,9 @@ def process_frame(frame, pdb_md):
         A dataframe conatining the interaction data for the processed frame.
     """
     atoms_selected = pdb_md.select_atoms("protein or resname UNK or (resname HOH and around 10 resname UNK)")
-    for num in pdb_md.trajectory[(frame):(frame+1)]:
-        atoms_selected.write(f'{frame}.pdb')
-    interactions_by_site = retrieve_plip_interactions(f"{frame}.pdb")
+    # The frame is passed to PLIP in memory instead of a temporary PDB file
+    pdb_md.trajectory[frame]
+    interactions_by_site = retrieve_plip_interactions(pdb_string(atoms_selected), as_string=True)
     index_of_selected_site = -1
     selected_site = list(interactions_by_site.keys())[index_of_selected_site]
 
@@ -151,8 +220,6 @@ def process_frame(frame, pdb_md):
         tmp_interaction['INTERACTION'] = interaction_type
         interaction_list = pd.concat([interaction_list, tmp_interaction])
 
-    os.remove(f"{frame}.pdb")
-
     return interaction_list
 
 
@@ -178,7 +245,7 @@ def process_frame_wrapper(args):
     return frame_idx, process_frame(frame_idx, pdb_md)
 
 
-def process_trajectory(pdb_md, dataframe, num_processes=4):
+def process_trajectory(pdb_md, dataframe, num_processes=4, output_csv="interactions_gathered.csv", pool=None, verbose=True):
     """
     Process protein-ligand trajectory with multiple CPUs in parallel.
 
@@ -190,25 +257,32 @@ def process_trajectory(pdb_md, dataframe, num_processes=4):
         Name of a CSV file as str, where the interaction data will be read from if not None.
     num_processes : int (optional)
         The number of CPUs that will be used for the processing of the protein-ligand trajectory
-        
+    output_csv : str (optional)
+        Name of the CSV file the gathered interactions are written to, None keeps them only in memory.
+    pool : multiprocessing.pool.Pool (optional)
+        A running worker pool used instead of a new pool.
+    verbose : bool (optional)
+        Print the progress and show a progress bar.
+
     Returns
     -------
     pd.DataFrame :
         A DataFrame containing all the protein-ligand interaction data from the whole trajectory.
     """
     if dataframe is None:
-        print("\033[1mProcessing protein-ligand trajectory\033[0m")
-        print(f"\033[1mUsing {num_processes} CPUs\033[0m")
+        if verbose:
+            print("\033[1mProcessing protein-ligand trajectory\033[0m")
+            print(f"\033[1mUsing {num_processes} CPUs\033[0m")
         total_frames = len(pdb_md.trajectory) - 1
 
-        with Pool(processes=num_processes) as pool:
+        with Pool(processes=num_processes) if pool is None else nullcontext(pool) as worker_pool:
             frame_args = [(i, pdb_md) for i in range(1, total_frames + 1)]
             
             # Initialize the progress bar with the total number of frames
-            pbar = tqdm(total=total_frames, ascii=True, desc="Analyzing frames")
+            pbar = tqdm(total=total_frames, ascii=True, desc="Analyzing frames", disable=not verbose)
             
             results = []
-            for result in pool.imap(process_frame_wrapper, frame_args):
+            for result in worker_pool.imap(process_frame_wrapper, frame_args):
                 results.append(result)
                 pbar.update(1)  # Update the progress manually
 
@@ -220,13 +294,164 @@ def process_trajectory(pdb_md, dataframe, num_processes=4):
         interaction_lists = [result[1] for result in results]
 
         interaction_list = pd.concat(interaction_lists)
+        add_coordinate_columns(interaction_list)
 
-        interaction_list.to_csv("interactions_gathered.csv")
+        if output_csv is not None:
+            interaction_list.to_csv(output_csv)
     elif dataframe is not None:
-        print(f"\033[1mGathering data from {dataframe}\033[0m")
+        if verbose:
+            print(f"\033[1mGathering data from {dataframe}\033[0m")
         interaction_tmp = pd.read_csv(dataframe)
         interaction_list = interaction_tmp.drop(interaction_tmp.columns[0], axis=1)
+        add_coordinate_columns(interaction_list)
 
-    print("\033[1mProtein-ligand trajectory processed\033[0m")
+    if verbose:
+        print("\033[1mProtein-ligand trajectory processed\033[0m")
     
     return interaction_list
+
+
+# Universe of the system last processed by a worker process, the frames of a system are scheduled consecutively.
+# The process id is part of the key, a forked worker does not reuse a Universe of its parent, whose trajectory file handle it would share.
+_worker_universe = {}
+
+
+def trajectory_length(trajectory):
+    """
+    Reads the number of frames of a trajectory without loading its topology.
+
+    Parameters
+    ----------
+    trajectory : str
+        Path to the trajectory file.
+
+    Returns
+    -------
+    int :
+        The number of frames of the trajectory.
+    """
+    with mda.coordinates.core.get_reader_for(trajectory)(trajectory) as reader:
+        return reader.n_frames
+
+
+def load_worker_universe(topology, trajectory):
+    """
+    Loads the Universe of a system once per worker process, the water and ligand residues are renamed in memory.
+
+    Parameters
+    ----------
+    topology : str
+        Path to the topology file.
+    trajectory : str
+        Path to the trajectory file.
+
+    Returns
+    -------
+    mda.Universe :
+        The Universe of the topology and trajectory.
+    """
+    key = (os.getpid(), topology, trajectory)
+    if key not in _worker_universe:
+        _worker_universe.clear()
+        pdb_md = mda.Universe(topology, trajectory)
+        rename_residues(pdb_md)
+        _worker_universe[key] = pdb_md
+    return _worker_universe[key]
+
+
+def process_system_frames_wrapper(args):
+    """
+    Wrapper for the procession of a chunk of frames of one of several systems.
+
+    Parameters
+    ----------
+    args : tuple
+        - system : str
+            Name of the system.
+        - topology : str
+            Path to the topology file of the system.
+        - trajectory : str
+            Path to the trajectory file of the system.
+        - frames : list of int
+            The indices of the processing frames.
+
+    Returns
+    -------
+    tuple :
+        tuple containing the system and a list of the frame indices with the results of `process_frame`.
+    """
+    system, topology, trajectory, frames = args
+    pdb_md = load_worker_universe(topology, trajectory)
+
+    return system, [(frame_idx, process_frame(frame_idx, pdb_md)) for frame_idx in frames]
+
+
+def process_trajectories(systems, pool, chunksize=1, max_pending_chunks=8, verbose=True):
+    """
+    Process the trajectories of several systems on one worker pool. The frames are scheduled system after system, while the workers
+    process the last frames of a system they continue with the frames of the next system.
+
+    Only max_pending_chunks chunks of frames are queued on the pool at a time, the queue is topped up whenever a finished chunk is collected
+    and before a finished system is yielded. So the pool continues with the queued chunks while the caller handles a finished system, and
+    tasks that the caller submits to the same pool wait for at most max_pending_chunks chunks of frames. No chunks are submitted after the
+    generator is closed, the chunks still queued at that time are finished by the pool but their results are discarded.
+
+    Parameters
+    ----------
+    systems : dict
+        Name of the system as key and a tuple of the topology and trajectory paths as value.
+    pool : multiprocessing.pool.Pool
+        The worker pool processing the frames.
+    chunksize : int (optional)
+        The number of frames sent to a worker at once.
+    max_pending_chunks : int (optional)
+        The number of chunks of frames queued on the pool at a time, at least the number of processes of the pool keeps all workers busy.
+    verbose : bool (optional)
+        Print the progress and show a progress bar.
+
+    Yields
+    ------
+    tuple :
+        The name of the system and a DataFrame with its protein-ligand interaction data, as soon as all frames of the system are processed.
+    """
+    remaining_frames = {system: trajectory_length(trajectory) - 1 for system, (topology, trajectory) in systems.items()}
+    empty_systems = [system for system, total_frames in remaining_frames.items() if total_frames < 1]
+    if empty_systems:
+        raise ValueError(f"The trajectories of {empty_systems} have no frames to analyse")
+    chunks = iter([(system, topology, trajectory, list(range(start, min(start + chunksize, remaining_frames[system] + 1))))
+                   for system, (topology, trajectory) in systems.items() for start in range(1, remaining_frames[system] + 1, chunksize)])
+
+    max_pending_chunks = max(1, max_pending_chunks)
+    pending_chunks = 0
+
+    def submit_chunks():
+        # The callbacks run on the result handler thread of the pool and only collect the results, chunks are submitted from this generator
+        nonlocal pending_chunks
+        for chunk in islice(chunks, max_pending_chunks - pending_chunks):
+            pool.apply_async(process_system_frames_wrapper, (chunk,), callback=finished_chunks.put, error_callback=finished_chunks.put)
+            pending_chunks += 1
+
+    finished_chunks = queue.SimpleQueue()
+    if verbose:
+        print("\033[1mProcessing protein-ligand trajectories\033[0m")
+    pbar = tqdm(total=sum(remaining_frames.values()), ascii=True, desc="Analyzing frames", disable=not verbose)
+    results = {system: [] for system in systems}
+    try:
+        while results:
+            submit_chunks()
+            result = finished_chunks.get()
+            pending_chunks -= 1
+            if isinstance(result, BaseException):
+                raise result
+            system, frame_results = result
+            results[system].extend(frame_results)
+            remaining_frames[system] -= len(frame_results)
+            pbar.update(len(frame_results))
+            if remaining_frames[system] == 0:
+                system_results = sorted(results.pop(system), key=lambda x: x[0])
+                interaction_list = pd.concat([result[1] for result in system_results])
+                add_coordinate_columns(interaction_list)
+                submit_chunks()
+                yield system, interaction_list
+    finally:
+        pbar.close()
@@ -1,3 +1,6 @@
+import os
+import pickle
+import hashlib
 import rdkit
 from rdkit import Chem
 from rdkit.Chem import Draw
@@ -51,3 +54,77 @@ def convert_ligand_to_smiles(input_sdf, output_smi):
             else:
             	print("nono")
 
+
+def ligand_cache_key(*paths, lig_index=0):
+    """
+    Generates the cache key of a prepared ligand from the content of the ligand files and the ligand atom index offset.
+
+    Parameters
+    ----------
+    *paths : str or bytes
+        Paths to the ligand files, for example the SDF and PDB file of the ligand, or the file contents as bytes.
+    lig_index : int (optional)
+        The first atom index of the ligand in the protein-ligand complex.
+
+    Returns
+    -------
+    str :
+        The SHA-256 hash of the files and the atom index offset.
+    """
+    file_hash = hashlib.sha256()
+    for path in paths:
+        if isinstance(path, bytes):
+            file_hash.update(path)
+            continue
+        with open(path, "rb") as ligand_file:
+            file_hash.update(ligand_file.read())
+    file_hash.update(str(lig_index).encode())
+
+    return file_hash.hexdigest()
+
+
+def prepare_ligand(ligand_sdf, ligand_pdb, lig_index, cache_dir=".ligand_cache", pdb_block=None):
+    """
+    Prepares the ligand once for all 2D depictions, assigning the bond orders of the SDF to the ligand of the topology
+    and computing the 2D coordinates and ring information. The prepared ligand is cached on disk keyed by the hash of the SDF and PDB file.
+
+    Parameters
+    ----------
+    ligand_sdf : str
+        Path to the SDF file of the ligand used as bond order template.
+    ligand_pdb : str
+        Path to the PDB file of the ligand written from the topology, None if the pdb_block is given.
+    lig_index : int
+        The first atom index of the ligand in the protein-ligand complex.
+    cache_dir : str (optional)
+        Folder of the prepared ligand cache, None disables the cache.
+    pdb_block : str (optional)
+        PDB block of the ligand written in memory, used instead of the ligand_pdb file.
+
+    Returns
+    -------
+    dict :
+        A dictionary with the prepared ligand (mol) with 2D coordinates, its SMILES, the ligand rings (rings)
+        with the atom indices of the protein-ligand complex and the atom index offset (lig_index).
+    """
+    cache_path = None
+    if cache_dir is not None:
+        cache_path = os.path.join(cache_dir, f"{ligand_cache_key(ligand_sdf, ligand_pdb if pdb_block is None else pdb_block.encode(), lig_index=lig_index)}.pkl")
+        if os.path.exists(cache_path):
+            with open(cache_path, "rb") as cache_file:
+                return pickle.load(cache_file)
+
+    reference_mol = next(mol for mol in Chem.SDMolSupplier(ligand_sdf) if mol is not None)
+    smiles = Chem.MolToSmiles(reference_mol)
+    lig_rd = Chem.rdmolfiles.MolFromPDBFile(ligand_pdb) if pdb_block is None else Chem.rdmolfiles.MolFromPDBBlock(pdb_block)
+    prepared_ligand = AllChem.AssignBondOrdersFromTemplate(Chem.MolFromSmiles(smiles), lig_rd)
+    AllChem.Compute2DCoords(prepared_ligand)
+    rings = [increase_ring_indices(atom_ring, lig_index) for atom_ring in lig_rd.GetRingInfo().AtomRings()]
+    ligand = {'mol': prepared_ligand, 'smiles': smiles, 'rings': rings, 'lig_index': lig_index}
+
+    if cache_path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(cache_path, "wb") as cache_file:
+            pickle.dump(ligand, cache_file)
+
+    return ligand
@@ -1,6 +1,8 @@
 import networkx as nx
+import numpy as np
 import matplotlib.pyplot as plt
 import os
+import json
 
 def min_transition_calculation(min_transition):
     """
@@ -20,7 +22,145 @@ def min_transition_calculation(min_transition):
     
     return min_transitions
 
-def binding_site_markov_network(total_frames, min_transitions, combined_dict, font_size=None, size_node=None):
+def transition_counts(states):
+    """
+    Counts the occurrences of the states and the transitions between consecutive states with integer encoded states.
+
+    Parameters
+    ----------
+    states : list of str
+        The Binding Modes in their order of appearance during the simulation.
+
+    Returns
+    -------
+    dict :
+        A dictionary with the arrays
+        - states : the unique states, the integer code of a state is its index in this array.
+        - codes : the integer encoded sequence of states.
+        - occurrences : the number of occurrences of each state.
+        - part_occurrences : the number of occurrences of each state in each third of the simulation, shape (3, states).
+        - from, to, counts : the sparse transition count matrix (including self-loops) as coordinates and counts.
+    """
+    unique_states, codes = np.unique(np.asarray(states, dtype=str), return_inverse=True)
+    n_states = len(unique_states)
+    occurrences = np.bincount(codes, minlength=n_states)
+
+    # The first third also contains the remaining elements
+    part_length = len(codes) // 3
+    part1_length = part_length + len(codes) % 3
+    parts = np.repeat([0, 1, 2], [part1_length, part_length, part_length])
+    part_occurrences = np.bincount(parts * n_states + codes, minlength=3 * n_states).reshape(3, n_states)
+
+    # Encode each transition as a single integer and count the distinct transitions
+    transition_keys, counts = np.unique(codes[:-1].astype(np.int64) * n_states + codes[1:], return_counts=True)
+
+    return {
+        'states': unique_states.astype(object),
+        'codes': codes,
+        'occurrences': occurrences,
+        'part_occurrences': part_occurrences,
+        'from': transition_keys // n_states,
+        'to': transition_keys % n_states,
+        'counts': counts,
+    }
+
+
+def markov_network_graph(combined_dict, edge_probabilities=None):
+    """
+    Generates the directed graph of the binding modes with all transitions and self-loops.
+
+    Parameters
+    ----------
+    combined_dict : dict
+        A dictionary with the information of the Binding Modes and their order of appearance during the simulation for all frames.
+    edge_probabilities (optional) : dict
+        Transition probabilities of a Markov state model (see markov_state_model.edge_probabilities) used as forward and backward
+        transition probabilities instead of the probabilities from the transition counts. The edge weights stay the transition counts.
+
+    Returns
+    -------
+    nx.DiGraph :
+        Graph with the occurrences of the binding modes as node attributes and the percentage of frames of the transition (weight) and
+        the forward and backward transition probabilities as edge attributes. The graph attribute markov_state_model is True if the
+        transition probabilities are taken from the Markov state model.
+    """
+    transitions = transition_counts(combined_dict['all'])
+    states = transitions['states']
+    total_length = len(combined_dict['all'])
+
+    from_states = states[transitions['from']]
+    to_states = states[transitions['to']]
+    counts = transitions['counts']
+    edge_percentages = counts / total_length * 100  # Convert probability to percentage
+    if edge_probabilities is None:
+        forward_probabilities = counts / transitions['occurrences'][transitions['from']]
+        backward_probabilities = counts / transitions['occurrences'][transitions['to']]
+    else:
+        # The transition probabilities of the Markov state model, the edges and their weights stay the observed transitions
+        forward_probabilities = np.array([edge_probabilities.get((u, v), 0) for u, v in zip(from_states, to_states)], dtype=float)
+        backward_probabilities = np.array([edge_probabilities.get((v, u), 0) for u, v in zip(from_states, to_states)], dtype=float)
+    is_self_loop = from_states == to_states
+
+    G = nx.DiGraph(markov_state_model=edge_probabilities is not None)
+    for state, occurrences, part_occurrences in zip(states, transitions['occurrences'], transitions['part_occurrences'].T):
+        G.add_node(state, occurrences=int(occurrences), occurrence_percentage=float(occurrences / total_length * 100),
+                   part1_occurrences=int(part_occurrences[0]), part2_occurrences=int(part_occurrences[1]),
+                   part3_occurrences=int(part_occurrences[2]), self_loop_probability=0.0)
+
+    # Add the transitions before the self-loops
+    for order in (~is_self_loop, is_self_loop):
+        for u, v, weight, forward, backward in zip(from_states[order], to_states[order], edge_percentages[order], forward_probabilities[order], backward_probabilities[order]):
+            G.add_edge(u, v, weight=float(weight), forward_probability=float(forward), backward_probability=float(backward))
+    for u, v, data in G.edges(data=True):
+        if u == v:
+            G.nodes[u]['self_loop_probability'] = data['forward_probability']
+
+    return G
+
+
+def markov_network_layout(G):
+    """
+    Calculates the node positions of the Markov network once, so they can be shared by the plots of all thresholds.
+
+    Parameters
+    ----------
+    G : nx.DiGraph
+        The graph of the binding modes generated by markov_network_graph.
+
+    Returns
+    -------
+    dict :
+        Binding mode as key and its position as value.
+    """
+    return nx.spring_layout(G, k=2, seed=42)  # Increased distance between nodes (k=2)
+
+
+def export_markov_network(G, output_path):
+    """
+    Exports the graph of the binding modes with the occurrences and transition probabilities as GraphML or node-link JSON file for external viewers.
+
+    Parameters
+    ----------
+    G : nx.DiGraph
+        The graph of the binding modes generated by markov_network_graph.
+    output_path : str
+        Path of the output file, the format is chosen by the .graphml or .json extension.
+
+    Returns
+    -------
+    None
+    """
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    if output_path.endswith(".graphml"):
+        nx.write_graphml(G, output_path)
+    elif output_path.endswith(".json"):
+        with open(output_path, "w") as json_file:
+            json.dump(nx.node_link_data(G), json_file, indent=2)
+    else:
+        raise ValueError(f"Unsupported Markov network export format: {output_path}")
+
+
+def binding_site_markov_network(total_frames, min_transitions, combined_dict, font_size=None, size_node=None, edge_probabilities=None, pos=None, output_dir="Binding_Modes_Markov_States"):
     """
     Generate Markov Chain plots based on transition probabilities.
 
@@ -36,6 +176,13 @@ def binding_site_markov_network(total_frames, min_transitions, combined_dict, fo
         The font size for the node labels. The default value is set to 12.
     size_node (optional) : int
         The size of the nodes in the Markov Chain plot. the default value is set to 200.
+    edge_probabilities (optional) : dict
+        Transition probabilities of a Markov state model (see markov_state_model.edge_probabilities) shown on the edges instead of the
+        probabilities from the transition counts. The thresholds still apply to the percentage of frames of the transitions.
+    pos (optional) : dict
+        Node positions generated by markov_network_layout. By default the layout is calculated once for all thresholds.
+    output_dir (optional) : str
+        The folder the plots are saved to. The default folder is Binding_Modes_Markov_States.
 
     Returns
     -------
@@ -44,118 +191,41 @@ def binding_site_markov_network(total_frames, min_transitions, combined_dict, fo
     font_size = 12 if font_size is None else font_size
     size_node = 200 if size_node is None else size_node
 
-    # Calculate the number of elements in each part
-    total_length = len(combined_dict['all'])
-    part_length = total_length // 3
-    remaining_length = total_length % 3
-
-    # Divide the 'all_data' into three parts
-    part1_length = part_length + remaining_length
-    part2_length = part_length
-    part1_data = combined_dict['all'][:part1_length]
-    part2_data = combined_dict['all'][part1_length:part1_length + part2_length]
-    part3_data = combined_dict['all'][part1_length + part2_length:]
-
-    # Count the occurrences of each node in each part
-    part1_node_occurrences = {node: part1_data.count(node) for node in set(part1_data)}
-    part2_node_occurrences = {node: part2_data.count(node) for node in set(part2_data)}
-    part3_node_occurrences = {node: part3_data.count(node) for node in set(part3_data)}
+    G_all = markov_network_graph(combined_dict, edge_probabilities)
+    pos = markov_network_layout(G_all) if pos is None else pos
 
     # Get the top 10 nodes with the most occurrences
-    node_occurrences = {node: combined_dict['all'].count(node) for node in set(combined_dict['all'])}
+    node_occurrences = dict(G_all.nodes(data='occurrences'))
     top_10_nodes = sorted(node_occurrences, key=node_occurrences.get, reverse=True)[:10]
 
     for min_transition_percent in min_transitions:
-        min_prob = min_transition_percent / 100  # Convert percentage to probability
-
-        # Create a directed graph
+        # Keep the transitions and self-loops above the threshold, the thresholds only filter the edges
         G = nx.DiGraph()
-
-        # Count the occurrences of each transition and self-loop
-        transitions = {}
-        self_loops = {}
-        for i in range(len(combined_dict['all']) - 1):
-            current_state = combined_dict['all'][i]
-            next_state = combined_dict['all'][i + 1]
-
-            if current_state == next_state:  # Check for self-loop
-                self_loop = (current_state, next_state)
-                self_loops[self_loop] = self_loops.get(self_loop, 0) + 1
-            else:
-                transition = (current_state, next_state)
-                transitions[transition] = transitions.get(transition, 0) + 1
-
-        # Add edges to the graph with their probabilities
-        for transition, count in transitions.items():
-            current_state, next_state = transition
-            probability = count / len(combined_dict['all']) * 100  # Convert probability to percentage
-            if probability >= min_transition_percent:
-                G.add_edge(current_state, next_state, weight=probability)
-
-        # Add self-loops to the graph with their probabilities
-        for self_loop, count in self_loops.items():
-            state = self_loop[0]
-            probability = count / len(combined_dict['all']) * 100  # Convert probability to percentage
-            if probability >= min_transition_percent:
-                G.add_edge(state, state, weight=probability)
-
-        # Calculate transition probabilities for each direction (excluding self-loops)
-        transition_probabilities_forward = {}
-        transition_probabilities_backward = {}
-
-        for transition, count in transitions.items():
-            start_state, end_state = transition
-            forward_transition = (start_state, end_state)
-            backward_transition = (end_state, start_state)
-
-            transition_probabilities_forward[forward_transition] = count / node_occurrences[start_state]
-            transition_probabilities_backward[backward_transition] = count / node_occurrences[end_state]
-
-        # Calculate self-loop probabilities
-        self_loop_probabilities = {}
-        for self_loop, count in self_loops.items():
-            state = self_loop[0]
-            self_loop_probabilities[state] = count / node_occurrences[state]
+        G.add_edges_from((u, v, data) for u, v, data in G_all.edges(data=True) if data['weight'] >= min_transition_percent)
 
         # Generate the Markov Chain plot
         plt.figure(figsize=(30, 30))  # Increased figure size
         plt.title(f"Markov Chain Plot {min_transition_percent}% Frames Transition", fontsize=35)
 
-        # Draw nodes and edges
-        pos = nx.spring_layout(G, k=2, seed=42)  # Increased distance between nodes (k=2)
-        edge_colors = []
-
-        for u, v, data in G.edges(data=True):
-            weight = data['weight']
-
-            if u == v:  # Check if it is a self-loop
-                edge_colors.append('green')  # Set green color for self-loop arrows
-                width = 0.1  # Make self-loop arrows smaller
-                connection_style = 'arc3,rad=-0.1'  # Make the self-loops more curved and compact
-                nx.draw_networkx_edges(G, pos, edgelist=[(u, v)], width=width, alpha=0.2, edge_color=edge_colors[-1],
-                                       connectionstyle=connection_style)
-            elif weight >= min_transition_percent:
-                edge_colors.append('black')  # Highlight significant transitions in red
-                width = 4.0
-                edge_label = f"{transition_probabilities_forward.get((u, v), 0):.2f}% of Frames →\n{transition_probabilities_backward.get((v, u), 0):.2f}% of Frames ←"
-                connection_style = 'arc3,rad=-0.1'
-                nx.draw_networkx_edges(G, pos, edgelist=[(u, v)], width=width, alpha=0.7, edge_color=edge_colors[-1], connectionstyle=connection_style)
-                nx.draw_networkx_edge_labels(G, pos, edge_labels={(u, v): edge_label}, font_size=15)
-            else:
-                edge_colors.append('grey')  # Use black for non-significant transitions
-                width = 0.5
-                edge_label = f"{transition_probabilities_forward.get((u, v), 0):.2f}% of Frames →\n{transition_probabilities_backward.get((v, u), 0):.2f}% of Frames ←"
-                connection_style = 'arc3,rad=-0.1'
-                nx.draw_networkx_edges(G, pos, edgelist=[(u, v)], width=width, alpha=0.7, edge_color=edge_colors[-1], connectionstyle=connection_style)
-                nx.draw_networkx_edge_labels(G, pos, edge_labels={(u, v): edge_label}, font_size=12)
+        # Draw all self-loops and all transitions with one call each
+        self_loops = [(u, v) for u, v in G.edges() if u == v]
+        significant_transitions = [(u, v) for u, v in G.edges() if u != v]
+        nx.draw_networkx_edges(G, pos, edgelist=self_loops, width=0.1, alpha=0.2, edge_color='green', connectionstyle='arc3,rad=-0.1')
+        nx.draw_networkx_edges(G, pos, edgelist=significant_transitions, width=4.0, alpha=0.7, edge_color='black', connectionstyle='arc3,rad=-0.1')
+        if G_all.graph['markov_state_model']:
+            edge_labels = {(u, v): f"{G.edges[u, v]['forward_probability'] * 100:.2f}% Transition Probability →\n{G.edges[u, v]['backward_probability'] * 100:.2f}% Transition Probability ←" for u, v in significant_transitions}
+        else:
+            edge_labels = {(u, v): f"{G.edges[u, v]['forward_probability']:.2f}% of Frames →\n{G.edges[u, v]['backward_probability']:.2f}% of Frames ←" for u, v in significant_transitions}
+        nx.draw_networkx_edge_labels(G, pos, edge_labels=edge_labels, font_size=15)
 
         # Update the node colors based on their appearance percentages in each part
         node_colors = []
         for node in G.nodes():
             if node in top_10_nodes:
-                part1_percentage = part1_node_occurrences.get(node, 0) / node_occurrences[node]
-                part2_percentage = part2_node_occurrences.get(node, 0) / node_occurrences[node]
-                part3_percentage = part3_node_occurrences.get(node, 0) / node_occurrences[node]
+                node_data = G_all.nodes[node]
+                part1_percentage = node_data['part1_occurrences'] / node_data['occurrences']
+                part2_percentage = node_data['part2_occurrences'] / node_data['occurrences']
+                part3_percentage = node_data['part3_occurrences'] / node_data['occurrences']
 
                 if part1_percentage > 0.5:
                     node_colors.append('green')
@@ -176,8 +246,8 @@ def binding_site_markov_network(total_frames, min_transitions, combined_dict, fo
         node_labels = {}
         for node in G.nodes():
             if node in top_10_nodes:
-                node_occurrence_percentage = node_occurrences[node] / len(combined_dict['all']) * 100
-                self_loop_probability = self_loop_probabilities.get(node, 0) * 100
+                node_occurrence_percentage = G_all.nodes[node]['occurrence_percentage']
+                self_loop_probability = G_all.nodes[node]['self_loop_probability'] * 100
                 node_label = f"{node}\nOccurrences: {node_occurrence_percentage:.2f}%\nSelf-Loop Probability: {self_loop_probability:.2f}%"
             else:
                 node_label = node
@@ -190,8 +260,8 @@ def binding_site_markov_network(total_frames, min_transitions, combined_dict, fo
 
         # Save the plot as a PNG file
         plot_filename = f"markov_chain_plot_{min_transition_percent}.png"
-        plot_path = os.path.join("Binding_Modes_Markov_States", plot_filename)
-        os.makedirs("Binding_Modes_Markov_States", exist_ok=True)  # Create the folder if it doesn't exist
+        plot_path = os.path.join(output_dir, plot_filename)
+        os.makedirs(output_dir, exist_ok=True)  # Create the folder if it doesn't exist
 
         plt.savefig(plot_path, dpi=300)
-        plt.clf()  # Clear the current figure for the next iteration
+        plt.close()
@@ -0,0 +1,303 @@
+import os
+import numpy as np
+import pandas as pd
+from multiprocessing import Pool
+from functools import partial
+from contextlib import nullcontext
+
+
+def count_matrix(codes, n_states, lag=1, segments=None):
+    """
+    Counts the transitions between the integer encoded states after a lag time.
+
+    Parameters
+    ----------
+    codes : np.ndarray
+        The integer encoded sequence of states (see transition_counts).
+    n_states : int
+        The number of states.
+    lag : int (optional)
+        The lag time in frames.
+    segments : np.ndarray (optional)
+        Segment id of each frame, transitions are only counted within a segment. By default the sequence is a single segment.
+
+    Returns
+    -------
+    np.ndarray :
+        The transition count matrix of shape (states, states).
+    """
+    start_codes = codes[:-lag]
+    end_codes = codes[lag:]
+    if segments is not None:
+        within_segment = segments[:-lag] == segments[lag:]
+        start_codes = start_codes[within_segment]
+        end_codes = end_codes[within_segment]
+    counts = np.bincount(start_codes.astype(np.int64) * n_states + end_codes, minlength=n_states * n_states)
+
+    return counts.reshape(n_states, n_states)
+
+
+def row_normalize(counts):
+    """
+    Row-normalises a transition count matrix to a transition probability matrix.
+    States without outgoing transitions are made absorbing, so every row sums to 1.
+
+    Parameters
+    ----------
+    counts : np.ndarray
+        The transition count matrix.
+
+    Returns
+    -------
+    np.ndarray :
+        The row-stochastic transition matrix.
+    """
+    row_sums = counts.sum(axis=1, keepdims=True)
+    transition_matrix = np.divide(counts, row_sums, out=np.zeros(counts.shape), where=row_sums > 0)
+    empty_rows = np.flatnonzero(row_sums[:, 0] == 0)
+    transition_matrix[empty_rows, empty_rows] = 1.0
+
+    return transition_matrix
+
+
+def stationary_distribution(transition_matrix):
+    """
+    Calculates the stationary distribution of a transition matrix from its left eigenvector with the eigenvalue 1.
+
+    Parameters
+    ----------
+    transition_matrix : np.ndarray
+        The row-stochastic transition matrix.
+
+    Returns
+    -------
+    np.ndarray :
+        The stationary probability of each state.
+    """
+    eigenvalues, eigenvectors = np.linalg.eig(transition_matrix.T)
+    stationary = np.abs(np.real(eigenvectors[:, np.argmin(np.abs(eigenvalues - 1))]))
+
+    return stationary / stationary.sum()
+
+
+def implied_timescales(transition_matrix, lag, n_timescales=10):
+    """
+    Calculates the implied timescales -lag / ln|lambda_i| of the non-stationary eigenvalues of a transition matrix.
+
+    Parameters
+    ----------
+    transition_matrix : np.ndarray
+        The row-stochastic transition matrix.
+    lag : int
+        The lag time in frames the transition matrix was estimated at.
+    n_timescales : int (optional)
+        The maximum number of timescales.
+
+    Returns
+    -------
+    np.ndarray :
+        The implied timescales in frames, sorted from slowest to fastest and padded with NaN to n_timescales.
+    """
+    eigenvalues = np.sort(np.abs(np.linalg.eigvals(transition_matrix)))[::-1][1:n_timescales + 1]
+    timescales = np.full(n_timescales, np.nan)
+    with np.errstate(divide='ignore'):
+        timescales[:len(eigenvalues)] = np.where(eigenvalues >= 1, np.inf, -lag / np.log(np.clip(eigenvalues, 1e-300, None)))
+
+    return timescales
+
+
+def mean_first_passage_times(transition_matrix, stationary, lag):
+    """
+    Calculates the mean first-passage times between all states with the fundamental matrix Z = (I - T + 1 pi^T)^-1.
+
+    Parameters
+    ----------
+    transition_matrix : np.ndarray
+        The row-stochastic transition matrix.
+    stationary : np.ndarray
+        The stationary distribution of the transition matrix.
+    lag : int
+        The lag time in frames the transition matrix was estimated at.
+
+    Returns
+    -------
+    np.ndarray :
+        Matrix with the mean first-passage time in frames from state i (row) to state j (column), inf for unreachable states.
+    """
+    n_states = len(stationary)
+    fundamental = np.linalg.pinv(np.eye(n_states) - transition_matrix + np.outer(np.ones(n_states), stationary))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        passage_times = (np.diag(fundamental)[None, :] - fundamental) / stationary[None, :] * lag
+    passage_times[:, stationary <= 1e-12] = np.inf
+    np.fill_diagonal(passage_times, 0.0)
+
+    return passage_times
+
+
+def estimate_markov_state_model(codes, n_states, lags, segments=None):
+    """
+    Estimates transition matrices, stationary distributions, implied timescales and mean first-passage times at several lag times.
+
+    Parameters
+    ----------
+    codes : np.ndarray
+        The integer encoded sequence of states.
+    n_states : int
+        The number of states.
+    lags : list of int
+        The lag times in frames.
+    segments : np.ndarray (optional)
+        Segment id of each frame, transitions are only counted within a segment.
+
+    Returns
+    -------
+    dict :
+        Lag time as key and a dictionary with the transition_matrix, stationary, timescales and mfpt arrays as value.
+    """
+    estimates = {}
+    for lag in lags:
+        transition_matrix = row_normalize(count_matrix(codes, n_states, lag, segments))
+        stationary = stationary_distribution(transition_matrix)
+        estimates[lag] = {
+            'transition_matrix': transition_matrix,
+            'stationary': stationary,
+            'timescales': implied_timescales(transition_matrix, lag),
+            'mfpt': mean_first_passage_times(transition_matrix, stationary, lag),
+        }
+
+    return estimates
+
+
+def bootstrap_replica(codes, n_states, lags, block_length, seed):
+    """
+    Estimates the Markov state model of one bootstrap replica, built from trajectory blocks drawn with replacement.
+
+    Parameters
+    ----------
+    codes : np.ndarray
+        The integer encoded sequence of states.
+    n_states : int
+        The number of states.
+    lags : list of int
+        The lag times in frames.
+    block_length : int
+        The number of frames of each block.
+    seed : int
+        Seed of the random number generator of the replica.
+
+    Returns
+    -------
+    dict :
+        The estimates of the replica (see estimate_markov_state_model).
+    """
+    rng = np.random.default_rng(seed)
+    n_blocks = max(1, len(codes) // block_length)
+    blocks = rng.integers(0, n_blocks, size=n_blocks)
+    frames = (blocks[:, None] * block_length + np.arange(block_length)[None, :]).ravel()
+    segments = np.repeat(np.arange(n_blocks), block_length)
+
+    return estimate_markov_state_model(codes[frames], n_states, lags, segments)
+
+
+def markov_state_model(states, lags, block_length=None, n_bootstrap=100, num_processes=4, seed=42, pool=None):
+    """
+    Estimates a Markov state model of the binding modes at several lag times with errors from bootstrapping over trajectory blocks.
+
+    Parameters
+    ----------
+    states : list of str
+        The Binding Modes in their order of appearance during the simulation.
+    lags : list of int
+        The lag times in frames.
+    block_length : int (optional)
+        The number of frames of the bootstrap blocks. The default is a tenth of the trajectory, but at least 10 times the largest lag time.
+    n_bootstrap : int (optional)
+        The number of bootstrap replicas, 0 disables the bootstrapping.
+    num_processes : int (optional)
+        The number of CPUs used for the bootstrap replicas.
+    seed : int (optional)
+        Seed for the bootstrap replicas.
+    pool : multiprocessing.pool.Pool (optional)
+        A running worker pool used for the bootstrap replicas instead of a new pool.
+
+    Returns
+    -------
+    dict :
+        A dictionary with the unique states, the lags, the estimates at each lag time and the bootstrap standard deviations at each lag time.
+    """
+    unique_states, codes = np.unique(np.asarray(states, dtype=str), return_inverse=True)
+    n_states = len(unique_states)
+    lags = [int(lag) for lag in lags if 0 < int(lag) < len(codes)]
+    estimates = estimate_markov_state_model(codes, n_states, lags)
+
+    bootstrap = {}
+    if n_bootstrap > 0 and lags:
+        block_length = max(len(codes) // 10, 10 * max(lags)) if block_length is None else block_length
+        block_length = min(block_length, len(codes))
+        replica_seeds = np.random.SeedSequence(seed).generate_state(n_bootstrap)
+        with Pool(processes=max(1, num_processes)) if pool is None else nullcontext(pool) as worker_pool:
+            replicas = worker_pool.map(partial(bootstrap_replica, codes, n_states, lags, block_length), replica_seeds.tolist())
+        for lag in lags:
+            bootstrap[lag] = {key: np.std([replica[lag][key] for replica in replicas], axis=0) for key in estimates[lag]}
+
+    return {'states': unique_states.astype(object), 'lags': lags, 'estimates': estimates, 'bootstrap': bootstrap}
+
+
+def edge_probabilities(model, lag):
+    """
+    Generates the transition probabilities of a Markov state model, used as edge weights of the Markov network.
+
+    Parameters
+    ----------
+    model : dict
+        The Markov state model generated by markov_state_model.
+    lag : int
+        The lag time of the transition matrix.
+
+    Returns
+    -------
+    dict :
+        Tuple of start and end state as key and the transition probability as value for all non-zero transitions.
+    """
+    states = model['states']
+    transition_matrix = model['estimates'][lag]['transition_matrix']
+    starts, ends = np.nonzero(transition_matrix)
+
+    return {(states[start], states[end]): transition_matrix[start, end] for start, end in zip(starts, ends)}
+
+
+def write_markov_state_model_tables(model, output_dir="Binding_Modes_Markov_States"):
+    """
+    Writes the transition matrices, stationary distributions, implied timescales and mean first-passage times of a Markov state model to csv tables.
+
+    Parameters
+    ----------
+    model : dict
+        The Markov state model generated by markov_state_model.
+    output_dir : str (optional)
+        The folder the tables are written to.
+
+    Returns
+    -------
+    None
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    states = model['states']
+    stationary_table = pd.DataFrame(index=pd.Index(states, name='Binding Mode'))
+    timescale_table = pd.DataFrame(index=pd.Index(np.arange(1, 11), name='Timescale'))
+
+    for lag in model['lags']:
+        estimate = model['estimates'][lag]
+        errors = model['bootstrap'].get(lag)
+        pd.DataFrame(estimate['transition_matrix'], index=states, columns=states).to_csv(os.path.join(output_dir, f"msm_transition_matrix_lag{lag}.csv"))
+        pd.DataFrame(estimate['mfpt'], index=states, columns=states).to_csv(os.path.join(output_dir, f"msm_mean_first_passage_times_lag{lag}.csv"))
+        stationary_table[f"Lag {lag}"] = estimate['stationary']
+        timescale_table[f"Lag {lag}"] = estimate['timescales']
+        if errors is not None:
+            pd.DataFrame(errors['transition_matrix'], index=states, columns=states).to_csv(os.path.join(output_dir, f"msm_transition_matrix_lag{lag}_error.csv"))
+            pd.DataFrame(errors['mfpt'], index=states, columns=states).to_csv(os.path.join(output_dir, f"msm_mean_first_passage_times_lag{lag}_error.csv"))
+            stationary_table[f"Lag {lag} Error"] = errors['stationary']
+            timescale_table[f"Lag {lag} Error"] = errors['timescales']
+
+    stationary_table.to_csv(os.path.join(output_dir, "msm_stationary_distribution.csv"))
+    timescale_table.dropna(how="all").to_csv(os.path.join(output_dir, "msm_implied_timescales.csv"))
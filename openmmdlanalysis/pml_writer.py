@@ -1,83 +1,128 @@
-import re
+import os
 import pandas as pd
 import xml.etree.ElementTree as ET
 import numpy as np
+from functools import partial
+from multiprocessing.pool import ThreadPool
+from xml.sax.saxutils import XMLGenerator
 
-def generate_pharmacophore_centers(df, interactions):
+from .cloud_processing import bounded_cloud
+
+PHARMACOPHORE_INTERACTIONS = "hydrophobic|Acceptor_hbond|Donor_hbond|pistacking|PI_saltbridge|NI_saltbridge"
+
+
+def coordinate_array(df, column="LIGCOO", arrays=None):
+    """Gathers the coordinates of a PLIP coordinate column as numeric array
+
+    Args:
+        df (pandas dataframe): dataframe generated by analysis using plip, preferably with the numeric coordinate columns (e.g. LIGCOO_X, LIGCOO_Y, LIGCOO_Z)
+        column (str, optional): name of the coordinate column. Defaults to "LIGCOO".
+        arrays (dict, optional): shared arrays generated by pharmacophore_arrays, used instead of df if given. Defaults to None.
+
+    Returns:
+        numpy array: float array of shape (rows, 3) with the coordinates, NaN for rows without coordinates
+    """
+    if arrays is not None:
+        return arrays[column]
+    axis_columns = [f"{column}_X", f"{column}_Y", f"{column}_Z"]
+    if all(axis_column in df.columns for axis_column in axis_columns):
+        return df[axis_columns].to_numpy(dtype=float)
+    # fall back to the coordinate strings of dataframes without the numeric columns
+    return df[column].astype(str).str.extract(r'\(([\d.-]+), ([\d.-]+), ([\d.-]+)\)').to_numpy(dtype=float)
+
+
+def pharmacophore_arrays(df):
+    """Prepares the numeric arrays shared by all pharmacophores of a trajectory, so the dataframe is only scanned once
+
+    Args:
+        df (pandas dataframe): dataframe generated by analysis using plip (generally df_all)
+
+    Returns:
+        dict: FRAME array, LIGCOO and PROTCOO coordinate arrays, boolean INTERACTIONS matrix of all pharmacophore interaction columns and INTERACTION_INDEX with the column of each interaction in that matrix
+    """
+    interactions = df.filter(regex=PHARMACOPHORE_INTERACTIONS).columns
+    return {
+        "FRAME": df["FRAME"].to_numpy(),
+        "LIGCOO": coordinate_array(df, "LIGCOO"),
+        "PROTCOO": coordinate_array(df, "PROTCOO"),
+        "INTERACTIONS": df[interactions].to_numpy() == 1,
+        "INTERACTION_INDEX": {interaction: index for index, interaction in enumerate(interactions)},
+    }
+
+
+def interaction_indicator(df, interactions, arrays=None):
+    """Generates the indicator matrix of the rows in which the interactions are formed
+
+    Args:
+        df (pandas dataframe): dataframe generated by analysis using plip
+        interactions (list): list of interaction columns
+        arrays (dict, optional): shared arrays generated by pharmacophore_arrays, used instead of df if given. Defaults to None.
+
+    Returns:
+        numpy array: boolean array of shape (rows, interactions)
+    """
+    if arrays is not None:
+        return arrays["INTERACTIONS"][:, [arrays["INTERACTION_INDEX"][interaction] for interaction in interactions]]
+    return df[list(interactions)].to_numpy() == 1
+
+
+def interaction_coordinate_means(df, interactions, columns=("LIGCOO",), arrays=None):
+    """Calculates the mean coordinates of all interactions at once with a matrix product of the interaction indicator matrix and the coordinate arrays
+
+    Args:
+        df (pandas dataframe): dataframe generated by analysis using plip
+        interactions (list): list of interaction columns
+        columns (tuple, optional): coordinate columns that are averaged, rows without coordinates in one of these columns are ignored. Defaults to ("LIGCOO",).
+        arrays (dict, optional): shared arrays generated by pharmacophore_arrays, used instead of df if given. Defaults to None.
+
+    Returns:
+        tuple: list of the interactions with at least one coordinate and numpy array of shape (interactions, columns, 3) with their mean coordinates
+    """
+    interactions = list(interactions)
+    coordinates = np.stack([coordinate_array(df, column, arrays) for column in columns], axis=1)
+    valid = ~np.isnan(coordinates).any(axis=(1, 2))
+
+    # indicator matrix of shape (rows, interactions), interactions without any coordinate are skipped instead of dividing by zero
+    indicator = interaction_indicator(df, interactions, arrays) & valid[:, None]
+    counts = indicator.sum(axis=0)
+    sums = indicator.T.astype(float) @ np.nan_to_num(coordinates).reshape(len(coordinates), -1)
+    found = counts > 0
+    means = sums[found] / counts[found, None]
+
+    return [interaction for interaction, has_coordinates in zip(interactions, found) if has_coordinates], means.reshape(-1, len(columns), 3)
+
+
+def generate_pharmacophore_centers(df, interactions, arrays=None):
     """Generates pharmacophore points for interactions that are points such as hydrophobic and ionic interactions
 
     Args:
         df (pandas dataframe): dataframe generated by analisis using plip 
         interactions (list): list of interactions to generate pharmacophore from
+        arrays (dict, optional): shared arrays generated by pharmacophore_arrays, used instead of df if given. Defaults to None.
 
     Returns:
         dict: interaction from wicht pharmacophore is generated as key and list of coordinates as value
     """
-    coord_pattern = re.compile(r'\(([\d.-]+), ([\d.-]+), ([\d.-]+)\)')
-    pharmacophore = {}
-    for interaction in interactions:
-        counter = 0
-        sum_x, sum_y, sum_z = 0, 0, 0
-        for index, row in df.iterrows():
-            if row[interaction] == 1:
-                coord_match = coord_pattern.match(row['LIGCOO'])
-                if coord_match:
-                    x, y, z = map(float, coord_match.groups())
-                    sum_x += x
-                    sum_y += y
-                    sum_z += z
-                    counter += 1
-            
-        center_x = round((sum_x / counter), 3)
-        center_y = round((sum_y / counter), 3)
-        center_z = round((sum_z / counter), 3)
-        pharmacophore[interaction] = [center_x, center_y, center_z]
-    return pharmacophore
+    found_interactions, means = interaction_coordinate_means(df, interactions, ("LIGCOO",), arrays)
+    return {interaction: np.round(mean[0], 3).tolist() for interaction, mean in zip(found_interactions, means)}
 
 
-def generate_pharmacophore_vectors(df, interactions):
+def generate_pharmacophore_vectors(df, interactions, arrays=None):
     """Generates pharmacophore points for interactions that are vectors such as hydrogen bond donors or acceptors
 
     Args:
         df (pandas dataframe): dataframe generated by analisis using plip 
         interactions (list): list of interactions to generate pharmacophore from
+        arrays (dict, optional): shared arrays generated by pharmacophore_arrays, used instead of df if given. Defaults to None.
 
     Returns:
         dict: interaction from wicht pharmacophore is generated as key and list of coordinates as value (first coords are ligand side, second are protein side)
     """
-    coord_pattern = re.compile(r'\(([\d.-]+), ([\d.-]+), ([\d.-]+)\)')
-    pharmacophore = {}
-    for interaction in interactions:
-        counter = 0
-        sum_x, sum_y, sum_z = 0, 0, 0
-        sum_a, sum_b, sum_c = 0, 0, 0
-        for index, row in df.iterrows():
-            if row[interaction] == 1:
-                coord_match = coord_pattern.match(row['LIGCOO'])
-                if coord_match:
-                    x, y, z = map(float, coord_match.groups())
-                    sum_x += x
-                    sum_y += y
-                    sum_z += z
-                coord_match = coord_pattern.match(row['PROTCOO'])
-                if coord_match:
-                    a, b, c = map(float, coord_match.groups())
-                    sum_a += a
-                    sum_b += b
-                    sum_c += c
-                    counter += 1
-            
-        center_x = round((sum_x / counter), 3)
-        center_y = round((sum_y / counter), 3)
-        center_z = round((sum_z / counter), 3)
-        center_a = round((sum_a / counter), 3)
-        center_b = round((sum_b / counter), 3)
-        center_c = round((sum_c / counter), 3)
-        pharmacophore[interaction] = [[center_x, center_y, center_z], [center_a, center_b, center_c]]
-    return pharmacophore
+    found_interactions, means = interaction_coordinate_means(df, interactions, ("LIGCOO", "PROTCOO"), arrays)
+    return {interaction: [np.round(mean[0], 3).tolist(), np.round(mean[1], 3).tolist()] for interaction, mean in zip(found_interactions, means)}
     
     
-def generate_md_pharmacophore_cloudcenters(df, core_compound, output_filename, sysname, id_num=0):
+def generate_md_pharmacophore_cloudcenters(df, core_compound, output_filename, sysname, id_num=0, arrays=None):
     """Generates pharmacophore from all interactions formed in the MD simulation.
     A feature is generated for each interaction at the center of all its ocurrences.
 
@@ -87,12 +132,34 @@ def generate_md_pharmacophore_cloudcenters(df, core_compound, output_filename, s
         output_filename (str): name the of the output .pml file
         sysname (str): name of thesystem simulated
         id_num (int, optional): id number. Defaults to 0.
+        arrays (dict, optional): shared arrays generated by pharmacophore_arrays. Defaults to None.
+    """
+    tree = md_pharmacophore_cloudcenters_tree(df, core_compound, sysname, id_num, arrays)
+    tree.write(output_filename, encoding="UTF-8", xml_declaration=True)
+
+
+def md_pharmacophore_cloudcenters_tree(df, core_compound, sysname, id_num=0, arrays=None):
+    """Generates the pharmacophore of all interactions formed in the MD simulation in memory (see generate_md_pharmacophore_cloudcenters).
+
+    Args:
+        df (pandas dataframe): dataframe generated by analysis using plip (generally df_all)
+        core_compound (str): name of the ligand
+        sysname (str): name of thesystem simulated
+        id_num (int, optional): id number. Defaults to 0.
+        arrays (dict, optional): shared arrays generated by pharmacophore_arrays. Defaults to None.
+
+    Returns:
+        ElementTree: the pharmacophore document
     """
     feature_id_counter = 0
 
     root = ET.Element("MolecularEnvironment", version="0.0", id=f"OpennMMDL_Analysis{id_num}", name=sysname)
     pharmacophore = ET.SubElement(root, "pharmacophore", name=sysname, id=f"pharmacophore{id_num}", pharmacophoreType="LIGAND_SCOUT")
 
+    # the centers of all interactions are calculated in one pass
+    vectors = generate_pharmacophore_vectors(df, df.filter(regex="Acceptor_hbond|Donor_hbond|pistacking").columns, arrays)
+    centers = generate_pharmacophore_centers(df, df.filter(regex="hydrophobic|PI_saltbridge|NI_saltbridge").columns, arrays)
+
     for interaction in ["Acceptor_hbond", "Donor_hbond", "pistacking", "hydrophobic", "PI_saltbridge", "NI_saltbridge"]:
         feature_types = {
             "Acceptor_hbond": "HBA",
@@ -107,7 +174,7 @@ def generate_md_pharmacophore_cloudcenters(df, core_compound, output_filename, s
         
         feature_type = feature_types[interaction]
         if interaction in ["Acceptor_hbond", "Donor_hbond"]:
-            pharm = generate_pharmacophore_vectors(df, df.filter(regex=interaction).columns)
+            pharm = {column: vectors[column] for column in df.filter(regex=interaction).columns if column in vectors}
             for feature_name, position in pharm.items():
                 feature_id_counter += 1
                 lig_loc = position[0]
@@ -162,7 +229,7 @@ def generate_md_pharmacophore_cloudcenters(df, core_compound, output_filename, s
                         tolerance="1.5"
                     )
         elif interaction in ["hydrophobic", "PI_saltbridge", "NI_saltbridge"]:
-            pharm = generate_pharmacophore_centers(df, df.filter(regex=interaction).columns)
+            pharm = {column: centers[column] for column in df.filter(regex=interaction).columns if column in centers}
             for feature_name, position in pharm.items():
                 feature_id_counter += 1
                 point = ET.SubElement(
@@ -185,43 +252,43 @@ def generate_md_pharmacophore_cloudcenters(df, core_compound, output_filename, s
                     tolerance="1.5"
                 )
         elif interaction == "pistacking":
-            pharm = generate_pharmacophore_vectors(df, df.filter(regex=interaction).columns)
-            feature_id_counter += 1
-            lig_loc = position[0]
-            prot_loc = position[1]
-            
-            vector = np.array(lig_loc) - np.array(prot_loc)
-            normal_vector = vector / np.linalg.norm(vector)
-            x, y, z = normal_vector
-            
-            plane = ET.SubElement(pharmacophore,
-                                "plane",
-                                name=feature_type,
-                                featureId=interaction,
-                                optional="false",
-                                disabled="false",
-                                weight="1.0",
-                                coreCompound=core_compound,
-                                id=f"feature{str(feature_id_counter)}")
-            position = ET.SubElement(plane,
-                                    "position",
-                                    x3=str(lig_loc[0]),
-                                    y3=str(lig_loc[1]),
-                                    z3=str(lig_loc[2]),
-                                    tolerance="0.9")
-            normal = ET.SubElement(plane,
-                                "normal",
-                                x3=str(x),
-                                y3=str(y),
-                                z3=str(z),
-                                tolerance="0.43633232")
-            
+            pharm = {column: vectors[column] for column in df.filter(regex=interaction).columns if column in vectors}
+            for feature_name, position in pharm.items():
+                feature_id_counter += 1
+                lig_loc = position[0]
+                prot_loc = position[1]
+
+                vector = np.array(lig_loc) - np.array(prot_loc)
+                normal_vector = vector / np.linalg.norm(vector)
+                x, y, z = normal_vector
+
+                plane = ET.SubElement(pharmacophore,
+                                    "plane",
+                                    name=feature_type,
+                                    featureId=feature_name,
+                                    optional="false",
+                                    disabled="false",
+                                    weight="1.0",
+                                    coreCompound=core_compound,
+                                    id=f"feature{str(feature_id_counter)}")
+                position = ET.SubElement(plane,
+                                        "position",
+                                        x3=str(lig_loc[0]),
+                                        y3=str(lig_loc[1]),
+                                        z3=str(lig_loc[2]),
+                                        tolerance="0.9")
+                normal = ET.SubElement(plane,
+                                    "normal",
+                                    x3=str(x),
+                                    y3=str(y),
+                                    z3=str(z),
+                                    tolerance="0.43633232")
+
             
-    tree = ET.ElementTree(root)
-    tree.write(output_filename, encoding="UTF-8", xml_declaration=True)
+    return ET.ElementTree(root)
     
     
-def generate_bindingmode_pharmacophore(dict_bindingmode, core_compound, sysname, outname, id_num=0,):
+def generate_bindingmode_pharmacophore(dict_bindingmode, core_compound, sysname, outname, id_num=0, output_dir="./Binding_Modes_Markov_States"):
     """Generates pharmacophore from a binding mode and writes it to a .pml file
 
     Args:
@@ -230,6 +297,23 @@ def generate_bindingmode_pharmacophore(dict_bindingmode, core_compound, sysname,
         sysname (str): name of the analysed system
         outname (str): name of the output .pml file
         id_num (int, optional): if multiple id number can enumerate the diferent bindingmodes. Defaults to 0.
+        output_dir (str, optional): folder the .pml file is written to. Defaults to "./Binding_Modes_Markov_States".
+    """
+    tree = bindingmode_pharmacophore_tree(dict_bindingmode, core_compound, sysname, id_num)
+    tree.write(os.path.join(output_dir, f"{outname}.pml"), encoding="UTF-8", xml_declaration=True)
+
+
+def bindingmode_pharmacophore_tree(dict_bindingmode, core_compound, sysname, id_num=0):
+    """Generates the pharmacophore of a binding mode in memory (see generate_bindingmode_pharmacophore).
+
+    Args:
+        dict_bindingmode (dict): dictionary containing all interactions of the bindingmode and thei coresponding ligand and protein coordinates
+        core_compound (str): name of the ligand
+        sysname (str): name of the analysed system
+        id_num (int, optional): if multiple id number can enumerate the diferent bindingmodes. Defaults to 0.
+
+    Returns:
+        ElementTree: the pharmacophore document
     """
     feature_types = {
                 "Acceptor_hbond": "HBA",
@@ -249,6 +333,9 @@ def generate_bindingmode_pharmacophore(dict_bindingmode, core_compound, sysname,
             if interactiontype in interaction:
                 feature_type = feature_types[interactiontype]
                 break
+        else:
+            # interactions without a pharmacophore feature such as halogen bonds are skipped
+            continue
         # generate vector features
         if feature_type in ["HBA", "HBD"]:
             if feature_type == "HBA":
@@ -346,73 +433,330 @@ def generate_bindingmode_pharmacophore(dict_bindingmode, core_compound, sysname,
                                 tolerance="0.43633232")
 
 
-    tree = ET.ElementTree(root)
-    tree.write(f"./Binding_Modes_Markov_States/{outname}.pml", encoding="UTF-8", xml_declaration=True)
+    return ET.ElementTree(root)
     
     
-def generate_pharmacophore_centers_all_points(df, interactions):
+def bindingmode_coordinates(df_all, frame, interactions, arrays=None):
+    """Gathers the ligand and protein coordinates of the interactions formed in a frame
+
+    Args:
+        df_all (pandas dataframe): dataframe generated by analysis using plip with the numeric coordinate columns (LIGCOO_X, ..., PROTCOO_Z)
+        frame (int): frame from which the coordinates are gathered
+        interactions (list): list of interactions formed by the binding mode
+        arrays (dict, optional): shared arrays generated by pharmacophore_arrays, interactions without a pharmacophore feature are skipped. Defaults to None.
+
+    Returns:
+        dict: interactions as keys and dicts with the lists of LIGCOO and PROTCOO coordinates as values
+    """
+    if arrays is not None:
+        interactions = [interaction for interaction in interactions if interaction in arrays["INTERACTION_INDEX"]]
+    frame_rows = (arrays["FRAME"] if arrays is not None else df_all['FRAME'].to_numpy()) == frame
+    # the numeric columns are float32, rounding to the precision of PLIP keeps the float32 noise out of the .pml files
+    ligcoo = np.round(coordinate_array(df_all, "LIGCOO", arrays)[frame_rows], 3)
+    protcoo = np.round(coordinate_array(df_all, "PROTCOO", arrays)[frame_rows], 3)
+    interaction_rows = interaction_indicator(df_all, interactions, arrays)[frame_rows]
+
+    bindingmode_dict = {}
+    for column_idx, interaction in enumerate(interactions):
+        mask = interaction_rows[:, column_idx]
+        if not mask.any():
+            continue
+        bindingmode_dict[interaction] = {"LIGCOO": ligcoo[mask].tolist(), "PROTCOO": protcoo[mask].tolist()}
+    return bindingmode_dict
+
+
+def bindingmode_coordinate_dicts(df_all, fingerprint_df, interactions, binding_modes, arrays=None):
+    """Gathers the interactions and their coordinates of each binding mode from the first frame in which the binding mode occurs
+
+    Args:
+        df_all (pandas dataframe): dataframe generated by analysis using plip with the numeric coordinate columns (LIGCOO_X, ..., PROTCOO_Z)
+        fingerprint_df (pandas dataframe): dataframe with the FRAME column and one column per interaction containing 1 if the interaction is part of the frame fingerprint
+        interactions (list): list of the interaction columns of the fingerprint
+        binding_modes (dict): name of the binding mode as key and the frame used for the pharmacophore as value
+        arrays (dict, optional): shared arrays generated by pharmacophore_arrays. Defaults to None.
+
+    Returns:
+        dict: name of the binding mode as key and its dictionary generated by bindingmode_coordinates as value
+    """
+    return {binding_mode: bindingmode_coordinates(df_all, frame, active_interactions, arrays)
+            for binding_mode, (frame, active_interactions) in bindingmode_interactions(fingerprint_df, interactions, binding_modes).items()}
+
+
+def bindingmode_interactions(fingerprint_df, interactions, binding_modes):
+    """Looks up the interactions of the fingerprint of the frame used for the pharmacophore of each binding mode
+
+    Args:
+        fingerprint_df (pandas dataframe): dataframe with the FRAME column and one column per interaction containing 1 if the interaction is part of the frame fingerprint
+        interactions (list): list of the interaction columns of the fingerprint
+        binding_modes (dict): name of the binding mode as key and the frame used for the pharmacophore as value
+
+    Returns:
+        dict: name of the binding mode as key and a tuple of the frame and the list of its interactions as value
+    """
+    interactions = list(interactions)
+    fingerprint_frames = fingerprint_df['FRAME'].to_numpy()
+    fingerprints = fingerprint_df[interactions].to_numpy() == 1
+
+    active_interactions = {}
+    for binding_mode, frame in binding_modes.items():
+        frame_fingerprint = fingerprints[fingerprint_frames == frame].any(axis=0)
+        active_interactions[binding_mode] = (frame, [interaction for interaction, active in zip(interactions, frame_fingerprint) if active])
+    return active_interactions
+
+
+def bindingmode_pharmacophore_job(df_all, frame, interactions, core_compound, sysname, id_num=0, arrays=None, outname=None, output_dir="./Binding_Modes_Markov_States"):
+    """Gathers the coordinates of a binding mode and builds its pharmacophore, or writes it if outname is given
+
+    Args:
+        df_all (pandas dataframe): dataframe generated by analysis using plip with the numeric coordinate columns (LIGCOO_X, ..., PROTCOO_Z)
+        frame (int): frame used for the pharmacophore
+        interactions (list): list of interactions formed by the binding mode
+        core_compound (str): name of the ligand
+        sysname (str): name of the analysed system
+        id_num (int, optional): id number of the pharmacophore. Defaults to 0.
+        arrays (dict, optional): shared arrays generated by pharmacophore_arrays. Defaults to None.
+        outname (str, optional): name of the binding mode used for the .pml file, None returns the ElementTree instead. Defaults to None.
+        output_dir (str, optional): folder the .pml file is written to. Defaults to "./Binding_Modes_Markov_States".
+
+    Returns:
+        ElementTree: the pharmacophore document, None if it is written
+    """
+    bindingmode_dict = bindingmode_coordinates(df_all, frame, interactions, arrays)
+    if outname is None:
+        return bindingmode_pharmacophore_tree(bindingmode_dict, core_compound, sysname, id_num)
+    generate_bindingmode_pharmacophore(bindingmode_dict, core_compound, sysname, outname, id_num, output_dir)
+
+
+def generate_bindingmode_pharmacophores(df_all, fingerprint_df, interactions, binding_modes, core_compound, sysname, id_num=0, output_dir="./Binding_Modes_Markov_States"):
+    """Generates a pharmacophore for each binding mode from the first frame in which the binding mode occurs
+
+    Args:
+        df_all (pandas dataframe): dataframe generated by analysis using plip with the numeric coordinate columns (LIGCOO_X, ..., PROTCOO_Z)
+        fingerprint_df (pandas dataframe): dataframe with the FRAME column and one column per interaction containing 1 if the interaction is part of the frame fingerprint
+        interactions (list): list of the interaction columns of the fingerprint
+        binding_modes (dict): name of the binding mode as key and the frame used for the pharmacophore as value
+        core_compound (str): name of the ligand
+        sysname (str): name of the analysed system
+        id_num (int, optional): if multiple id number can enumerate the diferent bindingmodes. Defaults to 0.
+        output_dir (str, optional): folder the .pml files are written to. Defaults to "./Binding_Modes_Markov_States".
+    """
+    bindingmode_dicts = bindingmode_coordinate_dicts(df_all, fingerprint_df, interactions, binding_modes)
+    for binding_mode, bindingmode_dict in bindingmode_dicts.items():
+        generate_bindingmode_pharmacophore(bindingmode_dict, core_compound, sysname, binding_mode, id_num, output_dir)
+
+
+def generate_pharmacophore_centers_all_points(df, interactions, arrays=None):
     """Generates pharmacophore points for all interactions to generate point cloud
 
     Args:
         df (pandas dataframe): dataframe generated by analysis using plip 
         interactions (list): list of interactions to generate pharmacophore from
+        arrays (dict, optional): shared arrays generated by pharmacophore_arrays, used instead of df if given. Defaults to None.
 
     Returns:
         dict: interaction from which pharmacophore is generated as key and list of coordinates as value
     """
-    coord_pattern = re.compile(r'\(([\d.-]+), ([\d.-]+), ([\d.-]+)\)')
+    interactions = list(interactions)
+    ligcoo = np.round(coordinate_array(df, "LIGCOO", arrays), 3)
+    valid = ~np.isnan(ligcoo).any(axis=1)
+    indicator = interaction_indicator(df, interactions, arrays) & valid[:, None]
     pharmacophore = {}
-    for interaction in interactions:
-        pharmacophore_points = []
-        for index, row in df.iterrows():
-            if row[interaction] == 1:
-                coord_match = coord_pattern.match(row['LIGCOO'])
-                if coord_match:
-                    x, y, z = map(float, coord_match.groups())
-                    pharmacophore_points.append([x, y, z])
-        
-        if pharmacophore_points:
-            pharmacophore[interaction] = pharmacophore_points
+    for column_idx, interaction in enumerate(interactions):
+        rows = indicator[:, column_idx]
+        if rows.any():
+            pharmacophore[interaction] = ligcoo[rows].tolist()
     return pharmacophore
 
 
+def point_cloud_dict(df, arrays=None):
+    """Gathers the ligand coordinates of all occurrences of the interactions of each pharmacophore feature type for the point cloud
+
+    Args:
+        df (pandas dataframe): dataframe generated by analysis using plip (generally df_all)
+        arrays (dict, optional): shared arrays generated by pharmacophore_arrays, used instead of df if given. Defaults to None.
+
+    Returns:
+        dict: feature type as key and the dictionary generated by generate_pharmacophore_centers_all_points as value
+    """
+    feature_interactions = {"H": "hydrophobic", "HBA": "Acceptor_hbond", "HBD": "Donor_hbond", "AR": "pistacking", "PI": "PI_saltbridge", "NI": "NI_saltbridge"}
+    return {feature_type: generate_pharmacophore_centers_all_points(df, df.filter(regex=interaction).columns, arrays)
+            for feature_type, interaction in feature_interactions.items()}
+
 
-def generate_point_cloud_pml(cloud_dict, sysname, outname):
-    """Generates pharmacophore point cloud and writes it to a .pml file
+
+def point_cloud_features(cloud_dict, max_points=500, voxel_size=0.5):
+    """Clusters each feature cloud to a bounded number of weighted points and yields the attributes of the point cloud elements feature by feature
 
     Args:
         cloud_dict (dict): dictionary containing all interactions of the trajectory and their corresponding ligand coordinates
-        sysname (str): name of the simulated system
-        outname (str): name of the output .pml file
+        max_points (int, optional): maximum number of points per feature cloud, the weight of a point is its share of the occurrences of the densest point. None keeps every occurrence. Defaults to 500.
+        voxel_size (float, optional): initial edge length of the voxels used to cluster the clouds in Angstrom. Defaults to 0.5.
+
+    Yields:
+        tuple: attributes of the featureCloud, its position and the list of attributes of its additionalPoints
     """
-    pharmacophore = ET.Element("pharmacophore", name=f'{sysname}_pointcloud', id=f"pharmacophore0", pharmacophoreType="LIGAND_SCOUT")
     feature_id_counter = 0
     for feature_type in cloud_dict.keys():
         for interaction in cloud_dict[feature_type].keys():
-            if len(cloud_dict[feature_type][interaction]) > 1:
-                feature_cloud = ET.SubElement(pharmacophore,
-                                            "featureCloud",
-                                            name=feature_type,
-                                            featureId=interaction,
-                                            optional="false",
-                                            disabled="false",
-                                            weight="1.0",
-                                            id=f"feature{str(feature_id_counter)}")
-                position = ET.SubElement(feature_cloud,
-                                        "position",
-                                        x3=str(cloud_dict[feature_type][interaction][0][0]),
-                                        y3=str(cloud_dict[feature_type][interaction][0][1]),
-                                        z3=str(cloud_dict[feature_type][interaction][0][2]))
-                for additional_point in cloud_dict[feature_type][interaction][1:]:
-                    additional_point = ET.SubElement(feature_cloud,
-                                                    "additionalPoint",
-                                                    x3=str(round(additional_point[0], 2)),
-                                                    y3=str(round(additional_point[1], 2)),
-                                                    z3=str(round(additional_point[2], 2)),
-                                                    weight="1.0")
-                
-    tree = ET.ElementTree(pharmacophore)
-    tree.write(f"{outname}.pml", encoding="UTF-8", xml_declaration=True)
-
-
-    
\ No newline at end of file
+            if len(cloud_dict[feature_type][interaction]) <= 1:
+                continue
+            if max_points is None:
+                points = np.asarray(cloud_dict[feature_type][interaction], dtype=float)
+                weights = np.ones(len(points))
+            else:
+                points, counts = bounded_cloud(cloud_dict[feature_type][interaction], max_points, voxel_size)
+                weights = counts / counts[0]
+
+            feature_id_counter += 1
+            feature_cloud = {"name": feature_type, "featureId": interaction, "optional": "false", "disabled": "false",
+                             "weight": "1.0", "id": f"feature{str(feature_id_counter)}"}
+            position = {"x3": str(round(float(points[0][0]), 3)), "y3": str(round(float(points[0][1]), 3)), "z3": str(round(float(points[0][2]), 3))}
+            additional_points = [{"x3": str(round(float(additional_point[0]), 2)), "y3": str(round(float(additional_point[1]), 2)),
+                                  "z3": str(round(float(additional_point[2]), 2)), "weight": str(round(float(weight), 3))}
+                                 for additional_point, weight in zip(points[1:], weights[1:])]
+            yield feature_cloud, position, additional_points
+
+
+def generate_point_cloud_pml(cloud_dict, sysname, outname, max_points=500, voxel_size=0.5):
+    """Generates pharmacophore point cloud and writes it to a .pml file. Each feature cloud is clustered to a bounded number of weighted points
+    and the features are streamed to the file one after another.
+
+    Args:
+        cloud_dict (dict): dictionary containing all interactions of the trajectory and their corresponding ligand coordinates
+        sysname (str): name of the simulated system
+        outname (str): name of the output .pml file
+        max_points (int, optional): maximum number of points per feature cloud (see point_cloud_features). None writes every occurrence. Defaults to 500.
+        voxel_size (float, optional): initial edge length of the voxels used to cluster the clouds in Angstrom. Defaults to 0.5.
+    """
+    with open(f"{outname}.pml", "w", encoding="UTF-8") as pml_file:
+        xml_writer = XMLGenerator(pml_file, encoding="UTF-8", short_empty_elements=True)
+        xml_writer.startDocument()
+        xml_writer.startElement("pharmacophore", {"name": f"{sysname}_pointcloud", "id": "pharmacophore0", "pharmacophoreType": "LIGAND_SCOUT"})
+        for feature_cloud, position, additional_points in point_cloud_features(cloud_dict, max_points, voxel_size):
+            xml_writer.startElement("featureCloud", feature_cloud)
+            xml_writer.startElement("position", position)
+            xml_writer.endElement("position")
+            for additional_point in additional_points:
+                xml_writer.startElement("additionalPoint", additional_point)
+                xml_writer.endElement("additionalPoint")
+            xml_writer.endElement("featureCloud")
+        xml_writer.endElement("pharmacophore")
+        xml_writer.endDocument()
+
+
+def point_cloud_tree(cloud_dict, sysname, max_points=500, voxel_size=0.5):
+    """Generates the pharmacophore point cloud in memory (see generate_point_cloud_pml)
+
+    Args:
+        cloud_dict (dict): dictionary containing all interactions of the trajectory and their corresponding ligand coordinates
+        sysname (str): name of the simulated system
+        max_points (int, optional): maximum number of points per feature cloud (see point_cloud_features). Defaults to 500.
+        voxel_size (float, optional): initial edge length of the voxels used to cluster the clouds in Angstrom. Defaults to 0.5.
+
+    Returns:
+        ElementTree: the point cloud document
+    """
+    pharmacophore = ET.Element("pharmacophore", name=f'{sysname}_pointcloud', id="pharmacophore0", pharmacophoreType="LIGAND_SCOUT")
+    for feature_cloud, position, additional_points in point_cloud_features(cloud_dict, max_points, voxel_size):
+        feature_cloud_element = ET.SubElement(pharmacophore, "featureCloud", feature_cloud)
+        ET.SubElement(feature_cloud_element, "position", position)
+        for additional_point in additional_points:
+            ET.SubElement(feature_cloud_element, "additionalPoint", additional_point)
+    return ET.ElementTree(pharmacophore)
+
+
+def point_cloud_job(df, sysname, max_points=500, arrays=None, outname=None):
+    """Gathers the feature clouds of the trajectory, clusters them and builds the point cloud, or writes it if outname is given
+
+    Args:
+        df (pandas dataframe): dataframe generated by analysis using plip (generally df_all)
+        sysname (str): name of the simulated system
+        max_points (int, optional): maximum number of points per feature cloud (see point_cloud_features). Defaults to 500.
+        arrays (dict, optional): shared arrays generated by pharmacophore_arrays. Defaults to None.
+        outname (str, optional): name of the output .pml file, None returns the ElementTree instead. Defaults to None.
+
+    Returns:
+        ElementTree: the point cloud document, None if it is written
+    """
+    cloud_dict = point_cloud_dict(df, arrays)
+    if outname is None:
+        return point_cloud_tree(cloud_dict, sysname, max_points)
+    generate_point_cloud_pml(cloud_dict, sysname, outname, max_points)
+
+
+def pharmacophore_jobs(df_all, fingerprint_df, interactions, binding_modes, core_compound, sysname, id_num=0, max_points=500, output_dir="."):
+    """Prepares the shared arrays once and collects the jobs that build or write each pharmacophore.
+    The coordinates of each document are gathered and the point cloud is clustered inside its job.
+
+    Args:
+        df_all (pandas dataframe): dataframe generated by analysis using plip with the numeric coordinate columns (LIGCOO_X, ..., PROTCOO_Z)
+        fingerprint_df (pandas dataframe): dataframe with the FRAME column and one column per interaction containing 1 if the interaction is part of the frame fingerprint
+        interactions (list): list of the interaction columns of the fingerprint
+        binding_modes (dict): name of the binding mode as key and the frame used for the pharmacophore as value
+        core_compound (str): name of the ligand
+        sysname (str): name of the analysed system
+        id_num (int, optional): id number of the pharmacophores. Defaults to 0.
+        max_points (int, optional): maximum number of points per feature cloud of the point cloud. Defaults to 500.
+        output_dir (str, optional): folder the files are written to, the binding mode pharmacophores to its Binding_Modes_Markov_States folder. Defaults to ".".
+
+    Returns:
+        list: tuples of the name of the pharmacophore, the function building its ElementTree and the function writing its file
+    """
+    arrays = pharmacophore_arrays(df_all)
+    jobs = []
+    for binding_mode, (frame, active_interactions) in bindingmode_interactions(fingerprint_df, interactions, binding_modes).items():
+        job = partial(bindingmode_pharmacophore_job, df_all, frame, active_interactions, core_compound, sysname, id_num, arrays)
+        jobs.append((binding_mode, job, partial(job, outname=binding_mode, output_dir=os.path.join(output_dir, "Binding_Modes_Markov_States"))))
+    job = partial(point_cloud_job, df_all, sysname, max_points, arrays)
+    jobs.append(("point_cloud", job, partial(job, outname=os.path.join(output_dir, "point_cloud"))))
+    jobs.append(("combopharm",
+                 partial(md_pharmacophore_cloudcenters_tree, df_all, core_compound, sysname, id_num, arrays),
+                 partial(generate_md_pharmacophore_cloudcenters, df_all, core_compound, os.path.join(output_dir, "combopharm.pml"), sysname, id_num, arrays)))
+    return jobs
+
+
+def pharmacophore_trees(df_all, fingerprint_df, interactions, binding_modes, core_compound, sysname, id_num=0, max_points=500, num_processes=4):
+    """Generates the pharmacophores of all binding modes, the point cloud and the pharmacophore of the whole MD simulation in memory.
+    The shared arrays are prepared once, the jobs run on a thread pool. The threads only overlap the numpy sections, which release the GIL.
+
+    Args:
+        df_all (pandas dataframe): dataframe generated by analysis using plip with the numeric coordinate columns (LIGCOO_X, ..., PROTCOO_Z)
+        fingerprint_df (pandas dataframe): dataframe with the FRAME column and one column per interaction containing 1 if the interaction is part of the frame fingerprint
+        interactions (list): list of the interaction columns of the fingerprint
+        binding_modes (dict): name of the binding mode as key and the frame used for the pharmacophore as value
+        core_compound (str): name of the ligand
+        sysname (str): name of the analysed system
+        id_num (int, optional): id number of the pharmacophores. Defaults to 0.
+        max_points (int, optional): maximum number of points per feature cloud of the point cloud. Defaults to 500.
+        num_processes (int, optional): number of threads. Defaults to 4.
+
+    Returns:
+        dict: name of the binding mode, "point_cloud" and "combopharm" as keys and the ElementTrees as values
+    """
+    jobs = pharmacophore_jobs(df_all, fingerprint_df, interactions, binding_modes, core_compound, sysname, id_num, max_points)
+    with ThreadPool(processes=max(1, num_processes)) as pool:
+        trees = pool.map(lambda job: job[1](), jobs)
+    return {name: tree for (name, build, write), tree in zip(jobs, trees)}
+
+
+def generate_pharmacophores(df_all, fingerprint_df, interactions, binding_modes, core_compound, sysname, id_num=0, max_points=500, num_processes=4, output_dir="."):
+    """Generates and writes the pharmacophores of all binding modes to Binding_Modes_Markov_States, the point cloud to point_cloud.pml
+    and the pharmacophore of the whole MD simulation to combopharm.pml. The shared arrays are prepared once, the jobs run on a thread pool.
+    The threads only overlap the numpy sections, which release the GIL, and the file writing.
+
+    Args:
+        df_all (pandas dataframe): dataframe generated by analysis using plip with the numeric coordinate columns (LIGCOO_X, ..., PROTCOO_Z)
+        fingerprint_df (pandas dataframe): dataframe with the FRAME column and one column per interaction containing 1 if the interaction is part of the frame fingerprint
+        interactions (list): list of the interaction columns of the fingerprint
+        binding_modes (dict): name of the binding mode as key and the frame used for the pharmacophore as value
+        core_compound (str): name of the ligand
+        sysname (str): name of the analysed system
+        id_num (int, optional): id number of the pharmacophores. Defaults to 0.
+        max_points (int, optional): maximum number of points per feature cloud of the point cloud. Defaults to 500.
+        num_processes (int, optional): number of threads. Defaults to 4.
+        output_dir (str, optional): folder the files are written to. Defaults to ".".
+    """
+    os.makedirs(os.path.join(output_dir, "Binding_Modes_Markov_States"), exist_ok=True)
+    jobs = pharmacophore_jobs(df_all, fingerprint_df, interactions, binding_modes, core_compound, sysname, id_num, max_points, output_dir)
+    with ThreadPool(processes=max(1, num_processes)) as pool:
+        pool.map(lambda job: job[2](), jobs)
@@ -1,28 +1,50 @@
 import MDAnalysis as mda
+import numpy as np
 import subprocess
 import os
 
-def process_pdb_file(input_pdb_filename):
+def rename_residues(universe):
+    """Renames the water residues to HOH and the ligand residues named * to UNK with one mask over the residue names.
+
+    Args:
+        universe (MDAnalysis.Universe): universe of the topology, renamed in place
+
+    Returns:
+        bool: True if any residue was renamed
+    """
+    resnames = universe.residues.resnames
+    waters = np.isin(resnames, ["SPC", "TIP3", "TIP4", "WAT", "T3P", "T4P", "T5P"])
+    ligands = resnames == "*"
+    if not (waters.any() or ligands.any()):
+        return False
+
+    resnames = resnames.copy()
+    resnames[waters] = "HOH"
+    resnames[ligands] = "UNK"
+    universe.residues.resnames = resnames
+    return True
+
+
+def process_pdb_file(input_pdb_filename, output_pdb_filename=None):
     """Process a PDB file to make it compatible with the openmmdl_analysis package.
 
     Args:
         input_pdb_filename (str): path to the input PDB file
+        output_pdb_filename (str, optional): path to the processed PDB file. Defaults to None, then the input PDB file is overwritten.
+
+    Returns:
+        str: path to the processed PDB file, the input PDB file if nothing needed to be renamed
     """
     # Load the PDB file
     u = mda.Universe(input_pdb_filename)
 
-    # Iterate through the topology to modify residue names
-    for atom in u.atoms:
-        resname = atom.resname
-
-        # Check if the residue name is one of the specified water names
-        if resname in ["SPC", "TIP3", "TIP4", "WAT", "T3P", "T4P", "T5P"]:
-            atom.residue.resname = "HOH"
-        elif resname == "*":
-            atom.residue.resname = "UNK"
+    if not rename_residues(u):
+        return input_pdb_filename
 
     # Save the modified topology to a new PDB file
-    u.atoms.write(input_pdb_filename)
+    output_pdb_filename = input_pdb_filename if output_pdb_filename is None else output_pdb_filename
+    u.atoms.write(output_pdb_filename)
+    return output_pdb_filename
 
 # def extract_and_save_ligand_as_pdb(input_pdb_filename, output_pdb_filename, target_resname):
 #     """Extract and save the ligand from the receptor ligand complex PDB file into a new PDB file by itself .
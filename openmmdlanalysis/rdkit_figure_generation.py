@@ -1,9 +1,13 @@
 import matplotlib.pyplot as plt
 import rdkit
 from PIL import Image
-import cairosvg
 import pylab
 import os
+import io
+from functools import lru_cache
+from rdkit import Chem
+from rdkit.Chem import AllChem
+from rdkit.Chem.Draw import rdMolDraw2D
 
 def split_interaction_data(data):
     """
@@ -31,6 +35,110 @@ def split_interaction_data(data):
     return split_data
 
 
+# Highlight colors of the interaction categories in priority order, an atom with several interactions gets the color of the first category
+HIGHLIGHT_COLORS = {
+    'hbond_donor': (0.3, 0.5, 1.0),
+    'hbond_acceptor': (1.0, 0.6, 0.6),
+    'hydrophobic': (1.0, 1.0, 0.0),
+    'hbond_both': (0.6, 0.0, 0.5),
+    'waterbridge': (0.0, 1.0, 0.9),
+    'pistacking': (0.0, 0.0, 1.0),
+    'halogen': (1.0, 0.0, 0.9),
+    'ni': (0.0, 0.0, 1.0),
+    'pi': (1.0, 0.0, 0.0),
+    'pication': (0.0, 0.0, 1.0),
+    'metal': (1.0, 0.6, 0.0),
+}
+
+
+@lru_cache(maxsize=None)
+def interaction_highlight(interaction):
+    """
+    Extracts the highlight category and the interacting ligand atoms from an interaction name, for example 'ASP12A_3_Donor_hbond'.
+    The result is cached, so each unique interaction is only parsed once.
+
+    Parameters
+    ----------
+    interaction : str
+        The interaction name with the protein partner, ligand atom indices, optional subtypes and the interaction type separated by '_'.
+
+    Returns
+    -------
+    tuple :
+        - category (str): Highlight category of the interaction (see HIGHLIGHT_COLORS), None for unknown interaction types.
+        - atoms (tuple of int): Atom indices of the interacting ligand atoms in the protein-ligand complex.
+    """
+    parts = interaction.split('_')
+    interaction_type = parts[-1]
+    atoms = tuple(int(code) for part in parts[1:-1] for code in part.split(',') if code.isdigit())
+
+    if interaction_type == 'hbond':
+        category = 'hbond_donor' if 'Donor' in parts[1:-1] else 'hbond_acceptor'
+    elif interaction_type == 'saltbridge':
+        category = 'ni' if parts[-2] == 'NI' else 'pi'
+    elif interaction_type in HIGHLIGHT_COLORS:
+        category = interaction_type
+    else:
+        category = None
+
+    return category, atoms
+
+
+def highlight_categories(interactions, lig_index):
+    """
+    Collects the highlighted ligand atoms of each highlight category for a set of interactions.
+    Atoms that are both hydrogen bond donors and acceptors are moved to the hbond_both category.
+
+    Parameters
+    ----------
+    interactions : iterable of str
+        The interaction names of a binding mode.
+    lig_index : int
+        Atom index of the first ligand atom in the protein-ligand complex.
+
+    Returns
+    -------
+    dict :
+        Highlight category as key and the set of ligand atom indices as value for all categories of HIGHLIGHT_COLORS.
+    """
+    categories = {category: set() for category in HIGHLIGHT_COLORS}
+    for interaction in interactions:
+        category, atoms = interaction_highlight(interaction)
+        if category is not None:
+            categories[category].update(atom - lig_index for atom in atoms)
+
+    categories['hbond_both'] = categories['hbond_donor'] & categories['hbond_acceptor']
+    categories['hbond_donor'] -= categories['hbond_both']
+    categories['hbond_acceptor'] -= categories['hbond_both']
+
+    return categories
+
+
+def highlight_atom_colors(interactions, lig_index):
+    """
+    Generates the highlighted ligand atoms and their colors for the interactions of a binding mode through the priority table HIGHLIGHT_COLORS.
+
+    Parameters
+    ----------
+    interactions : iterable of str
+        The interaction names of a binding mode.
+    lig_index : int
+        Atom index of the first ligand atom in the protein-ligand complex.
+
+    Returns
+    -------
+    tuple :
+        - highlight_atoms (list of int): Sorted atom indices of the highlighted ligand atoms.
+        - highlight_colors (dict): Atom index as key and the RGB color of the interaction as value.
+    """
+    highlight_colors = {}
+    for category, atoms in highlight_categories(interactions, lig_index).items():
+        for atom in atoms:
+            highlight_colors.setdefault(int(atom), HIGHLIGHT_COLORS[category])
+
+    return sorted(highlight_colors), highlight_colors
+
+
 def highlight_numbers(split_data, starting_idx):
     """
     Extracts the data from the split_data output of the interactions and categorizes it to its respective list.
@@ -57,119 +165,9 @@ def highlight_numbers(split_data, starting_idx):
         - highlighted_pication (list of int): Atom indices for pi-cation interactions.
         - highlighted_metal (list of int): Atom indices for metal interactions.
     """
-    highlighted_hbond_acceptor = []
-    highlighted_hbond_donor = []    
-    highlighted_hydrophobic = []
-    highlighted_hbond_both = []
-    highlighted_waterbridge = []
-    highlighted_pistacking = []
-    highlighted_halogen = []
-    highlighted_ni = []
-    highlighted_pi = []
-    highlighted_pication = []
-    highlighted_metal = []
-    
-    
-    for item in split_data:
-        parts = item.split()
-        protein_partner_name = parts[0]
-        numeric_codes = parts[1:-1]
-        interaction_type = parts[-1]
+    categories = highlight_categories(('_'.join(item.split()) for item in split_data), starting_idx)
 
-        if interaction_type == 'hbond':
-            parts = item.split()
-            protein_partner_name = parts[0]
-            numeric_codes = parts[1:-2]
-            type = parts[-2]
-            interaction_type = parts[-1]
-            for code in numeric_codes:
-                atom_index = int(code) - starting_idx  # Subtract starting_idx from the numeric code
-                if type == "Donor":
-                    highlighted_hbond_donor.append(atom_index)
-                elif type == "Acceptor":
-                    highlighted_hbond_acceptor.append(atom_index)                    
-
-        elif interaction_type == 'hydrophobic':
-            parts = item.split()
-            protein_partner_name = parts[0]
-            numeric_codes = parts[1:-1]
-            interaction_type = parts[-1]
-            for code in numeric_codes:
-                atom_index = int(code) - starting_idx  # Subtract starting_idx from the numeric code
-                highlighted_hydrophobic.append(atom_index)
-
-        elif interaction_type == 'waterbridge':
-            parts = item.split()
-            protein_partner_name = parts[0]
-            numeric_codes = parts[1:-1]
-            interaction_type = parts[-1]
-            for code in numeric_codes:
-                atom_index = int(code) - starting_idx  # Subtract starting_idx from the numeric code
-                highlighted_waterbridge.append(atom_index)
-
-        elif interaction_type == 'pistacking':
-            parts = item.split()
-            protein_partner_name = parts[0]
-            numeric_codes = parts[1:-1]
-            interaction_type = parts[-1]
-            for code in numeric_codes:
-                atom_index = int(code) - starting_idx  # Subtract starting_idx from the numeric code
-                highlighted_pistacking.append(atom_index)
-
-        elif interaction_type == 'halogen':
-            parts = item.split()
-            protein_partner_name = parts[0]
-            numeric_codes = parts[1:-2]
-            interaction_type = parts[-1]
-            halogen_type = parts[-2]
-            for code in numeric_codes:
-                atom_index = int(code) - starting_idx  # Subtract starting_idx from the numeric code
-                highlighted_halogen.append(atom_index)
-
-        elif interaction_type == 'saltbridge':
-            parts = item.split()
-            protein_partner_name = parts[0]
-            numeric_codes = parts[1:-3]
-            interaction_type = parts[-1]
-            saltbridge_type = parts[-2]
-            if saltbridge_type == "NI":
-                split_codes = numeric_codes[0].split(',')
-                numeric_values = [int(code) for code in split_codes]
-                for code in numeric_values:
-                    atom_index = int(code) - starting_idx  # Subtract starting_idx from the numeric code
-                    highlighted_ni.append(atom_index)
-            if saltbridge_type == "PI":
-                highlighted_pi.append(atom_index)
-                for code in numeric_codes:
-                    atom_index = int(code) - starting_idx  # Subtract starting_idx from the numeric code
-
-        elif interaction_type == 'pication':
-            parts = item.split()
-            protein_partner_name = parts[0]
-            numeric_codes = parts[1:-2]
-            interaction_type = parts[-1]
-            halogen_type = parts[-2]
-            for code in numeric_codes:
-                atom_index = int(code) - starting_idx  # Subtract starting_idx from the numeric code
-                highlighted_pication.append(atom_index)
-
-        elif interaction_type == 'metal':
-            parts = item.split()
-            protein_partner_name = parts[0]
-            numeric_codes = parts[1:-2]
-            interaction_type = parts[-1]
-            halogen_type = parts[-2]
-            for code in numeric_codes:
-                atom_index = int(code) - starting_idx  # Subtract starting_idx from the numeric code
-                highlighted_metal.append(atom_index)
-    
-    for value in highlighted_hbond_donor[:]:  # Using a copy of the list to avoid modifying while iterating
-        if value in highlighted_hbond_acceptor:
-            highlighted_hbond_donor.remove(value)
-            highlighted_hbond_acceptor.remove(value)
-            highlighted_hbond_both.append(value)
-    
-    return highlighted_hbond_donor, highlighted_hbond_acceptor, highlighted_hbond_both, highlighted_hydrophobic, highlighted_waterbridge, highlighted_pistacking, highlighted_halogen, highlighted_ni, highlighted_pi, highlighted_pication, highlighted_metal
+    return tuple(sorted(categories[category]) for category in ('hbond_donor', 'hbond_acceptor', 'hbond_both', 'hydrophobic', 'waterbridge', 'pistacking', 'halogen', 'ni', 'pi', 'pication', 'metal'))
 
 def generate_interaction_dict(interaction_type, keys):
     """
@@ -187,21 +185,7 @@ def generate_interaction_dict(interaction_type, keys):
     dict :
         A dictionary with the interaction types are associated with their respective RGB color codes.
     """
-    interaction_dict = {
-        'hbond_acceptor': (1.0, 0.6, 0.6),
-        'hbond_both': (0.6, 0.0, 0.5),
-        'hbond_donor': (0.3, 0.5, 1.0),
-        'hydrophobic': (1.0, 1.0, 0.0),
-        'waterbridge': (0.0, 1.0, 0.9),
-        'pistacking': (0.0, 0.0, 1.0),
-        'halogen': (1.0, 0.0, 0.9),
-        'ni': (0.0, 0.0, 1.0),
-        'pi': (1.0, 0.0, 0.0),
-        'pication': (0.0, 0.0, 1.0),
-        'metal': (1.0, 0.6, 0.0)
-    }
-
-    interaction_dict = {int(key): interaction_dict[interaction_type] for key in keys}
+    interaction_dict = {int(key): HIGHLIGHT_COLORS[interaction_type] for key in keys}
 
     return interaction_dict
 
@@ -228,9 +212,32 @@ def update_dict(target_dict, *source_dicts):
                 target_dict[int_key] = value
 
 
-def create_and_merge_images(binding_mode, occurrence_percent, split_data, merged_image_paths):
+def svg_to_image(svg):
+    """
+    Converts an SVG drawing to a PIL image in memory.
+
+    Parameters
+    ----------
+    svg : str
+        The SVG drawing.
+
+    Returns
+    -------
+    PIL.Image.Image :
+        The rendered image.
+    """
+    # cairosvg needs the cairo library, it is only imported when a drawing is rendered
+    import cairosvg
+
+    image = Image.open(io.BytesIO(cairosvg.svg2png(bytestring=svg.encode())))
+    image.load()
+
+    return image
+
+
+def legend_image(binding_mode, occurrence_percent, split_data):
     """
-    Create and merge images to generate a legend for binding modes.
+    Generates the legend of the interactions of a binding mode as PIL image in memory and closes the figures afterwards.
 
     Parameters
     ----------
@@ -240,13 +247,11 @@ def create_and_merge_images(binding_mode, occurrence_percent, split_data, merged
         The percentage occurrence of the binding mode.
     split_data: list of str
         Data of the interaction used to generate the legend.
-    merged_image_paths: list
-        A list with the paths to the rdkit figures.
-        
+
     Returns
     -------
-    list :
-        A list containing the file paths of the merged images, which are the rdkit figure with the legend.
+    PIL.Image.Image :
+        The legend image.
     """
     # Create the main figure and axis
     fig = pylab.figure()
@@ -283,15 +288,34 @@ def create_and_merge_images(binding_mode, occurrence_percent, split_data, merged
     figlegend.text(0.5, 0.9, f"{binding_mode}", ha='center', fontsize=12, weight='bold')
     figlegend.text(0.5, 0.85, f"Occurrence {occurrence_percent}%", ha='center', fontsize=12, weight='bold')
 
-    # Save the legend figure to a file
-    legend_filename = f'{binding_mode}_legend.png'
-    figlegend.savefig(legend_filename)
+    # Render the legend figure to memory and close both figures
+    buffer = io.BytesIO()
+    figlegend.savefig(buffer, format='png')
+    pylab.close(fig)
+    pylab.close(figlegend)
+    buffer.seek(0)
+    image = Image.open(buffer)
+    image.load()
+
+    return image
+
 
-    # Read the two images
-    image1 = Image.open(f'{binding_mode}.png')
-    image2 = Image.open(legend_filename)
+def merge_images(image1, image2):
+    """
+    Merges two images side by side.
+
+    Parameters
+    ----------
+    image1 : PIL.Image.Image
+        The left image, which defines the height of the merged image.
+    image2 : PIL.Image.Image
+        The right image.
 
-    # Resize the first image
+    Returns
+    -------
+    PIL.Image.Image :
+        The merged image.
+    """
     image1_size = image1.size
     image2_size = image2.size
     total_width = image1_size[0] + image2_size[0]
@@ -299,74 +323,158 @@ def create_and_merge_images(binding_mode, occurrence_percent, split_data, merged
     new_image.paste(image1, (0, 0))
     new_image.paste(image2, (image1_size[0], 0))
 
-    # Save the merged image
-    merged_image_filename = f"{binding_mode}_merged.png"
-    new_image.save(merged_image_filename, "PNG")
+    return new_image
+
+
+def ligand_depiction(prepared_ligand, highlight_atoms, highlight_colors):
+    """
+    Draws the 2D depiction of the ligand with the highlighted atoms.
+
+    Parameters
+    ----------
+    prepared_ligand : rdkit.Chem.rdchem.Mol
+        The ligand with 2D coordinates.
+    highlight_atoms : list of int
+        Atom indices of the highlighted ligand atoms.
+    highlight_colors : dict
+        Atom index as key and the RGB color of the highlight as value.
+
+    Returns
+    -------
+    PIL.Image.Image :
+        The ligand depiction.
+    """
+    # Convert the RDKit molecule to SVG format with atom highlights
+    drawer = rdMolDraw2D.MolDraw2DSVG(600, 600)
+    drawer.DrawMolecule(prepared_ligand, highlightAtoms=highlight_atoms, highlightAtomColors=highlight_colors)
+    drawer.FinishDrawing()
+    svg = drawer.GetDrawingText().replace('svg:', '')
+
+    return svg_to_image(svg)
 
-    # Append the merged image path to the list
-    merged_image_paths.append(merged_image_filename)
 
-    # Remove the original files
-    os.remove(f'{binding_mode}.png')
-    os.remove(legend_filename)
-    os.remove(f'{binding_mode}.svg')
+def group_binding_modes(binding_modes, lig_index):
+    """
+    Groups the binding modes by their highlighted atoms and colors, so identical ligand depictions are drawn only once.
+
+    Parameters
+    ----------
+    binding_modes : list of tuple
+        The binding modes as tuples of the name, the interactions and the percentage occurrence.
+    lig_index : int
+        Atom index of the first ligand atom in the protein-ligand complex.
+
+    Returns
+    -------
+    list of list of tuple :
+        The binding modes grouped by identical highlights, in the order of their first appearance.
+    """
+    groups = {}
+    for binding_mode in binding_modes:
+        highlight_atoms, highlight_colors = highlight_atom_colors(binding_mode[1], lig_index)
+        highlight_key = (tuple(highlight_atoms), tuple(sorted(highlight_colors.items())))
+        groups.setdefault(highlight_key, []).append(binding_mode)
+
+    return list(groups.values())
+
+
+def generate_binding_mode_figures(binding_modes, ligand):
+    """
+    Generates the figures of binding modes that share the same highlighted atoms, the ligand depiction is drawn once and merged with the legend of each binding mode.
 
-    return merged_image_paths
+    Parameters
+    ----------
+    binding_modes : list of tuple
+        The binding modes as tuples of the name, the interactions and the percentage occurrence (see group_binding_modes).
+    ligand : dict
+        The prepared ligand with 2D coordinates and the atom index offset generated by ligand_processing.prepare_ligand.
+
+    Returns
+    -------
+    dict :
+        The name of the binding mode as key and the merged image, which is the rdkit figure with the legend, as PNG data as value.
+    """
+    depiction = None
+    figures = {}
+    for binding_mode, values, occurrence_percent in binding_modes:
+        split_data = split_interaction_data(values)
+        if depiction is None:
+            depiction = ligand_depiction(ligand['mol'], *highlight_atom_colors(values, ligand['lig_index']))
+
+        # Merge the depiction with the interactions legend in memory
+        merged_image = merge_images(depiction, legend_image(binding_mode, occurrence_percent, split_data))
+        buffer = io.BytesIO()
+        merged_image.save(buffer, "PNG")
+        figures[binding_mode] = buffer.getvalue()
+
+    return figures
 
-def arranged_figure_generation(merged_image_paths, output_path):
+
+def arranged_figure_generation(merged_image_paths, output_path, images_per_page=10, output_dir="Binding_Modes_Markov_States"):
     """
     Generate an arranged figure by arranging merged images in rows and columns.
+    Large numbers of images are split into multiple pages, so only the images of one page are opened at a time.
 
     Parameters
     ----------
-    merged_image_paths : str
-        Paths of the merged images with the rdkit figure and legend.
+    merged_image_paths : list of str or bytes
+        Paths of the merged images with the rdkit figure and legend or the merged images as PNG data.
     output_path: dict
-        The path where the arranged output should be saved.
-        
+        The path where the arranged output should be saved, pages are saved with the suffix _page{number}.
+    images_per_page : int (optional)
+        The maximum number of images in one arranged figure.
+    output_dir : str (optional)
+        The folder the arranged figures are saved to.
+
     Returns
     -------
     None
     """
-    # Open the list of images
-    merged_images = [Image.open(path) for path in merged_image_paths]
+    os.makedirs(output_dir, exist_ok=True)
+    n_pages = (len(merged_image_paths) + images_per_page - 1) // images_per_page
+    output_name, output_extension = os.path.splitext(os.path.basename(output_path))
 
-    # Calculate the maximum width and height for the images
-    max_width = max(image.size[0] for image in merged_images)
-    max_height = max(image.size[1] for image in merged_images)
+    for page in range(n_pages):
+        # Open the list of images of the page, PNG data is read from memory
+        page_images = merged_image_paths[page * images_per_page:(page + 1) * images_per_page]
+        merged_images = [Image.open(io.BytesIO(image) if isinstance(image, bytes) else image) for image in page_images]
 
-    # Determine the number of images per row (in your case, 2 images per row)
-    images_per_row = 2
+        # Calculate the maximum width and height for the images
+        max_width = max(image.size[0] for image in merged_images)
+        max_height = max(image.size[1] for image in merged_images)
 
-    # Calculate the number of rows and columns required
-    num_rows = (len(merged_images) + images_per_row - 1) // images_per_row
-    total_width = max_width * images_per_row
-    total_height = max_height * num_rows
+        # Determine the number of images per row (in your case, 2 images per row)
+        images_per_row = 2
 
-    # Create a new image with the calculated width and height
-    big_figure = Image.new('RGB', (total_width, total_height), (255, 255, 255))  # Set background to white
+        # Calculate the number of rows and columns required
+        num_rows = (len(merged_images) + images_per_row - 1) // images_per_row
+        total_width = max_width * images_per_row
+        total_height = max_height * num_rows
 
-    x_offset = 0
-    y_offset = 0
+        # Create a new image with the calculated width and height
+        big_figure = Image.new('RGB', (total_width, total_height), (255, 255, 255))  # Set background to white
 
-    for image in merged_images:
-        # Paste the image onto the big figure
-        big_figure.paste(image, (x_offset, y_offset))
+        x_offset = 0
+        y_offset = 0
 
-        # Update offsets
-        x_offset += max_width
+        for image in merged_images:
+            # Paste the image onto the big figure
+            big_figure.paste(image, (x_offset, y_offset))
+            image.close()
 
-        # Move to the next row if necessary
-        if x_offset >= total_width:
-            x_offset = 0
-            y_offset += max_height
+            # Update offsets
+            x_offset += max_width
 
-    # Save the big figure
-    big_figure.save(output_path, "PNG")
+            # Move to the next row if necessary
+            if x_offset >= total_width:
+                x_offset = 0
+                y_offset += max_height
 
-    # Rename the merged image
-    os.rename(output_path, "Binding_Modes_Markov_States/" + os.path.basename(output_path))
+        # Save the big figure in the output folder
+        page_path = f"{output_name}{output_extension}" if n_pages == 1 else f"{output_name}_page{page + 1}{output_extension}"
+        big_figure.save(os.path.join(output_dir, page_path), "PNG")
 
     # Remove the individual image files
     for path in merged_image_paths:
-        os.remove(path)
+        if isinstance(path, str):
+            os.remove(path)
@@ -0,0 +1,74 @@
+"""
+Shared fixtures of the tests.
+"""
+import numpy as np
+import pandas as pd
+import MDAnalysis as mda
+import pytest
+from rdkit import Chem
+from rdkit.Chem import AllChem
+
+
+# Atom names, elements and offsets to the ligand center of the leucines on both sides of the ligand ring
+LEUCINE_ATOMS = [("N", "N", (-2, 0, 7.5)), ("CA", "C", (-1, 0, 7)), ("C", "C", (0, 1, 7.5)), ("O", "O", (0, 2, 7.6)),
+                 ("CB", "C", (-1, -1, 6)), ("CG", "C", (0, -1, 5)), ("CD1", "C", (0.5, 0, 3.8)), ("CD2", "C", (-0.5, -1.5, 3.8))]
+
+
+@pytest.fixture
+def interaction_dataframe():
+    """
+    Interactions of three frames with the PLIP coordinate strings, a hydrogen bond in the first frame and a hydrophobic interaction in the first
+    two frames. The row of the third frame has no interaction.
+    """
+    return pd.DataFrame({
+        'FRAME': [1, 1, 2, 3],
+        'LIGCOO': ['(1.0, 2.0, 3.0)', '(2.0, 3.0, 4.5)', '(0.5, 0.5, 0.5)', '(4.0, 4.0, 4.0)'],
+        'PROTCOO': ['(0.0, 0.0, 0.0)', '(1.0, 1.0, 1.0)', '(2.0, 2.0, 2.0)', '(3.0, 3.0, 3.0)'],
+        'ASP12A_3_Donor_hbond': [1, 1, 0, 0],
+        'LEU4A_5_hydrophobic': [0, 1, 1, 0],
+    })
+
+
+@pytest.fixture(scope="session")
+def md_system(tmp_path_factory):
+    """
+    A toluene ligand between two leucines and a water, with an 8 frame trajectory in which the first leucine leaves in frames 5 and 6.
+    Both leucines form hydrophobic interactions with the ligand ring.
+    """
+    system_dir = tmp_path_factory.mktemp("md_system")
+    mol = Chem.AddHs(Chem.MolFromSmiles("Cc1ccccc1"))
+    AllChem.EmbedMolecule(mol, randomSeed=42)
+    mol = Chem.RemoveHs(mol)
+    ligand_sdf = str(system_dir / "lig.sdf")
+    with Chem.SDWriter(ligand_sdf) as writer:
+        writer.write(mol)
+
+    ligand = mol.GetConformer().GetPositions()
+    center = ligand.mean(axis=0)
+    lines = []
+    serial = 1
+    for resid, side in ((1, 1), (2, -1)):
+        for name, element, offset in LEUCINE_ATOMS:
+            x, y, z = center + side * np.asarray(offset)
+            lines.append(f"ATOM  {serial:5d}  {name:<3s} LEU A{resid:4d}    {x:8.3f}{y:8.3f}{z:8.3f}  1.00  0.00          {element:>2s}")
+            serial += 1
+    for index, (x, y, z) in enumerate(ligand):
+        lines.append(f"HETATM{serial:5d}  {f'C{index + 1}':<3s} UNK A   3    {x:8.3f}{y:8.3f}{z:8.3f}  1.00  0.00           C")
+        serial += 1
+    x, y, z = center + np.array([4.0, 4.0, 0.0])
+    lines.append(f"HETATM{serial:5d}  O   WAT W   4    {x:8.3f}{y:8.3f}{z:8.3f}  1.00  0.00           O")
+    topology = str(system_dir / "system.pdb")
+    with open(topology, "w") as f:
+        f.write("\n".join(lines) + "\nEND\n")
+
+    u = mda.Universe(topology)
+    rng = np.random.default_rng(0)
+    positions = u.atoms.positions.copy()
+    first_leucine = (u.atoms.resids == 1)[:, None]
+    trajectory = str(system_dir / "system.dcd")
+    with mda.Writer(trajectory, u.atoms.n_atoms) as W:
+        for frame in range(8):
+            u.atoms.positions = positions + rng.normal(0, 0.1, positions.shape) + (np.array([0, 0, 3.0]) * first_leucine if frame in (5, 6) else 0)
+            W.write(u.atoms)
+
+    return {"topology": topology, "trajectory": trajectory, "ligand_sdf": ligand_sdf}
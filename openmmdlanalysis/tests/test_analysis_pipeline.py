@@ -0,0 +1,57 @@
+"""
+Unit tests for the analysis pipeline entry point.
+"""
+import os
+
+import pytest
+
+from openmmdlanalysis.analysis_pipeline import AnalysisResult, run_analysis
+from openmmdlanalysis.interaction_gathering import process_trajectory
+
+
+def test_run_analysis_in_memory(tmp_path, md_system, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    output_dir = tmp_path / "output"
+
+    result = run_analysis(md_system["topology"], md_system["trajectory"], md_system["ligand_sdf"], "UNK", binding_treshold=1,
+                          num_processes=1, output_dir=str(output_dir))
+
+    assert isinstance(result, AnalysisResult)
+    # the first leucine leaves the ligand in the frames 5 and 6
+    barcodes = {interaction[:4]: barcode.tolist() for interaction, barcode in result.barcodes.items()}
+    assert barcodes == {"1LEU": [1, 1, 1, 1, 0, 0, 1], "2LEU": [1, 1, 1, 1, 1, 1, 1]}
+    assert len(result.fingerprints) == 7
+    assert result.binding_modes == ["Binding_Mode_1"] * 7
+    assert result.top_binding_modes.to_dict("records") == [{"Binding Mode": "Binding_Mode_1", "First Frame": 1, "Percentage Occurrence": 100.0}]
+    assert result.transitions["occurrences"].tolist() == [7]
+    assert result.transitions["counts"].tolist() == [6]
+    assert result.interacting_waters == []
+    assert result.markov_state_model is None
+    assert result.binding_mode_figures == {}
+    assert result.session.total_frames == 7
+    assert set(result.interactions["INTERACTION"]) == {"hydrophobic"}
+
+    # without artifacts nothing is written, neither to the output folder nor to the working directory
+    assert os.listdir(tmp_path) == []
+    # without verbose neither the progress nor a progress bar is printed
+    captured = capsys.readouterr()
+    assert captured.out == ""
+    assert "Analyzing frames" not in captured.err
+
+
+def test_run_analysis_with_gathered_interactions(tmp_path, md_system):
+    result = run_analysis(md_system["topology"], md_system["trajectory"], md_system["ligand_sdf"], "UNK", binding_treshold=1, num_processes=1)
+    interactions = process_trajectory(result.session.universe, None, num_processes=1, output_csv=None)
+
+    gathered_result = run_analysis(md_system["topology"], md_system["trajectory"], md_system["ligand_sdf"], "UNK", binding_treshold=1,
+                                   msm_lags=[1], msm_bootstrap=0, output_dir=str(tmp_path), artifacts=["tables"], interactions=interactions)
+
+    assert gathered_result.binding_modes == result.binding_modes
+    assert gathered_result.barcodes.keys() == result.barcodes.keys()
+    assert gathered_result.markov_state_model["lags"] == [1]
+    assert sorted(os.listdir(tmp_path)) == ["df_all.csv", "interactions_gathered.csv", "lig.smi"]
+
+
+def test_run_analysis_rejects_unknown_artifacts(md_system):
+    with pytest.raises(ValueError, match="Unknown artifacts: \\['plots'\\]"):
+        run_analysis(md_system["topology"], md_system["trajectory"], md_system["ligand_sdf"], artifacts=["tables", "plots"])
@@ -0,0 +1,44 @@
+"""
+Unit tests for the shared analysis session.
+"""
+import MDAnalysis as mda
+from rdkit import Chem
+from rdkit.Chem import AllChem
+
+from openmmdlanalysis.analysis_session import AnalysisSession
+
+
+PROTEIN = """\
+ATOM      1  N   ALA A   1      -4.000   0.000   0.000  1.00  0.00           N
+ATOM      2  CA  ALA A   1      -5.458   0.000   0.000  1.00  0.00           C
+HETATM    3  O   WAT B   2      30.000   0.000   0.000  1.00  0.00           O
+HETATM    4  O   WAT B   3       3.000   3.000   3.000  1.00  0.00           O
+"""
+
+
+def test_analysis_session(tmp_path):
+    mol = Chem.MolFromSmiles('Cc1ccccc1')
+    AllChem.EmbedMolecule(mol, randomSeed=42)
+    ligand_sdf = str(tmp_path / "lig.sdf")
+    with Chem.SDWriter(ligand_sdf) as writer:
+        writer.write(mol)
+    ligand_lines = [line.replace("UNL", "*  ") for line in Chem.MolToPDBBlock(mol, flavor=4).splitlines() if line.startswith("HETATM")]
+    topology = str(tmp_path / "system.pdb")
+    with open(topology, "w") as f:
+        f.write(PROTEIN + "\n".join(ligand_lines) + "\nEND\n")
+    trajectory = str(tmp_path / "system.dcd")
+    u = mda.Universe(topology)
+    with mda.Writer(trajectory, u.atoms.n_atoms) as W:
+        for _ in range(3):
+            W.write(u.atoms)
+
+    session = AnalysisSession(topology, trajectory, ligand_sdf, "*", cache_dir=None)
+    assert session.ligand_name == "UNK"
+    assert list(session.universe.residues.resnames) == ["ALA", "HOH", "HOH", "UNK"]
+    assert session.total_frames == 2
+
+    # the ligand offset matches the atom id of the first ligand atom in the written complex
+    session.complex_atoms.write(str(tmp_path / "complex.pdb"))
+    assert session.lig_index == mda.Universe(str(tmp_path / "complex.pdb")).select_atoms("resname UNK")[0].id == 4
+    assert session.ligand_rings == [[5, 6, 7, 8, 9, 10]]
+    assert session.ligand_mol.GetNumAtoms() == 7
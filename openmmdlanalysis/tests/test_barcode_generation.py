@@ -0,0 +1,69 @@
+"""
+Unit tests for the barcode generation.
+"""
+import numpy as np
+import pandas as pd
+
+from openmmdlanalysis.barcode_generation import barcode_matrix, barcode_dict, barcodegeneration, waterids_matrix, barcode_runs, barcodes_from_runs, residence_time_statistics, downsample_barcodes
+
+
+def test_barcode_matrix(interaction_dataframe):
+    barcodes, columns = barcode_matrix(interaction_dataframe, ['ASP12A_3_Donor_hbond', 'LEU4A_5_hydrophobic'])
+    assert barcodes.dtype == np.uint8
+    assert list(columns) == ['ASP12A_3_Donor_hbond', 'LEU4A_5_hydrophobic']
+    np.testing.assert_array_equal(barcodes, [[1, 1], [0, 1], [0, 0]])
+
+
+def test_barcode_dict_matches_barcodegeneration(interaction_dataframe):
+    df = interaction_dataframe
+    barcodes, columns = barcode_matrix(df, ['ASP12A_3_Donor_hbond', 'LEU4A_5_hydrophobic'])
+    for interaction, barcode in barcode_dict(barcodes, columns).items():
+        np.testing.assert_array_equal(barcode, barcodegeneration(df, interaction))
+
+
+def test_waterids_matrix():
+    df = pd.DataFrame({
+        'FRAME': [1, 2, 2, 3],
+        'WATER_IDX': [101, 102, 103, 0],
+        '3SERA_14_Acceptor_waterbridge': [1, 1, 1, 0],
+    })
+    waterids, columns = waterids_matrix(df, ['3SERA_14_Acceptor_waterbridge'])
+    np.testing.assert_array_equal(waterids[:, 0], [101, 102, 0])
+
+
+def test_barcode_runs_and_residence_times():
+    barcodes = np.array([[1, 0], [1, 0], [0, 0], [1, 1], [1, 1], [1, 0]], dtype=np.uint8)
+    run_interactions, run_starts, run_lengths = barcode_runs(barcodes)
+    np.testing.assert_array_equal(run_interactions, [0, 0, 1])
+    np.testing.assert_array_equal(run_starts, [0, 3, 3])
+    np.testing.assert_array_equal(run_lengths, [2, 3, 2])
+    np.testing.assert_array_equal(barcodes_from_runs(run_interactions, run_starts, run_lengths, 6, 2), barcodes)
+
+    statistics, survival, autocorrelation = residence_time_statistics(barcodes, pd.Index(['a', 'b']), max_lag=3)
+    assert statistics.loc['a', 'Formation Events'] == 2
+    assert statistics.loc['a', 'Mean Residence Time'] == 2.5
+    assert statistics.loc['a', 'Max Residence Time'] == 3
+    assert survival.loc[3, 'a'] == 0.5
+    assert autocorrelation.loc[0, 'b'] == 1.0
+
+
+def test_downsample_barcodes():
+    # 10 frames in 3 columns: frames 0-2, 3-5 and the ragged last column with the frames 6-9
+    bins = [0, 0, 0, 1, 1, 1, 2, 2, 2, 2]
+    for frame in range(10):
+        barcode = np.zeros(10, dtype=np.int8)
+        barcode[frame] = 1
+        downsampled = downsample_barcodes(barcode, 3)
+        assert downsampled.tolist() == [int(column == bins[frame]) for column in range(3)]
+
+    # all frames of every interaction of a (frames, interactions) array survive in their column
+    rng = np.random.default_rng(0)
+    barcodes = (rng.random((1001, 4)) > 0.995).astype(np.int8)
+    downsampled = downsample_barcodes(barcodes, 7)
+    assert downsampled.shape == (7, 4)
+    columns = np.linspace(0, 1001, 8).astype(np.int64)
+    for column in range(7):
+        np.testing.assert_array_equal(downsampled[column], barcodes[columns[column]:columns[column + 1]].max(axis=0))
+
+    # short barcodes are not changed
+    assert downsample_barcodes(barcodes[:5], 7).shape == (5, 4)
@@ -0,0 +1,83 @@
+"""
+Unit tests for the batch analysis of several systems.
+"""
+import os
+
+import pandas as pd
+import pytest
+
+from openmmdlanalysis.batch_analysis import read_manifest, run_batch, system_summary
+
+
+def write_manifest(path, md_system, names):
+    with open(path, "w") as f:
+        f.write("name,topology,trajectory,ligand_sdf,replica\n")
+        for replica, name in enumerate(names, 1):
+            f.write(f"{name},{md_system['topology']},{md_system['trajectory']},{md_system['ligand_sdf']},{replica}\n")
+
+
+def test_read_manifest_resolves_paths(tmp_path):
+    manifest = tmp_path / "manifest.csv"
+    manifest.write_text("name,topology,trajectory,ligand_sdf\nsysA,inputs/a.pdb,inputs/a.dcd,/abs/lig.sdf\n")
+
+    systems = read_manifest(str(manifest))
+
+    assert systems.loc["sysA", "topology"] == str(tmp_path / "inputs" / "a.pdb")
+    assert systems.loc["sysA", "trajectory"] == str(tmp_path / "inputs" / "a.dcd")
+    assert systems.loc["sysA", "ligand_sdf"] == "/abs/lig.sdf"
+    assert systems.loc["sysA", "ligand_name"] == "UNK"
+    assert systems.loc["sysA", "replica"] == ""
+
+
+@pytest.mark.parametrize("content, message", [
+    ("name,topology,trajectory\nsysA,a.pdb,a.dcd\n", "missing the columns \\['ligand_sdf'\\]"),
+    ("name,topology,trajectory,ligand_sdf\nsysA,a.pdb,a.dcd,l.sdf\nsysA,b.pdb,b.dcd,l.sdf\n", "not unique: \\['sysA'\\]"),
+])
+def test_read_manifest_validation(tmp_path, content, message):
+    manifest = tmp_path / "manifest.csv"
+    manifest.write_text(content)
+
+    with pytest.raises(ValueError, match=message):
+        read_manifest(str(manifest))
+
+
+def test_system_summary_of_failed_system():
+    system = pd.Series({"name": "sysA", "ligand_name": "UNK", "replica": "2"})
+
+    assert system_summary(system, None) == {"name": "sysA", "ligand_name": "UNK", "replica": "2"}
+
+
+def test_run_batch_records_failed_systems(tmp_path, md_system):
+    manifest = str(tmp_path / "manifest.csv")
+    write_manifest(manifest, md_system, ["sysA", "sysB"])
+    with open(manifest, "a") as f:
+        f.write(f"broken,{md_system['topology']},{md_system['trajectory']},{tmp_path / 'missing.sdf'},3\n")
+
+    summary, occurrences = run_batch(manifest, str(tmp_path / "batch"), num_processes=2, artifacts=(), binding_treshold=1)
+
+    assert list(summary["name"]) == ["sysA", "sysB", "broken"]
+    assert list(summary["error"] != "") == [False, False, True]
+    assert summary.loc[2, ["frames", "binding_modes"]].isna().all()
+    assert (occurrences.loc["broken"] == 0).all()
+    assert (occurrences.loc["sysA"] > 0).all()
+    assert os.path.isfile(os.path.join(tmp_path, "batch", "batch_summary.csv"))
+
+
+def test_run_batch_writes_figures_per_system(tmp_path, md_system, monkeypatch):
+    launch_dir = tmp_path / "launch"
+    launch_dir.mkdir()
+    monkeypatch.chdir(launch_dir)
+    manifest = str(tmp_path / "manifest.csv")
+    write_manifest(manifest, md_system, ["sysA", "sysB"])
+    output_dir = str(tmp_path / "batch")
+
+    summary, occurrences = run_batch(manifest, output_dir, num_processes=2, artifacts=["markov", "barcodes"], binding_treshold=1)
+
+    assert list(summary["error"]) == ["", ""]
+    assert list(occurrences.index) == ["sysA", "sysB"]
+    for name in ("sysA", "sysB"):
+        system_dir = os.path.join(output_dir, name)
+        assert os.path.isfile(os.path.join(system_dir, "Binding_Modes_Markov_States", "markov_chain_plot_1.png"))
+        assert os.path.isfile(os.path.join(system_dir, "Barcodes", "hydrophobic_barcodes.png"))
+    # the workers of the shared pool write nothing to the launch directory
+    assert os.listdir(launch_dir) == []
@@ -0,0 +1,68 @@
+"""
+Unit tests for the volumetric density grids of the interaction clouds.
+"""
+import numpy as np
+import pytest
+
+from openmmdlanalysis.cloud_processing import grid_dimensions, density_grid, write_density_maps, voxel_downsample, downsample_cloud, bounded_cloud, save_clouds_npz, load_clouds_npz
+
+
+def test_density_grid_conserves_points():
+    rng = np.random.default_rng(0)
+    coordinates = rng.normal(size=(500, 3))
+    origin, shape = grid_dimensions(coordinates, spacing=0.5, padding=4.0)
+
+    histogram = density_grid(coordinates, origin, shape, spacing=0.5, sigma=None)
+    smoothed = density_grid(coordinates, origin, shape, spacing=0.5, sigma=1.0)
+    assert histogram.sum() == 500
+    np.testing.assert_allclose(smoothed.sum(), 500, rtol=1e-3)
+
+    peak = np.unravel_index(np.argmax(smoothed), smoothed.shape)
+    np.testing.assert_allclose(origin + 0.5 * np.array(peak), [0, 0, 0], atol=1.0)
+
+
+def test_write_density_maps(tmp_path):
+    clouds = {
+        'hydrophobic': {'coordinates': [[0.0, 0.0, 0.0], [1.0, 1.0, 1.0]], 'color': [1.0, 1.0, 0.0], 'radius': 0.05},
+        'donor': {'coordinates': [], 'color': [0.0, 1.0, 0.0], 'radius': 0.05},
+    }
+    density_maps = write_density_maps(clouds, str(tmp_path), spacing=1.0, padding=1.0, sigma=None)
+
+    assert list(density_maps) == ['hydrophobic']
+    with open(density_maps['hydrophobic']) as f:
+        lines = f.read().splitlines()
+    assert lines[1] == 'object 1 class gridpositions counts 4 4 4'
+    values = np.concatenate([np.array(line.split(), dtype=float) for line in lines[8:8 + 22]])
+    assert values.sum() == 2
+
+
+def test_downsample_and_npz_roundtrip(tmp_path):
+    rng = np.random.default_rng(0)
+    coordinates = rng.uniform(0, 10, size=(20000, 3))
+
+    centroids, weights = voxel_downsample(coordinates, voxel_size=1.0)
+    assert len(centroids) == 1000
+    assert weights.sum() == 20000
+    assert len(downsample_cloud(coordinates, max_points=500)) == 500
+    assert len(downsample_cloud(coordinates, max_points=500, method='random')) == 500
+
+    clouds = {'hydrophobic': {'coordinates': coordinates[:10].tolist(), 'color': [1.0, 1.0, 0.0], 'radius': 0.05}}
+    save_clouds_npz(clouds, str(tmp_path / "clouds.npz"))
+    loaded = load_clouds_npz(str(tmp_path / "clouds.npz"))
+    assert loaded['hydrophobic']['coordinates'].dtype == np.float32
+    np.testing.assert_allclose(loaded['hydrophobic']['coordinates'], coordinates[:10], rtol=1e-6)
+    assert loaded['hydrophobic']['color'] == [1.0, 1.0, 0.0]
+
+
+def test_bounded_cloud():
+    # points on both sides of the grid planes at 0 are merged once the voxels are larger than the cloud
+    coordinates = np.array([[-0.1, -0.1, -0.1], [0.1, 0.1, 0.1], [0.1, -0.1, 0.1], [0.1, 0.1, 0.1]])
+    for max_points in (1, 2, 3):
+        centroids, weights = bounded_cloud(coordinates, max_points=max_points, voxel_size=0.1)
+        assert len(centroids) <= max_points
+        assert weights.sum() == 4
+        assert list(weights) == sorted(weights, reverse=True)
+    np.testing.assert_allclose(bounded_cloud(coordinates, max_points=1)[0], [coordinates.mean(axis=0)], atol=1e-6)
+
+    with pytest.raises(ValueError, match="at least 1"):
+        bounded_cloud(coordinates, max_points=0)
@@ -0,0 +1,71 @@
+"""
+Unit tests for the parallel figure rendering.
+"""
+from multiprocessing import Pool
+
+import matplotlib
+import matplotlib.pyplot as plt
+import pytest
+
+from openmmdlanalysis.figure_rendering import figure_job, render_figures, run_figure_job
+
+
+def plot_line(values):
+    plt.figure()
+    plt.plot(values)
+    return sum(values)
+
+
+def current_backend():
+    return matplotlib.get_backend().lower()
+
+
+def failing_plot(message):
+    plt.figure()
+    raise RuntimeError(message)
+
+
+def test_run_figure_job_failure():
+    name, result, wall_time, error = run_figure_job(figure_job("broken", failing_plot, "no data"))
+
+    assert (name, result, error) == ("broken", None, "RuntimeError: no data")
+    assert wall_time >= 0
+    # the figures of failed jobs are closed as well
+    assert plt.get_fignums() == []
+
+
+def test_run_figure_job_closes_figures():
+    assert run_figure_job(figure_job("line", plot_line, [1, 2, 3]))[1] == 6
+    assert plt.get_fignums() == []
+
+
+@pytest.mark.parametrize("shared_pool", [False, True])
+def test_render_figures(shared_pool):
+    jobs = [figure_job("line", plot_line, [1, 2]), figure_job("broken", failing_plot, "no data"), figure_job("kwargs", plot_line, values=[3, 4])]
+
+    if shared_pool:
+        with Pool(processes=2) as pool:
+            results = render_figures(jobs, pool=pool)
+    else:
+        results = render_figures(jobs, num_processes=2)
+
+    assert results == {"line": 3, "broken": None, "kwargs": 7}
+
+
+def test_render_figures_quiet(capsys):
+    assert render_figures([figure_job("line", plot_line, [1, 2])], num_processes=1, verbose=False) == {"line": 3}
+    assert capsys.readouterr().out == ""
+
+
+def test_render_figures_selects_agg_in_the_workers_only():
+    backend = matplotlib.get_backend()
+    matplotlib.use("svg")
+    try:
+        assert render_figures([figure_job("backend", current_backend)], num_processes=1) == {"backend": "agg"}
+        assert matplotlib.get_backend().lower() == "svg"
+    finally:
+        matplotlib.use(backend)
+
+
+def test_render_figures_without_jobs():
+    assert render_figures([]) == {}
@@ -0,0 +1,71 @@
+"""
+Unit tests for the gathering of the interactions of trajectories.
+"""
+from multiprocessing import Pool
+
+import MDAnalysis as mda
+import pytest
+
+from openmmdlanalysis.interaction_gathering import load_worker_universe, process_trajectories, process_trajectory, trajectory_length
+from openmmdlanalysis.preprocessing import rename_residues
+
+
+def test_load_worker_universe_is_cached_and_renamed(md_system):
+    pdb_md = load_worker_universe(md_system["topology"], md_system["trajectory"])
+
+    assert load_worker_universe(md_system["topology"], md_system["trajectory"]) is pdb_md
+    assert list(pdb_md.residues.resnames) == ["LEU", "LEU", "UNK", "HOH"]
+    assert trajectory_length(md_system["trajectory"]) == len(pdb_md.trajectory) == 8
+
+
+def test_process_trajectories_of_two_systems(md_system):
+    systems = {name: (md_system["topology"], md_system["trajectory"]) for name in ("sysA", "sysB")}
+    pdb_md = mda.Universe(md_system["topology"], md_system["trajectory"])
+    rename_residues(pdb_md)
+    expected = process_trajectory(pdb_md, None, num_processes=1, output_csv=None)
+
+    with Pool(processes=2) as pool:
+        results = list(process_trajectories(systems, pool, chunksize=3, max_pending_chunks=2))
+
+    assert sorted(name for name, _ in results) == ["sysA", "sysB"]
+    for name, interactions in results:
+        # every frame of the system is processed once and the frames are in the order of the trajectory
+        assert interactions["FRAME"].is_monotonic_increasing
+        assert interactions[["FRAME", "INTERACTION", "RESNR"]].values.tolist() == expected[["FRAME", "INTERACTION", "RESNR"]].values.tolist()
+
+
+def test_process_trajectories_rejects_empty_trajectories(md_system, tmp_path):
+    trajectory = str(tmp_path / "single_frame.dcd")
+    u = mda.Universe(md_system["topology"])
+    with mda.Writer(trajectory, u.atoms.n_atoms) as W:
+        W.write(u.atoms)
+
+    with Pool(processes=1) as pool:
+        with pytest.raises(ValueError, match="no frames"):
+            next(process_trajectories({"sysA": (md_system["topology"], trajectory)}, pool))
+
+
+def test_process_trajectories_stops_submitting_when_closed(md_system):
+    systems = {name: (md_system["topology"], md_system["trajectory"]) for name in ("sysA", "sysB", "sysC")}
+
+    with Pool(processes=2) as pool:
+        trajectories = process_trajectories(systems, pool, chunksize=1, max_pending_chunks=2)
+        name, _ = next(trajectories)
+        trajectories.close()
+        # only the queued chunks are finished after the generator is closed, so the closed pool can be joined
+        pool.close()
+        pool.join()
+
+    assert name == "sysA"
+
+
+def test_process_trajectory_quiet(md_system, capsys):
+    pdb_md = mda.Universe(md_system["topology"], md_system["trajectory"])
+    rename_residues(pdb_md)
+
+    interactions = process_trajectory(pdb_md, None, num_processes=1, output_csv=None, verbose=False)
+
+    assert set(interactions["FRAME"]) == set(range(1, 8))
+    captured = capsys.readouterr()
+    assert captured.out == ""
+    assert "Analyzing frames" not in captured.err
@@ -0,0 +1,29 @@
+"""
+Unit tests for the prepared ligand cache.
+"""
+import os
+
+from rdkit import Chem
+from rdkit.Chem import AllChem
+
+from openmmdlanalysis.ligand_processing import prepare_ligand
+
+
+def test_prepare_ligand_cache(tmp_path):
+    mol = Chem.MolFromSmiles('Cc1ccccc1')
+    AllChem.EmbedMolecule(mol, randomSeed=42)
+    ligand_sdf = str(tmp_path / "lig.sdf")
+    ligand_pdb = str(tmp_path / "lig.pdb")
+    with Chem.SDWriter(ligand_sdf) as writer:
+        writer.write(mol)
+    Chem.MolToPDBFile(mol, ligand_pdb)
+    cache_dir = str(tmp_path / "cache")
+
+    ligand = prepare_ligand(ligand_sdf, ligand_pdb, 100, cache_dir=cache_dir)
+    assert len(os.listdir(cache_dir)) == 1
+    assert ligand['rings'] == [[101, 102, 103, 104, 105, 106]]
+    assert ligand['mol'].GetNumConformers() == 1
+
+    cached_ligand = prepare_ligand(ligand_sdf, ligand_pdb, 100, cache_dir=cache_dir)
+    assert Chem.MolToSmiles(cached_ligand['mol']) == Chem.MolToSmiles(ligand['mol'])
+    assert cached_ligand['mol'].GetConformer().Is3D() is False
@@ -0,0 +1,51 @@
+"""
+Unit tests for the transition counting and graph export of the binding mode Markov network.
+"""
+import numpy as np
+
+import networkx as nx
+import pytest
+
+from openmmdlanalysis.markov_state_figure_generation import transition_counts, markov_network_graph, export_markov_network
+
+
+def test_transition_counts():
+    states = ['Binding_Mode_1', 'Binding_Mode_1', 'Binding_Mode_2', 'Binding_Mode_1', 'Binding_Mode_2', 'Binding_Mode_2', 'Binding_Mode_3']
+    transitions = transition_counts(states)
+
+    assert transitions['states'].tolist() == ['Binding_Mode_1', 'Binding_Mode_2', 'Binding_Mode_3']
+    np.testing.assert_array_equal(transitions['occurrences'], [3, 3, 1])
+    np.testing.assert_array_equal(transitions['part_occurrences'], [[2, 1, 0], [1, 1, 0], [0, 1, 1]])
+
+    counted = {(int(u), int(v)): int(c) for u, v, c in zip(transitions['from'], transitions['to'], transitions['counts'])}
+    assert counted == {(0, 0): 1, (0, 1): 2, (1, 0): 1, (1, 1): 1, (1, 2): 1}
+
+
+def test_markov_network_graph_export(tmp_path):
+    states = ['Binding_Mode_1', 'Binding_Mode_1', 'Binding_Mode_2', 'Binding_Mode_1', 'Binding_Mode_2', 'Binding_Mode_2', 'Binding_Mode_3']
+    G = markov_network_graph({'all': states})
+
+    assert G.nodes['Binding_Mode_1']['occurrences'] == 3
+    assert G.nodes['Binding_Mode_1']['self_loop_probability'] == 1 / 3
+    assert G.edges['Binding_Mode_1', 'Binding_Mode_2']['forward_probability'] == 2 / 3
+
+    export_markov_network(G, str(tmp_path / "markov_chain.graphml"))
+    exported = nx.read_graphml(tmp_path / "markov_chain.graphml")
+    assert exported.edges['Binding_Mode_2', 'Binding_Mode_3']['weight'] == pytest.approx(100 / 7)
+
+
+def test_markov_network_graph_with_markov_state_model():
+    states = ['Binding_Mode_1', 'Binding_Mode_1', 'Binding_Mode_2', 'Binding_Mode_1', 'Binding_Mode_2', 'Binding_Mode_2', 'Binding_Mode_3']
+    probabilities = {('Binding_Mode_1', 'Binding_Mode_1'): 0.4, ('Binding_Mode_1', 'Binding_Mode_2'): 0.6, ('Binding_Mode_2', 'Binding_Mode_1'): 0.25,
+                     ('Binding_Mode_3', 'Binding_Mode_1'): 1.0}
+    G_counts = markov_network_graph({'all': states})
+    G = markov_network_graph({'all': states}, probabilities)
+
+    # the weights stay the percentage of frames of the observed transitions, so the thresholds keep their meaning
+    assert G.graph['markov_state_model'] and not G_counts.graph['markov_state_model']
+    assert dict(G.edges.items()).keys() == dict(G_counts.edges.items()).keys()
+    assert {edge: G.edges[edge]['weight'] for edge in G.edges} == {edge: G_counts.edges[edge]['weight'] for edge in G_counts.edges}
+    assert G.edges['Binding_Mode_1', 'Binding_Mode_2']['forward_probability'] == 0.6
+    assert G.edges['Binding_Mode_1', 'Binding_Mode_2']['backward_probability'] == 0.25
+    assert G.edges['Binding_Mode_2', 'Binding_Mode_3']['forward_probability'] == 0
+    assert G.nodes['Binding_Mode_1']['self_loop_probability'] == 0.4
@@ -0,0 +1,44 @@
+"""
+Unit tests for the Markov state model estimation of the binding modes.
+"""
+import numpy as np
+
+from openmmdlanalysis.markov_state_model import (
+    count_matrix,
+    row_normalize,
+    stationary_distribution,
+    implied_timescales,
+    mean_first_passage_times,
+    markov_state_model,
+    edge_probabilities,
+)
+
+
+def test_two_state_markov_state_model():
+    a, b = 0.2, 0.1
+    transition_matrix = np.array([[1 - a, a], [b, 1 - b]])
+    stationary = stationary_distribution(transition_matrix)
+
+    np.testing.assert_allclose(stationary, [b / (a + b), a / (a + b)])
+    np.testing.assert_allclose(implied_timescales(transition_matrix, 1)[0], -1 / np.log(1 - a - b))
+    np.testing.assert_allclose(mean_first_passage_times(transition_matrix, stationary, 2), [[0, 2 / a], [2 / b, 0]])
+
+
+def test_count_matrix_segments():
+    codes = np.array([0, 1, 1, 0, 1, 0])
+    np.testing.assert_array_equal(count_matrix(codes, 2), [[0, 2], [2, 1]])
+    np.testing.assert_array_equal(count_matrix(codes, 2, lag=2), [[1, 1], [1, 1]])
+    np.testing.assert_array_equal(count_matrix(codes, 2, segments=np.array([0, 0, 0, 1, 1, 1])), [[0, 2], [1, 1]])
+    np.testing.assert_allclose(row_normalize(np.array([[0, 0], [1, 3]])), [[1, 0], [0.25, 0.75]])
+
+
+def test_markov_state_model_bootstrap():
+    rng = np.random.default_rng(0)
+    states = np.where(rng.random(500) < 0.5, 'Binding_Mode_1', 'Binding_Mode_2').tolist()
+    model = markov_state_model(states, [1, 2], n_bootstrap=4, num_processes=1)
+
+    assert model['lags'] == [1, 2]
+    assert set(model['bootstrap']) == {1, 2}
+    assert model['bootstrap'][1]['stationary'].shape == (2,)
+    probabilities = edge_probabilities(model, 1)
+    np.testing.assert_allclose(sum(p for (u, v), p in probabilities.items() if u == 'Binding_Mode_1'), 1)
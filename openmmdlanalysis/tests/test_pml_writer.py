@@ -0,0 +1,83 @@
+"""
+Unit tests for the pharmacophore generation from the interaction coordinates.
+"""
+import numpy as np
+import pandas as pd
+import xml.etree.ElementTree as ET
+
+from openmmdlanalysis.interaction_gathering import add_coordinate_columns
+from openmmdlanalysis.pml_writer import coordinate_array, generate_bindingmode_pharmacophores, generate_pharmacophore_centers, generate_pharmacophore_vectors, generate_md_pharmacophore_cloudcenters, generate_point_cloud_pml, pharmacophore_trees
+
+
+def test_coordinate_array_numeric_columns(interaction_dataframe):
+    df = interaction_dataframe
+    parsed = coordinate_array(df, 'LIGCOO')
+    df[['LIGCOO_X', 'LIGCOO_Y', 'LIGCOO_Z']] = parsed.astype(np.float32)
+
+    np.testing.assert_allclose(coordinate_array(df, 'LIGCOO'), [[1.0, 2.0, 3.0], [2.0, 3.0, 4.5], [0.5, 0.5, 0.5], [4.0, 4.0, 4.0]])
+
+
+def test_pharmacophore_centers_and_vectors(interaction_dataframe):
+    df = interaction_dataframe
+
+    assert generate_pharmacophore_centers(df, ['LEU4A_5_hydrophobic']) == {'LEU4A_5_hydrophobic': [1.25, 1.75, 2.5]}
+    assert generate_pharmacophore_vectors(df, ['ASP12A_3_Donor_hbond']) == {'ASP12A_3_Donor_hbond': [[1.5, 2.5, 3.75], [0.5, 0.5, 0.5]]}
+
+
+def test_pharmacophore_centers_skip_interactions_without_coordinates(interaction_dataframe):
+    df = interaction_dataframe
+    df['PHE8A_9_pistacking'] = 0
+
+    assert generate_pharmacophore_centers(df, ['PHE8A_9_pistacking', 'LEU4A_5_hydrophobic']) == {'LEU4A_5_hydrophobic': [1.25, 1.75, 2.5]}
+    assert generate_pharmacophore_vectors(df, ['PHE8A_9_pistacking']) == {}
+
+
+def test_md_pharmacophore_cloudcenters(tmp_path, interaction_dataframe):
+    df = interaction_dataframe
+    df['PHE8A_9_pistacking'] = [0, 0, 1, 0]
+    output_filename = str(tmp_path / "combopharm.pml")
+    generate_md_pharmacophore_cloudcenters(df, "UNK", output_filename, "UNK_complex")
+
+    features = ET.parse(output_filename).getroot().find("pharmacophore")
+    assert [(feature.tag, feature.get("featureId")) for feature in features] == [
+        ("vector", "ASP12A_3_Donor_hbond"), ("plane", "PHE8A_9_pistacking"), ("point", "LEU4A_5_hydrophobic")]
+
+
+def test_point_cloud_pml_is_bounded(tmp_path):
+    coordinates = np.random.default_rng(0).uniform(0, 10, size=(5000, 3))
+    generate_point_cloud_pml({"H": {"LEU4A_5_hydrophobic": coordinates.tolist()}}, "UNK_complex", str(tmp_path / "point_cloud"), max_points=100)
+
+    feature_cloud = ET.parse(str(tmp_path / "point_cloud.pml")).getroot().find("featureCloud")
+    additional_points = feature_cloud.findall("additionalPoint")
+    assert feature_cloud.get("featureId") == "LEU4A_5_hydrophobic"
+    assert len(additional_points) < 100
+    assert all(0 < float(point.get("weight")) <= 1 for point in additional_points)
+
+
+def test_pharmacophore_trees_in_memory(interaction_dataframe):
+    df = interaction_dataframe
+    fingerprint_df = pd.DataFrame({'FRAME': [1, 2], 'ASP12A_3_Donor_hbond': [1, 0], 'LEU4A_5_hydrophobic': [1, 1]})
+    trees = pharmacophore_trees(df, fingerprint_df, ['ASP12A_3_Donor_hbond', 'LEU4A_5_hydrophobic'], {'Binding_Mode_1': 1, 'Binding_Mode_2': 2}, "UNK", "UNK_complex", num_processes=2)
+
+    assert list(trees) == ['Binding_Mode_1', 'Binding_Mode_2', 'point_cloud', 'combopharm']
+    assert [feature.get("featureId") for feature in trees['Binding_Mode_1'].getroot().find("pharmacophore")] == ['ASP12A_3_Donor_hbond', 'LEU4A_5_hydrophobic']
+    assert [feature.get("featureId") for feature in trees['Binding_Mode_2'].getroot().find("pharmacophore")] == ['LEU4A_5_hydrophobic']
+    assert [feature.get("featureId") for feature in trees['point_cloud'].getroot()] == ['LEU4A_5_hydrophobic', 'ASP12A_3_Donor_hbond']
+
+
+def test_bindingmode_pharmacophore_coordinate_strings(tmp_path):
+    df = add_coordinate_columns(pd.DataFrame({
+        'FRAME': [1, 1],
+        'LIGCOO': [(-0.03, 1.234, 2.1), (3.3, -4.567, 0.7)],
+        'PROTCOO': [(0.1, 0.2, 0.3), (5.55, 6.0, -7.89)],
+        'ASP12A_3_Donor_hbond': [1, 0],
+        'LEU4A_5_hydrophobic': [0, 1],
+    }))
+    fingerprint_df = pd.DataFrame({'FRAME': [1], 'ASP12A_3_Donor_hbond': [1], 'LEU4A_5_hydrophobic': [1]})
+    generate_bindingmode_pharmacophores(df, fingerprint_df, ['ASP12A_3_Donor_hbond', 'LEU4A_5_hydrophobic'], {'Binding_Mode_1': 1}, "UNK", "UNK_complex",
+                                        output_dir=str(tmp_path))
+
+    vector, point = ET.parse(str(tmp_path / "Binding_Mode_1.pml")).getroot().find("pharmacophore")
+    # the float32 coordinate columns are written with the precision of PLIP
+    assert [vector.find(tag).get(axis) for tag in ("origin", "target") for axis in ("x3", "y3", "z3")] == ['-0.03', '1.234', '2.1', '0.1', '0.2', '0.3']
+    assert [point.find("position").get(axis) for axis in ("x3", "y3", "z3")] == ['3.3', '-4.567', '0.7']
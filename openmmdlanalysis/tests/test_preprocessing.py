@@ -0,0 +1,34 @@
+"""
+Unit tests for the preprocessing of the topology.
+"""
+import os
+
+import MDAnalysis as mda
+
+from openmmdlanalysis.preprocessing import process_pdb_file
+
+
+PDB = """\
+ATOM      1  N   ALA A   1       0.000   0.000   0.000  1.00  0.00           N
+ATOM      2  CA  ALA A   1       1.458   0.000   0.000  1.00  0.00           C
+HETATM    3  O   WAT A   2       3.000   0.000   0.000  1.00  0.00           O
+HETATM    4  H1  WAT A   2       3.500   0.500   0.000  1.00  0.00           H
+HETATM    5  O   T3P A   3       5.000   0.000   0.000  1.00  0.00           O
+END
+"""
+
+
+def test_process_pdb_file_renames_waters(tmp_path):
+    input_pdb = str(tmp_path / "complex.pdb")
+    output_pdb = str(tmp_path / "processed.pdb")
+    with open(input_pdb, "w") as f:
+        f.write(PDB)
+
+    assert process_pdb_file(input_pdb, output_pdb) == output_pdb
+    assert list(mda.Universe(output_pdb).residues.resnames) == ["ALA", "HOH", "HOH"]
+    assert list(mda.Universe(input_pdb).residues.resnames) == ["ALA", "WAT", "T3P"]
+
+    # nothing is left to rename, so the processed file is not rewritten
+    modified = os.path.getmtime(output_pdb)
+    assert process_pdb_file(output_pdb) == output_pdb
+    assert os.path.getmtime(output_pdb) == modified
@@ -0,0 +1,94 @@
+"""
+Unit tests for the highlighting of the binding mode figures.
+"""
+import io
+
+import pytest
+from PIL import Image
+from rdkit import Chem
+from rdkit.Chem import AllChem
+
+from openmmdlanalysis.rdkit_figure_generation import (HIGHLIGHT_COLORS, generate_binding_mode_figures, group_binding_modes, highlight_atom_colors,
+                                                      highlight_categories, interaction_highlight)
+
+
+def cairo_available():
+    try:
+        import cairosvg  # noqa: F401
+    except OSError:
+        return False
+    return True
+
+
+# Only the rendering of the depictions needs the cairo library
+requires_cairo = pytest.mark.skipif(not cairo_available(), reason="cairosvg requires the cairo library")
+
+
+# Interaction names as generated by binding_mode_processing.gather_interactions
+@pytest.mark.parametrize("interaction, category, atoms", [
+    ("12LEUA_18_19_20_21_22_23_hydrophobic", "hydrophobic", (18, 19, 20, 21, 22, 23)),
+    ("12LEUA_5_hydrophobic", "hydrophobic", (5,)),
+    ("34ASPA_7_Donor_hbond", "hbond_donor", (7,)),
+    ("34SERA_8_Acceptor_hbond", "hbond_acceptor", (8,)),
+    ("20GLYA_15_F_halogen", "halogen", (15,)),
+    ("40ARGA_9_Acceptor_waterbridge", "waterbridge", (9,)),
+    ("41ARGA_10_Donor_waterbridge", "waterbridge", (10,)),
+    ("50PHEA_18,19,20,21,22,23_pistacking", "pistacking", (18, 19, 20, 21, 22, 23)),
+    ("60LYSA_18_19_20_21_22_23_Aromatic_pication", "pication", (18, 19, 20, 21, 22, 23)),
+    ("70ARGA_10,11_Carboxylate_NI_saltbridge", "ni", (10, 11)),
+    ("80ASPA_12_Amine_PI_saltbridge", "pi", (12,)),
+    ("90HISA_13_Zn_protein.sidechain_metal", "metal", (13,)),
+    ("90HISA_13_unknown", None, (13,)),
+])
+def test_interaction_highlight(interaction, category, atoms):
+    assert interaction_highlight(interaction) == (category, atoms)
+
+
+def test_highlight_categories_hbond_both():
+    interactions = ["34ASPA_107_Donor_hbond", "35SERA_107_Acceptor_hbond", "36THRA_108_Donor_hbond", "37ASNA_109_Acceptor_hbond"]
+
+    categories = highlight_categories(interactions, lig_index=100)
+
+    assert categories["hbond_both"] == {7}
+    assert categories["hbond_donor"] == {8}
+    assert categories["hbond_acceptor"] == {9}
+    assert set(categories) == set(HIGHLIGHT_COLORS)
+
+
+def test_highlight_atom_colors_priority():
+    interactions = ["12LEUA_5_hydrophobic", "40ARGA_5_Acceptor_waterbridge", "34ASPA_6_Donor_hbond", "12LEUA_6_hydrophobic",
+                    "70ARGA_7,8_Carboxylate_NI_saltbridge", "80ASPA_8_Amine_PI_saltbridge", "90HISA_9_Zn_protein.sidechain_metal"]
+
+    highlight_atoms, highlight_colors = highlight_atom_colors(interactions, lig_index=0)
+
+    assert highlight_atoms == [5, 6, 7, 8, 9]
+    # an atom with several interactions gets the color of the first category of HIGHLIGHT_COLORS
+    assert highlight_colors == {5: HIGHLIGHT_COLORS["hydrophobic"], 6: HIGHLIGHT_COLORS["hbond_donor"], 7: HIGHLIGHT_COLORS["ni"],
+                                8: HIGHLIGHT_COLORS["ni"], 9: HIGHLIGHT_COLORS["metal"]}
+
+
+def test_group_binding_modes_by_highlights():
+    binding_modes = [("Binding_Mode_1", {"12LEUA_5_hydrophobic", "34ASPA_6_Donor_hbond"}, 50.0),
+                     ("Binding_Mode_2", {"13LEUA_5_hydrophobic"}, 30.0),
+                     ("Binding_Mode_3", {"12LEUA_5_hydrophobic", "35GLUA_6_Donor_hbond"}, 20.0)]
+
+    groups = group_binding_modes(binding_modes, lig_index=0)
+
+    # binding modes with the same highlighted atoms and colors share a depiction, regardless of the protein partners
+    assert [[binding_mode[0] for binding_mode in group] for group in groups] == [["Binding_Mode_1", "Binding_Mode_3"], ["Binding_Mode_2"]]
+
+
+@requires_cairo
+def test_generate_binding_mode_figures():
+    mol = Chem.MolFromSmiles("Cc1ccccc1")
+    AllChem.Compute2DCoords(mol)
+    binding_modes = [("Binding_Mode_1", {"12LEUA_2_3_4_5_6_7_hydrophobic"}, 60.0), ("Binding_Mode_2", {"13LEUA_2_3_4_5_6_7_hydrophobic"}, 40.0)]
+
+    figures = generate_binding_mode_figures(binding_modes, {"mol": mol, "lig_index": 1})
+
+    assert list(figures) == ["Binding_Mode_1", "Binding_Mode_2"]
+    for figure in figures.values():
+        with Image.open(io.BytesIO(figure)) as image:
+            assert image.format == "PNG"
+            # the depiction of 600 pixels is merged with the legend
+            assert image.size[0] > 600
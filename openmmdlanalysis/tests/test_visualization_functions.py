@@ -0,0 +1,73 @@
+"""
+Unit tests for the export and the lazy viewing of the trajectory.
+"""
+import numpy as np
+import pandas as pd
+import MDAnalysis as mda
+import pytest
+from MDAnalysis.coordinates.memory import MemoryReader
+
+from openmmdlanalysis.visualization_functions import LazyTrajectory, save_interacting_waters_trajectory, water_bridging_frames
+
+
+@pytest.fixture
+def universe():
+    """Two alanine atoms (resid 4), the ligand and three waters (resid 3, 4 and 5) with 10 frames, the x coordinate of all atoms is the frame index."""
+    u = mda.Universe.empty(6, n_residues=5, atom_resindex=[0, 0, 1, 2, 3, 4], residue_segindex=[0] * 5, trajectory=True)
+    u.add_TopologyAttr('names', ['N', 'CA', 'C1', 'O', 'O', 'O'])
+    u.add_TopologyAttr('resnames', ['ALA', 'UNK', 'HOH', 'HOH', 'HOH'])
+    u.add_TopologyAttr('resids', [4, 1, 3, 4, 5])
+    coordinates = np.zeros((10, 6, 3), dtype=np.float32)
+    coordinates[:, :, 0] = np.arange(10)[:, None]
+    coordinates[:, :, 1] = np.arange(6)
+    u.load_new(coordinates, format=MemoryReader)
+    return u
+
+
+def test_water_bridging_frames():
+    df_all = pd.DataFrame({'FRAME': [1, 2, 2, 3, 5], 'INTERACTION': ['waterbridge', 'hbond', 'waterbridge', 'waterbridge', 'waterbridge'],
+                           'WATER_IDX': [4, 0, 5, 4, 3]})
+
+    assert water_bridging_frames(df_all) == [1, 2, 3, 5]
+    assert water_bridging_frames(df_all, [4]) == [1, 3]
+
+
+@pytest.mark.parametrize("stride, frames, written_frames", [
+    (1, None, list(range(10))),
+    (3, None, [0, 3, 6, 9]),
+    (2, [1, 2, 5, 7], [1, 5]),
+])
+def test_save_interacting_waters_trajectory(tmp_path, universe, stride, frames, written_frames):
+    save_interacting_waters_trajectory(None, None, [4], outputpath=f"{tmp_path}/", stride=stride, frames=frames, universe=universe)
+
+    written = mda.Universe(str(tmp_path / "interacting_waters.pdb"), str(tmp_path / "interacting_waters.dcd"))
+    # the protein, the ligand and only the water with the resid 4, the alanine with the same resid is not a water
+    assert list(written.atoms.resnames) == ['ALA', 'ALA', 'UNK', 'HOH']
+    assert list(written.atoms.resids) == [4, 4, 1, 4]
+    assert [ts.positions[0, 0] for ts in written.trajectory] == written_frames
+    np.testing.assert_allclose(written.atoms.positions[:, 1], [0, 1, 2, 4])
+
+
+def test_lazy_trajectory(universe):
+    trajectory = LazyTrajectory(universe.atoms, stride=3, cache_size=2)
+
+    assert trajectory.n_frames == 4
+    assert LazyTrajectory(universe.atoms).n_frames == 10
+    # the index of the viewer is mapped to every stride-th frame
+    assert trajectory.get_coordinates(2)[0, 0] == 6
+    assert trajectory.get_coordinates(3)[0, 0] == 9
+
+
+def test_lazy_trajectory_cache(universe):
+    trajectory = LazyTrajectory(universe.atoms, stride=3, cache_size=2)
+
+    first = trajectory.get_coordinates(0)
+    trajectory.get_coordinates(1)
+    # a cached frame is returned without reading and becomes the most recently used frame
+    assert trajectory.get_coordinates(0) is first
+    trajectory.get_coordinates(2)
+
+    # the least recently used frame 3 is evicted
+    assert list(trajectory._frame_cache) == [0, 6]
+    assert trajectory.get_coordinates(1)[0, 0] == 3
+    assert list(trajectory._frame_cache) == [6, 3]
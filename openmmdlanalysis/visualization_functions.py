@@ -1,53 +1,76 @@
 import json
-import re
 import mdtraj as md
 import MDAnalysis as mda
 import pickle
 import nglview as nv
 import subprocess
+from collections import OrderedDict
 
-from .barcode_generation import waterids_barcode_generator
+import numpy as np
 
+from .barcode_generation import waterids_matrix
+from .pml_writer import coordinate_array
+from .cloud_processing import downsample_cloud, load_clouds_npz, sphere_buffer_js
 
-def interacting_water_ids(df_all, waterbridge_interactions):
+
+def interacting_water_ids(df_all, waterbridge_interactions, waterids=None):
     """Generates a list of all water ids that form water bridge interactions.
 
     Args:
         df_all (pandas dataframe): dataframe containing all interactions from plip analysis (typicaly df_all)
         waterbridge_interactions (list): list of strings containing the names of all water bridge interactions
+        waterids (numpy array, optional): water id array of the waterbridge interactions generated by waterids_matrix. Defaults to None, then it is generated from df_all.
 
     Returns:
         list: list of all unique water ids that form water bridge interactions
     """
-    interacting_waters = []
-    for waterbridge_interaction in waterbridge_interactions:
-        waterid_barcode = waterids_barcode_generator(df_all, waterbridge_interaction)
-        for waterid in waterid_barcode:
-            if waterid != 0:
-                interacting_waters.append(waterid)
-    return list(set(interacting_waters))
+    if waterids is None:
+        waterids, columns = waterids_matrix(df_all, waterbridge_interactions)
+    interacting_waters = np.unique(waterids[waterids != 0])
+    return interacting_waters.tolist()
 
 
-def save_interacting_waters_trajectory(pdb_file_path, dcd_file_path, interacting_waters, outputpath='./'):
-    """Saves .pdb and .dcd files of the trajectory containing ligand, receptor and all interacting waters.
+def water_bridging_frames(df_all, interacting_waters=None):
+    """Gathers the frames in which water bridges are formed.
+
+    Args:
+        df_all (pandas dataframe): dataframe containing all interactions from plip analysis (typicaly df_all)
+        interacting_waters (list, optional): only consider water bridges formed by these water ids. Defaults to None, then all water bridges are considered.
+
+    Returns:
+        list: sorted list of the frames with at least one water bridge
+    """
+    waterbridges = df_all['INTERACTION'] == 'waterbridge'
+    if interacting_waters is not None:
+        waterbridges &= df_all['WATER_IDX'].isin(interacting_waters)
+    return np.unique(df_all.loc[waterbridges, 'FRAME'].to_numpy().astype(np.int64)).tolist()
+
+
+def save_interacting_waters_trajectory(pdb_file_path, dcd_file_path, interacting_waters, outputpath='./', stride=1, frames=None, trajectory_format='dcd', universe=None):
+    """Saves .pdb and .dcd (or compressed .xtc) files of the trajectory containing ligand, receptor and all interacting waters.
 
     Args:
         pdb_file_path (str): path to original pdb file
         dcd_file_path (str): path to original dcd file
         interacting_waters (list): list of all interacting water ids
         outputpath (str, optional): filepath to output new pdb and dcd files. Defaults to './'.
+        stride (int, optional): only every stride-th frame is written. Defaults to 1.
+        frames (list, optional): indices of the frames to write, for example the frames of water_bridging_frames. The stride is applied to these frames. Defaults to None, then all frames are written.
+        trajectory_format (str, optional): format of the trajectory, 'dcd' or the compressed 'xtc'. Defaults to 'dcd'.
+        universe (MDAnalysis.Universe, optional): already loaded universe of the pdb and dcd file. Defaults to None, then the files are loaded.
     """
-    u = mda.Universe(pdb_file_path, dcd_file_path)
+    u = mda.Universe(pdb_file_path, dcd_file_path) if universe is None else universe
     water_atoms = u.select_atoms("protein or nucleic or resname UNK")
 
-    for water in interacting_waters:
-        add_water_atoms = u.select_atoms(f'resname HOH and resid {water}')
-        water_atoms = water_atoms + add_water_atoms
+    # select all interacting waters with one residue membership query
+    interacting_water_atoms = (u.atoms.resnames == 'HOH') & np.isin(u.atoms.resids, np.asarray(interacting_waters, dtype=np.int64))
+    water_atoms = water_atoms + u.atoms[interacting_water_atoms]
 
     water_atoms.write(f'{outputpath}interacting_waters.pdb')
 
-    with mda.Writer(f'{outputpath}interacting_waters.dcd', water_atoms.n_atoms) as W:
-        for ts in u.trajectory:
+    trajectory_frames = u.trajectory[::stride] if frames is None else u.trajectory[np.asarray(frames, dtype=np.int64)[::stride]]
+    with mda.Writer(f'{outputpath}interacting_waters.{trajectory_format}', water_atoms.n_atoms) as W:
+        for ts in trajectory_frames:
             W.write(water_atoms)
 
 
@@ -60,55 +83,31 @@ def cloud_json_generation(df_all):
     Returns:
         dict: dict containing all interaction clouds
     """     
-    coord_pattern = re.compile(r'\(([\d.-]+), ([\d.-]+), ([\d.-]+)\)')
-    hydrophobe_coords = []
-    acceptor_ccords = []
-    donor_coords = []
-    waterbridge_coords = []
-    negative_ionizable_coords = [] 
-    positive_ionizable_coords = []
-    pistacking_coords = []
-    pication_coords = []
-    halogen_coords = []
-    metal_coords = []
-
-    for index, row in df_all.iterrows():
-        coord_match = coord_pattern.match(row['LIGCOO'])
-        if coord_match:
-            x, y, z = map(float, coord_match.groups())
-            x, y, z = round(x, 3), round(y, 3), round(z, 3)
-            interaction = row['INTERACTION']
-            if interaction == 'hbond':
-                if row['PROTISDON'] == 'True':
-                    interaction = 'donor'
-                else:
-                    interaction = 'acceptor'
-            if interaction == 'saltbridge':
-                if row['PROTISPOS'] == 'True':
-                    interaction = 'negative_ionizable'
-                else:
-                    interaction = 'positive_ionizable'
-            if interaction == 'hydrophobic':
-                hydrophobe_coords.append([x, y, z])
-            if interaction == 'acceptor':
-                acceptor_ccords.append([x, y, z])
-            if interaction == 'donor': 
-                donor_coords.append([x, y, z])
-            if interaction == 'waterbridge':
-                waterbridge_coords.append([x, y, z])
-            if interaction == 'negative_ionizable':
-                negative_ionizable_coords.append([x, y, z])
-            if interaction == 'positive_ionizable':
-                positive_ionizable_coords.append([x, y, z])
-            if interaction == 'pistacking':
-                pistacking_coords.append([x, y, z])
-            if interaction == 'pication':
-                pication_coords.append([x, y, z])
-            if interaction == 'halogen':
-                halogen_coords.append([x, y, z])
-            if interaction == 'metal':
-                metal_coords.append([x, y, z])
-
+    coordinates = np.round(coordinate_array(df_all, 'LIGCOO'), 3)
+    valid = ~np.isnan(coordinates).any(axis=1)
+
+    # hydrogen bonds and salt bridges are split by the role of the protein, boolean columns are read from csv files as strings or booleans
+    interaction = df_all['INTERACTION'].to_numpy(dtype=object).copy()
+    protein_donor = df_all['PROTISDON'].astype(str).to_numpy() == 'True' if 'PROTISDON' in df_all.columns else np.zeros(len(df_all), dtype=bool)
+    protein_positive = df_all['PROTISPOS'].astype(str).to_numpy() == 'True' if 'PROTISPOS' in df_all.columns else np.zeros(len(df_all), dtype=bool)
+    hbonds = interaction == 'hbond'
+    saltbridges = interaction == 'saltbridge'
+    interaction[hbonds] = np.where(protein_donor[hbonds], 'donor', 'acceptor')
+    interaction[saltbridges] = np.where(protein_positive[saltbridges], 'negative_ionizable', 'positive_ionizable')
+
+    def interaction_coordinates(interaction_type):
+        return coordinates[valid & (interaction == interaction_type)].tolist()
+
+    hydrophobe_coords = interaction_coordinates('hydrophobic')
+    acceptor_ccords = interaction_coordinates('acceptor')
+    donor_coords = interaction_coordinates('donor')
+    waterbridge_coords = interaction_coordinates('waterbridge')
+    negative_ionizable_coords = interaction_coordinates('negative_ionizable')
+    positive_ionizable_coords = interaction_coordinates('positive_ionizable')
+    pistacking_coords = interaction_coordinates('pistacking')
+    pication_coords = interaction_coordinates('pication')
+    halogen_coords = interaction_coordinates('halogen')
+    metal_coords = interaction_coordinates('metal')
 
     clouds = {}
     clouds['hydrophobic'] = {"coordinates": hydrophobe_coords, "color": [1.0, 1.0, 0.0], "radius": 0.05}
@@ -125,39 +124,81 @@ def cloud_json_generation(df_all):
     return clouds
 
 
-def visualization(json_file_path,pdb_file_path, dcd_file_path, interacting_waters_file_path, receptor_type='protein', height='1200px', width='1200px'):
+class LazyTrajectory(nv.MDAnalysisTrajectory):
+    """nglview trajectory adaptor that reads the frames of an MDAnalysis AtomGroup on demand and keeps the recently shown frames in an LRU cache.
+
+    Args:
+        atomgroup (MDAnalysis AtomGroup): atoms shown in the viewer
+        stride (int, optional): only every stride-th frame is shown. Defaults to 1.
+        cache_size (int, optional): number of frames kept in memory. Defaults to 32.
+    """
+    def __init__(self, atomgroup, stride=1, cache_size=32):
+        super().__init__(atomgroup)
+        self.stride = stride
+        self.cache_size = cache_size
+        self._frame_cache = OrderedDict()
+
+    def get_coordinates(self, index):
+        frame = index * self.stride
+        if frame in self._frame_cache:
+            self._frame_cache.move_to_end(frame)
+            return self._frame_cache[frame]
+
+        self.atomgroup.universe.trajectory[frame]
+        coordinates = self.atomgroup.positions.copy()
+        self._frame_cache[frame] = coordinates
+        if len(self._frame_cache) > self.cache_size:
+            self._frame_cache.popitem(last=False)
+        return coordinates
+
+    @property
+    def n_frames(self):
+        return (self.atomgroup.universe.trajectory.n_frames + self.stride - 1) // self.stride
+
+
+def visualization(json_file_path,pdb_file_path, dcd_file_path, interacting_waters_file_path, receptor_type='protein', height='1200px', width='1200px', density_maps=None, isolevel=2.0, max_points=50000, lazy=False, stride=1, cache_size=32, universe=None):
     """Generates visualization of the trajectory with the interacting waters and interaction clouds.
     
     Args:
-        json_file_path (str): path to .json file containing the interaction clouds
+        json_file_path (str): path to .json or .npz file containing the interaction clouds (see cloud_processing.save_clouds_npz)
         pdb_file_path (str): path to pdb file (use interacting_waters.pdb for better visualization)
         dcd_file_path (str): path to dcd file (use interacting_waters.dcd for better visualization)
-        interacting_waters_file_path (str): path to .pkl file containing the interacting water ids
+        interacting_waters_file_path (str or list): path to .pkl file containing the interacting water ids or the list of interacting water ids
         receptor_type (str, optional): type of receptor. Defaults to 'protein'.
         height (str, optional): height of the visualization. Defaults to '1200px'.
         width (str, optional): width of the visualization. Defaults to '1200px'.
+        density_maps (dict, optional): interaction types as keys and paths of the .dx density maps as values (see cloud_processing.write_density_maps). If given, the clouds are shown as isosurfaces instead of individual spheres. Defaults to None.
+        isolevel (float, optional): isolevel of the isosurfaces in standard deviations of the density map. Defaults to 2.0.
+        max_points (int, optional): maximum number of spheres per interaction type, larger clouds are voxel downsampled. Defaults to 50000.
+        lazy (bool, optional): read the frames on demand with MDAnalysis (see LazyTrajectory) and only load the receptor, ligand and interacting waters instead of loading the whole trajectory into memory. Defaults to False.
+        stride (int, optional): only every stride-th frame is shown. Defaults to 1.
+        cache_size (int, optional): number of frames kept in memory by the lazy trajectory. Defaults to 32.
+        universe (MDAnalysis.Universe, optional): already loaded universe, for example the universe of an AnalysisSession. It is shown with the lazy trajectory instead of loading the files. Defaults to None.
     
     Returns:
         nglview widget: returns the nglview widget containing the visualization
     """
-    with open(json_file_path) as f:
-        data = json.load(f)
-
-    sphere_buffers = []
-    for name, cloud in data.items():
-        sphere_buffer = {"position": [], "color": [], "radius": []}
-        for point in cloud["coordinates"]:
-            sphere_buffer["position"] += point
-            sphere_buffer["color"] += cloud["color"]
-            sphere_buffer["radius"] += [cloud["radius"]]
-        sphere_buffers.append(sphere_buffer)
-    
-    pdb_structure = md.load(pdb_file_path)
-    dcd_trajectory = md.load(dcd_file_path, top=pdb_structure)
-    with open(interacting_waters_file_path, 'rb') as f:
-        interacting_watersids = pickle.load(f)
-
-    view = nv.show_mdtraj(dcd_trajectory)
+    if json_file_path.endswith('.npz'):
+        data = load_clouds_npz(json_file_path)
+    else:
+        with open(json_file_path) as f:
+            data = json.load(f)
+
+    if isinstance(interacting_waters_file_path, str):
+        with open(interacting_waters_file_path, 'rb') as f:
+            interacting_watersids = pickle.load(f)
+    else:
+        interacting_watersids = list(interacting_waters_file_path)
+
+    if lazy or universe is not None:
+        u = mda.Universe(pdb_file_path, dcd_file_path) if universe is None else universe
+        shown_waters = (u.atoms.resnames == 'HOH') & np.isin(u.atoms.resids, np.asarray(interacting_watersids, dtype=np.int64))
+        shown_atoms = u.select_atoms(f"{receptor_type} or resname UNK") + u.atoms[shown_waters]
+        view = nv.NGLWidget(LazyTrajectory(shown_atoms, stride=stride, cache_size=cache_size))
+    else:
+        pdb_structure = md.load(pdb_file_path)
+        dcd_trajectory = md.load(dcd_file_path, top=pdb_structure, stride=stride)
+        view = nv.show_mdtraj(dcd_trajectory)
     view.clear_representations()
     view.add_cartoon(selection=receptor_type)
 
@@ -165,18 +206,18 @@ def visualization(json_file_path,pdb_file_path, dcd_file_path, interacting_water
         view.add_licorice(selection=f"water and {water}")
     view.add_licorice(selection="UNK")
 
-    for sphere_buffer, name in zip(sphere_buffers, ['hydrophobic', 'acceptor', 'donor', 'waterbridge', 'negative_ionizable', 'positive_ionizable', 'pistacking', 'pication', 'halogen', 'metal']):
-        js = (
-        f"""
-        var params = {sphere_buffer};
-        var shape = new NGL.Shape('{name}');
-        var buffer = new NGL.SphereBuffer(params);
-        shape.addBuffer(buffer);
-        var shapeComp = this.stage.addComponentFromObject(shape);
-        shapeComp.addRepresentation("buffer");
-        """
-        )
-        view._js(js)
+    # the clouds are only drawn as spheres without density maps, large clouds are downsampled
+    for name, cloud in (data.items() if density_maps is None else []):
+        coordinates = downsample_cloud(cloud["coordinates"], max_points=max_points)
+        if len(coordinates):
+            view._js(sphere_buffer_js(name, coordinates, cloud["color"], cloud["radius"]))
+
+    # show the density maps of the interaction clouds as isosurfaces
+    for name, density_map in (density_maps or {}).items():
+        color = data[name]["color"] if name in data else [0.5, 0.5, 0.5]
+        density_component = view.add_component(density_map)
+        density_component.clear_representations()
+        density_component.add_surface(isolevelType="sigma", isolevel=isolevel, color=f"rgb({int(color[0] * 255)}, {int(color[1] * 255)}, {int(color[2] * 255)})", opacity=0.5)
     view.layout.width = width
     view.layout.height = height
     return view
\ No newline at end of file